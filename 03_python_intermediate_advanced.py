@@ -130,7 +130,7 @@ with change_dir(base):
     # בתוך ה-with cwd = base
     pass
 
-# Decorator – מדידת זמן ריצה
+# Decorator – מדידת זמן ריצה (print בכל קריאה; ללולאות חמות: 32_hot_path_profiler.py)
 import time
 def timed(func):
     def wrapper(*args, **kwargs):
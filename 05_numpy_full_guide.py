@@ -15,6 +15,7 @@
 ######################################################################
 
 import numpy as np
+import pandas as pd   # pd.cut ב-§9
 
 # ==============================================================
 # 1) יצירת מערכים ובדיקת מאפיינים
@@ -139,10 +140,12 @@ print("clean:", xx_clean)
 
 N = 10**5
 data = np.arange(N)
-# ❌ לולאה
-%timeit [x**2 for x in data]  # (ב-Jupyter)
-# ✅ NumPy vectorized
-%timeit data**2
+import timeit
+# ❌ לולאה   (ב-Jupyter: %timeit [x**2 for x in data])
+print("loop      :", timeit.timeit(lambda: [x**2 for x in data], number=10) / 10, "s")
+# ✅ NumPy vectorized   (ב-Jupyter: %timeit data**2)
+print("vectorized:", timeit.timeit(lambda: data**2, number=10) / 10, "s")
+# מדידה חוזרת עם warmup/repeats/JSON: 33_benchmark_suite.py
 
 
 # ==============================================================
@@ -163,7 +166,7 @@ print("[ages bins]", list(zip(ages,cats)))
 
 # מטריצת קורלציה של דאטה אקראי
 mat = np.random.randn(5,4)
-corr = np.corrcoef(mat,rowvar=False)
+corr = np.corrcoef(mat,rowvar=False)   # אלפי עמודות / מאות מיליוני שורות ב-chunks: 36_streaming_correlation.py
 print("\n[corr matrix]\n", corr)
 
 
@@ -177,7 +180,7 @@ arr = np.arange(10)
 np.save("arr.npy", arr)
 arr2 = np.load("arr.npy")
 
-# שמירה טקסטואלית
+# שמירה טקסטואלית (genfromtxt איטי מאוד על קבצים גדולים; לעמודות גדולות עם append ו-mmap: 35_mmap_array_store.py)
 np.savetxt("arr.csv", arr, delimiter=",")
 arr3 = np.genfromtxt("arr.csv", delimiter=",")
 
@@ -184,7 +184,7 @@ fig, ax = plt.subplots(figsize=(6, 4))
 sns.violinplot(data=cust, x="channel", y="amount", cut=0, inner="quartile", ax=ax)
 ax.set_title("Violin by Channel"); fig.tight_layout(); plt.close(fig)
 
-# d) heatmap – מטריצת קורלציה
+# d) heatmap – מטריצת קורלציה (דאטה רחב בלי get_dummies: 36_streaming_correlation.py)
 corr = cust[["amount"]].join(
     pd.get_dummies(cust[["channel","city"]], drop_first=True)
 ).corr()
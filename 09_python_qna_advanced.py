@@ -16,7 +16,7 @@
 #  Q12 : בניית Labels לבעיית ספורט (Home/Draw/Away) + מטריקות hit@k
 #  Q13 : window מתקדמים: rank dense, pct_rank, diff, pct_change
 #  Q14 : יעילות: downcast, memory_usage, בדיקת shape אחרי merge
-#  Q15 : תבניות-זהב (Utility): safe merge, safe asof, check unique keys
+#  Q15 : תבניות-זהב (Utility): safe merge (+ fan-out guard), safe asof, check unique keys
 #
 # דרישות: pandas, numpy (אופציונלי: pyarrow ל-Parquet)
 ######################################################################
@@ -189,8 +189,9 @@ sales = (
 pv = (sales.pivot_table(index="q", columns="variant", values="amount", aggfunc=["count","sum"], fill_value=0))
 pv.columns = ['_'.join(map(str, c)).strip() for c in pv.columns.to_flat_index()]
 pv["sum_total"] = pv.filter(like="sum_").sum(axis=1)
+count_total = pv.filter(like="count_").sum(axis=1)   # לפני הלולאה – אחרת pct_count_A נכנס ל-filter
 for v in ["A","B"]:
-    pv[f"pct_count_{v}"] = 100 * pv.get(f"count_{v}", 0) / pv.filter(like="count_").sum(axis=1)
+    pv[f"pct_count_{v}"] = 100 * pv.get(f"count_{v}", 0) / count_total
 print(pv.head())
 
 ######################################################################
@@ -352,17 +353,88 @@ def check_unique(df, cols):
         print(df[df.duplicated(subset=cols, keep=False)].head())
     return ok
 
-def safe_merge(left, right, on, how="left", check_right_unique=False):
-    """מיזוג עם בדיקות צורה/ייחודיות – מצמצם תקלות מבחן."""
+def estimate_merge_rows(left, right, on, how="left"):
+    """
+    מספר השורות שה-merge יחזיר – לפני שמריצים אותו (value_counts של המפתח בשני הצדדים).
+    זיכרון ∝ מספר המפתחות הייחודיים, לא ∝ גודל התוצאה.
+    מחזיר (n_rows, per_key) כש-per_key = טבלת l/r/out לכל מפתח משותף, ממוינת לפי out.
+    """
+    on = [on] if isinstance(on, str) else list(on)
+    lc = left.groupby(on, sort=False, dropna=False).size().rename("l")
+    rc = right.groupby(on, sort=False, dropna=False).size().rename("r")
+    per_key = pd.concat([lc, rc], axis=1, join="inner")
+    per_key["out"] = per_key["l"] * per_key["r"]
+    n = int(per_key["out"].sum())
+    if how in ("left", "outer"):
+        n += int(lc[~lc.index.isin(rc.index)].sum())
+    if how in ("right", "outer"):
+        n += int(rc[~rc.index.isin(lc.index)].sum())
+    return n, per_key.sort_values("out", ascending=False)
+
+def _common_key_dtypes(lk, rk):
+    """מפתחות שני הצדדים באותו dtype (כמו ש-merge משווה): מספרים → float64, תאריכים → datetime64[ns]."""
+    lk, rk = lk.copy(), rk.copy()
+    for c in lk.columns:
+        a, b = lk[c].dtype, rk[c].dtype
+        if a == b:
+            continue
+        if pd.api.types.is_numeric_dtype(a) and pd.api.types.is_numeric_dtype(b):
+            common = "float64"
+        elif pd.api.types.is_datetime64_dtype(a) and pd.api.types.is_datetime64_dtype(b):
+            common = "datetime64[ns]"
+        else:
+            common = object
+        lk[c], rk[c] = lk[c].astype(common), rk[c].astype(common)
+    return lk, rk
+
+def iter_merge_partitions(left, right, on, how="left", n_partitions=8):
+    """
+    merge לפי partitions של hash המפתח – generator: כל partition נבנה לבד ונזרק אחרי שהצרכן סיים איתו.
+    סדר: partition אחרי partition; בתוך partition – הסדר של left. הסדר המקורי של left לא נשמר.
+    """
+    on = [on] if isinstance(on, str) else list(on)
+    lk, rk = _common_key_dtypes(left[on], right[on])   # hash תלוי dtype: 1 (int64) ≠ 1.0 (float64)
+    lp = pd.util.hash_pandas_object(lk, index=False).to_numpy() % n_partitions
+    rp = pd.util.hash_pandas_object(rk, index=False).to_numpy() % n_partitions
+    for p in range(n_partitions):
+        yield left[lp == p].merge(right[rp == p], on=on, how=how)
+
+def safe_merge(left, right, on, how="left", check_right_unique=False,
+               max_fanout=None, n_partitions=None):
+    """
+    מיזוג עם בדיקות צורה/ייחודיות – מצמצם תקלות מבחן.
+    max_fanout  : אם (שורות צפויות / len(left)) גדול מזה → ValueError עם המפתחות הבעייתיים, לפני ה-merge
+    n_partitions: להריץ partition אחרי partition לפי hash של המפתח (במקום merge אחד ענק).
+                  מחזיר generator של DataFrames (לא concat – אחרת כל התוצאה בזיכרון בבת אחת);
+                  כתבו כל partition ל-sink (parquet/DB) בזמן שהוא מגיע. סדר השורות ≠ הסדר של left.
+    """
     if check_right_unique:
-        assert right[on].is_unique, f"Right key {on} not unique!"
+        dup = right.duplicated(subset=on, keep=False)
+        assert not dup.any(), f"Right key {on} not unique!"
     before = len(left)
+    if max_fanout is not None:
+        expected, per_key = estimate_merge_rows(left, right, on, how)
+        if expected > max_fanout * max(before, 1):
+            bad = per_key.nlargest(10, "out")             # המפתחות שמנפחים הכי הרבה: l*r
+            raise ValueError(f"merge fan-out {expected/max(before,1):.1f}x > {max_fanout}x "
+                             f"({expected:,} rows); top keys:\n{bad}")
+    if n_partitions:
+        return _checked_partitions(iter_merge_partitions(left, right, on, how, n_partitions), before, how)
     out = left.merge(right, on=on, how=how)
     after = len(out)
     if how in ("left","inner") and after < before:
         print(f"⚠️ rows dropped: {before-after}")
     return out
 
+def _checked_partitions(parts, before, how):
+    """מעביר partitions הלאה וסופר שורות; אותה בדיקת rows dropped – בסוף ה-stream."""
+    after = 0
+    for part in parts:
+        after += len(part)
+        yield part
+    if how in ("left","inner") and after < before:
+        print(f"⚠️ rows dropped: {before-after}")
+
 def safe_asof(left, right, left_on, right_on, by=None, tolerance="7D", direction="backward"):
     """עטיפה ל-asof עם ברירות מחדל בטוחות נגד דליפה."""
     return pd.merge_asof(
@@ -377,4 +449,21 @@ print("unique match_id?", check_unique(matches, ["match_id"]))
 ex = safe_merge(matches, teams.rename(columns={"team_id":"home_team_id","team_name":"home_name"}), on="home_team_id", how="left")
 snap2 = safe_asof(matches, odds, "match_date", "collected_at", by="match_id")
 
+# fan-out לפני merge (הדוגמה של Q14: key=2 כפול בצד ימין)
+n_expected, per_key = estimate_merge_rows(left, right, on="key", how="left")
+print("expected rows:", n_expected, "\n", per_key.head(2))
+try:
+    safe_merge(left, right, on="key", max_fanout=1.0)
+except ValueError as e:
+    print("⚠️", str(e).splitlines()[0])
+# merge גדול – partition אחרי partition לפי hash של המפתח; כל partition נצרך ונזרק (כאן: רק ספירה)
+ex_rows = 0
+for part in safe_merge(matches, teams.rename(columns={"team_id":"home_team_id","team_name":"home_name"}), on="home_team_id", how="left", n_partitions=4):
+    ex_rows += len(part)                                  # בפועל: part.to_parquet(f".../part={i}.parquet")
+assert ex_rows == len(ex)
+# מפתחות עם dtypes שונים (int64 מול float64, datetime ns מול us) – אותו partition כמו ב-merge רגיל
+kl = pd.DataFrame({"k": [1, 2, 3], "d": pd.to_datetime(["2025-01-01"] * 3).astype("datetime64[us]")})
+kr = pd.DataFrame({"k": [1.0, 2.0, 3.0], "d": pd.to_datetime(["2025-01-01"] * 3), "y": [10, 20, 30]})
+assert sum(len(p) for p in iter_merge_partitions(kl, kr, ["k", "d"], "inner", 4)) == len(kl.merge(kr, on=["k", "d"])) == 3
+
 print("\n✅ סוף – יש לך בנק שאלות–פתרונות כמו במבחן, עם דגש על מניעת דליפה, חלונות, הצטרפויות, KPI, וקוהורטים.")
@@ -0,0 +1,224 @@
+######################################################################
+# 📌 13 – Rolling Form Engine: פיצ'רי "N משחקים קודמים" בלי דליפה ובלי lambda
+#
+# מה יש פה:
+#  1) rolling_prev – mean/sum/count ל-N משחקים קודמים (כמה חלונות × כמה עמודות)
+#  2) השוואה מדויקת מול Q3 ב-09 (avg_pts_prev5 / avg_pts_prev5_fast)
+#  3) Benchmark על 10M שורות team-match  (python 13_rolling_form_engine.py --bench)
+#
+# הרעיון:
+#  • ממיינים פעם אחת לפי (team, date) → כל קבוצה היא בלוק רציף במערך.
+#  • cumsum אחד לכל עמודה (C[i] = סכום השורות 0..i-1).
+#  • "סכום N קודמים" של שורה i = C[i] - C[max(i-N, start_of_group)]
+#    → אין callback פייתון לכל חלון, רק אינדוקס וקטורי.
+#  • השורה הנוכחית לא נכנסת לעולם (C[i] עוצר לפני i) → אין דליפה.
+#
+# דרישות: pandas, numpy
+######################################################################
+
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+
+# ==============================================================
+# 1) המנוע
+# ==============================================================
+
+def group_offsets(codes):
+    """לכל שורה במערך ממוין לפי קבוצה – אינדקס תחילת הבלוק של הקבוצה שלה."""
+    codes = np.asarray(codes)
+    n = len(codes)
+    is_start = np.empty(n, dtype=bool)
+    if n:
+        is_start[0] = True
+        is_start[1:] = codes[1:] != codes[:-1]
+    # ffill של אינדקס ההתחלה: maximum.accumulate על מיקומי ההתחלה
+    starts = np.where(is_start, np.arange(n), 0)
+    return np.maximum.accumulate(starts) if n else starts
+
+
+def rolling_prev(df, group_col, time_col, value_cols, windows=(3, 5, 10),
+                 stats=("mean", "sum", "count"), min_periods=1, presorted=False):
+    """
+    פיצ'רים מתגלגלים של N המשחקים הקודמים (ללא השורה הנוכחית) לכל קבוצה.
+
+    df          : טבלת long (שורה = קבוצה × משחק)
+    group_col   : עמודת הקבוצה (למשל team_id)
+    time_col    : עמודת הזמן למיון (למשל match_date); מתעלמים ממנה אם presorted=True
+    value_cols  : עמודות לחישוב (pts, gf, ga ...)
+    windows     : גדלי חלון N
+    stats       : תת-קבוצה של mean / sum / count
+    min_periods : mean יוחזר כ-NaN אם יש פחות ערכים לא-חסרים מזה
+    presorted   : True אם df כבר ממוין לפי (group_col, time_col) – חוסך מיון
+
+    מחזיר DataFrame עם אותו index כמו df ועמודות בפורמט f"{col}_prev{N}_{stat}".
+    NaN בערכים לא נספר (כמו rolling.mean של pandas).
+    """
+    if isinstance(value_cols, str):
+        value_cols = [value_cols]
+    bad = set(stats) - {"mean", "sum", "count"}
+    if bad:
+        raise ValueError(f"unknown stats: {sorted(bad)}")
+
+    if presorted:
+        order = np.arange(len(df))
+    else:
+        # lexsort יציב – תיקו בתאריך ישמור על סדר הקלט
+        order = np.lexsort((df[time_col].to_numpy(), df[group_col].to_numpy()))
+
+    codes = pd.factorize(df[group_col].to_numpy()[order])[0]
+    start = group_offsets(codes)
+    n = len(order)
+    idx = np.arange(n)
+
+    # מטריצת ערכים (n, k) בסדר הממוין; מספרים שלמים נשארים int64 → סכום מדויק
+    vals = [df[c].to_numpy()[order] for c in value_cols]
+    all_int = all(np.issubdtype(v.dtype, np.integer) for v in vals)
+    X = np.column_stack(vals).astype(np.int64 if all_int else np.float64) if vals else np.empty((n, 0))
+    valid = np.ones_like(X, dtype=bool) if all_int else ~np.isnan(X)
+    if not all_int:
+        X = np.where(valid, X, 0.0)
+
+    # C[i] = סכום שורות 0..i-1  (שורה אפס בראש)
+    C = np.zeros((n + 1, X.shape[1]), dtype=X.dtype)
+    np.cumsum(X, axis=0, out=C[1:])
+    K = np.zeros((n + 1, X.shape[1]), dtype=np.int64)
+    np.cumsum(valid, axis=0, out=K[1:])
+
+    # כל הבלוקים נבנים בסדר הממוין ומוחזרים לסדר הקלט ב-scatter אחד לכל בלוק
+    names, blocks = [], []
+    prev = C[:-1]                     # C[i] לכל שורה i (סכום עד לפני השורה)
+    prev_k = K[:-1]
+    for w in windows:
+        lo = np.maximum(idx - w, start)
+        s = prev - C[lo]
+        k = prev_k - K[lo]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            m = np.where(k >= max(min_periods, 1), s / k, np.nan)
+        for stat, blk in (("mean", m), ("sum", s), ("count", k)):
+            if stat in stats:
+                names.append([f"{c}_prev{w}_{stat}" for c in value_cols])
+                blocks.append(blk)
+
+    out = {}
+    for cols, blk in zip(names, blocks):
+        if presorted:
+            back = blk
+        else:
+            back = np.empty_like(blk)
+            back[order] = blk
+        for j, c in enumerate(cols):
+            out[c] = back[:, j]
+    return pd.DataFrame(out, index=df.index)
+
+
+# ==============================================================
+# 2) דמו + השוואה מול Q3 (אותו דאטה כמו 09_python_qna_advanced.py)
+# ==============================================================
+
+def _demo_long():
+    """בונה מחדש את matches/long של 09 (אותו seed) – כדי להשוות 1:1 מול Q3."""
+    rng = np.random.default_rng(12)
+    matches = pd.DataFrame({
+        "match_id"     : np.arange(1001, 1031),
+        "match_date"   : pd.to_datetime("2025-06-01") + pd.to_timedelta(rng.integers(0, 45, 30), unit="D"),
+        "home_team_id" : rng.integers(1, 6, 30),
+        "away_team_id" : rng.integers(1, 6, 30),
+        "home_score"   : rng.integers(0, 5, 30),
+        "away_score"   : rng.integers(0, 5, 30),
+    })
+    matches = matches[matches["home_team_id"] != matches["away_team_id"]].reset_index(drop=True)
+    long = pd.concat([
+        matches.rename(columns={"home_team_id":"team_id","home_score":"gf","away_score":"ga"})[["match_id","match_date","team_id","gf","ga"]],
+        matches.rename(columns={"away_team_id":"team_id","away_score":"gf","home_score":"ga"})[["match_id","match_date","team_id","gf","ga"]],
+    ], ignore_index=True)
+    long["pts"] = np.select([long["gf"]>long["ga"], long["gf"]==long["ga"]], [3,1], default=0)
+    return long
+
+
+def demo():
+    print("\n=== rolling_prev vs Q3 ===")
+    long = _demo_long()
+    long_sorted = long.sort_values(["team_id","match_date"])
+
+    # הקוד המקורי של Q3
+    q3 = (long_sorted.groupby("team_id")["pts"]
+          .rolling(5, min_periods=1)
+          .apply(lambda s: s.shift(1).mean(), raw=False)
+          .reset_index(level=0, drop=True))
+    q3_fast = (long_sorted.groupby("team_id")["pts"]
+               .apply(lambda s: s.rolling(5, min_periods=1).mean().shift(1))
+               .reset_index(level=0, drop=True))
+
+    feats = rolling_prev(long_sorted, "team_id", "match_date", ["pts","gf","ga"],
+                         windows=(3, 4, 5, 10), presorted=True)
+
+    # שים לב: ב-Q3 החלון של 5 כולל את השורה הנוכחית, ו-shift(1) מוציא אותה
+    # → avg_pts_prev5 הוא בפועל ממוצע של 4 המשחקים הקודמים.
+    # avg_pts_prev5_fast הוא ממוצע 5 הקודמים.
+    pd.testing.assert_series_equal(feats["pts_prev4_mean"], q3, check_names=False)
+    pd.testing.assert_series_equal(feats["pts_prev5_mean"], q3_fast, check_names=False)
+    print("avg_pts_prev5      == pts_prev4_mean ✔")
+    print("avg_pts_prev5_fast == pts_prev5_mean ✔")
+
+    # גם בלי presorted (המנוע ממיין בעצמו) – אותה תוצאה לפי index
+    feats2 = rolling_prev(long, "team_id", "match_date", ["pts"], windows=(5,))
+    same_order = long.sort_values(["team_id","match_date"], kind="mergesort")
+    pd.testing.assert_series_equal(feats2.loc[same_order.index, "pts_prev5_mean"],
+                                   rolling_prev(same_order, "team_id", "match_date", ["pts"],
+                                                windows=(5,), presorted=True)["pts_prev5_mean"])
+    print(long_sorted.join(feats[["pts_prev5_mean","pts_prev5_count","gf_prev3_sum"]]).head(8))
+
+
+# ==============================================================
+# 3) Benchmark – 10M שורות team-match
+# ==============================================================
+
+def bench(n_rows=10_000_000, n_teams=20_000, lambda_rows=200_000, seed=0):
+    """משווה את המנוע מול groupby.rolling של pandas ומול ה-lambda של Q3 (על תת-מדגם)."""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "team_id": rng.integers(0, n_teams, n_rows),
+        "match_date": pd.Timestamp("2005-01-01") + pd.to_timedelta(rng.integers(0, 7300, n_rows), unit="D"),
+        "gf": rng.integers(0, 6, n_rows),
+        "ga": rng.integers(0, 6, n_rows),
+    })
+    df["pts"] = np.select([df["gf"]>df["ga"], df["gf"]==df["ga"]], [3,1], default=0)
+    print(f"\n=== bench: {n_rows:,} rows, {n_teams:,} teams ===")
+
+    t0 = time.perf_counter()
+    feats = rolling_prev(df, "team_id", "match_date", ["pts","gf","ga"], windows=(3, 5, 10))
+    t_engine = time.perf_counter() - t0
+    print(f"rolling_prev  3 cols × 3 windows × 3 stats : {t_engine:8.2f} s  ({feats.shape[1]} features)")
+
+    s = df.sort_values(["team_id","match_date"], kind="mergesort")
+    t0 = time.perf_counter()
+    for c in ["pts","gf","ga"]:
+        for w in (3, 5, 10):
+            s.groupby("team_id")[c].rolling(w, min_periods=1).mean().groupby(level=0).shift(1)
+    t_pd = time.perf_counter() - t0
+    print(f"pandas groupby.rolling.mean (mean only)     : {t_pd:8.2f} s  (+ sort)")
+
+    sub = s.iloc[:lambda_rows]
+    t0 = time.perf_counter()
+    sub.groupby("team_id")["pts"].rolling(5, min_periods=1).apply(lambda x: x.shift(1).mean(), raw=False)
+    t_lam = time.perf_counter() - t0
+    est = t_lam * n_rows / lambda_rows
+    print(f"Q3 lambda, 1 col × 1 window on {lambda_rows:,} rows : {t_lam:8.2f} s  (≈{est:,.0f} s extrapolated)")
+
+
+if __name__ == "__main__":
+    demo()
+    if "--bench" in sys.argv:
+        bench()
+
+######################################################################
+# 💡 TL;DR:
+# • rolling(...).apply(lambda) = קריאת פייתון לכל חלון → איטי מאוד בקנה מידה.
+# • מיון פעם אחת + cumsum + הפרש → O(n) לכל חלון וכל העמודות יחד.
+# • C[i] - C[lo] לא כולל את שורה i → "עד לפני המשחק" מובטח מבנייה.
+# • שלמים נצברים ב-int64 → אין שגיאות עיגול בסכומים.
+######################################################################
@@ -0,0 +1,295 @@
+######################################################################
+# 📌 14 – Long Table Store: טבלת home/away → long שמתעדכנת רק במחזור החדש
+#
+# מה יש פה:
+#  1) LongStore – מאגר long (שורה = קבוצה × משחק) עם append-only לכל מחזור
+#  2) אגרגציות לקבוצה (W/D/L, gf, ga, pts – כמו Q1–Q3 ב-SQL ו-Q2 ב-09) שמתעדכנות אינקרמנטלית
+#  3) correct() – תיקון רשומות קיימות → rebuild מלא (המקרה היחיד שדורש אותו)
+#  4) Benchmark: 20 עונות היסטוריה, מחזור אחד חדש  (python 14_long_table_store.py --bench)
+#
+# הרעיון:
+#  • ב-Q2 בונים long ע"י concat של שני עותקים של matches כולה – בכל פעם מחדש.
+#  • כאן שומרים buffers של numpy עם הכפלת קיבולת (amortized O(1) לשורה),
+#    ומוסיפים רק את 2×m השורות של המחזור החדש.
+#  • האגרגציות לקבוצה הן סכומים → מעדכנים עם np.add.at על השורות החדשות בלבד.
+#
+# דרישות: pandas, numpy
+######################################################################
+
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+MATCH_COLS = ["match_id", "match_date", "home_team_id", "away_team_id", "home_score", "away_score"]
+AGG_COLS = ["played", "wins", "draws", "losses", "gf", "ga", "pts"]
+
+
+# ==============================================================
+# 1) buffer עם קיבולת גדלה (כמו list.append אבל עמודתי)
+# ==============================================================
+
+class _ColumnBuffer:
+    """עמודות numpy עם קיבולת שמוכפלת לפי הצורך – append ב-O(rows חדשות)."""
+
+    def __init__(self, dtypes, capacity=1024):
+        self.n = 0
+        self._cols = {c: np.empty(capacity, dtype=dt) for c, dt in dtypes.items()}
+
+    def append(self, arrays):
+        m = len(next(iter(arrays.values())))
+        cap = len(next(iter(self._cols.values())))
+        if self.n + m > cap:
+            new_cap = max(2 * cap, self.n + m)
+            for c, a in self._cols.items():
+                grown = np.empty(new_cap, dtype=a.dtype)
+                grown[:self.n] = a[:self.n]
+                self._cols[c] = grown
+        for c, a in arrays.items():
+            self._cols[c][self.n:self.n + m] = a
+        self.n += m
+
+    def view(self, col):
+        return self._cols[col][:self.n]
+
+    def to_frame(self):
+        return pd.DataFrame({c: a[:self.n] for c, a in self._cols.items()})
+
+
+# ==============================================================
+# 2) LongStore
+# ==============================================================
+
+def to_long(matches):
+    """הגרסה הוקטורית של Q2: matches → long (שורת בית + שורת חוץ לכל משחק)."""
+    m = {c: matches[c].to_numpy() for c in MATCH_COLS}
+    gf = np.concatenate([m["home_score"], m["away_score"]]).astype(np.int64)
+    ga = np.concatenate([m["away_score"], m["home_score"]]).astype(np.int64)
+    return {
+        "match_id": np.concatenate([m["match_id"], m["match_id"]]).astype(np.int64),
+        "match_date": np.concatenate([m["match_date"], m["match_date"]]).astype("datetime64[ns]"),
+        "team_id": np.concatenate([m["home_team_id"], m["away_team_id"]]).astype(np.int64),
+        "opp_id": np.concatenate([m["away_team_id"], m["home_team_id"]]).astype(np.int64),
+        "is_home": np.repeat([True, False], len(matches)),
+        "gf": gf,
+        "ga": ga,
+        # ניקוד 3/1/0
+        "pts": np.where(gf > ga, 3, np.where(gf == ga, 1, 0)).astype(np.int64),
+    }
+
+
+class LongStore:
+    """
+    טבלת long ממוטרלת + אגרגציות לקבוצה, עם עדכון אינקרמנטלי למחזור חדש.
+
+    store = LongStore()
+    store.append(new_matches)   # רק שורות matches חדשות (match_id שלא נראה)
+    store.long                  # DataFrame בסגנון Q2 (+ opp_id, is_home)
+    store.per_team()            # played/W/D/L/gf/ga/pts לכל קבוצה
+    store.correct(fixed_rows)   # תיקון משחקים קיימים → rebuild מלא
+    """
+
+    def __init__(self, matches=None):
+        self._reset()
+        if matches is not None:
+            self.append(matches)
+
+    def _reset(self):
+        self._matches = _ColumnBuffer({
+            "match_id": np.int64, "match_date": "datetime64[ns]",
+            "home_team_id": np.int64, "away_team_id": np.int64,
+            "home_score": np.int64, "away_score": np.int64,
+        })
+        self._long = _ColumnBuffer({
+            "match_id": np.int64, "match_date": "datetime64[ns]", "team_id": np.int64,
+            "opp_id": np.int64, "is_home": bool, "gf": np.int64, "ga": np.int64, "pts": np.int64,
+        })
+        self._seen = set()                      # match_id שכבר נכנסו
+        self._team_pos = {}                     # team_id → שורה במערכי האגרגציה
+        self._team_ids = np.empty(0, dtype=np.int64)
+        self._agg = np.zeros((0, len(AGG_COLS)), dtype=np.int64)
+
+    # --- מיפוי team_id → מיקום (רק קבוצות חדשות מגדילות את המערכים) ---
+    def _team_index(self, team_ids):
+        new = [t for t in pd.unique(team_ids) if t not in self._team_pos]
+        if new:
+            for t in new:
+                self._team_pos[t] = len(self._team_pos)
+            self._team_ids = np.concatenate([self._team_ids, np.asarray(new, dtype=np.int64)])
+            self._agg = np.vstack([self._agg, np.zeros((len(new), len(AGG_COLS)), dtype=np.int64)])
+        return np.fromiter((self._team_pos[t] for t in team_ids), dtype=np.int64, count=len(team_ids))
+
+    def append(self, new_matches):
+        """מוסיף משחקים חדשים בלבד; עלות ∝ מספר המשחקים במחזור. מחזיר את מספר השורות שנוספו ל-long."""
+        new_matches = new_matches[MATCH_COLS]
+        ids = new_matches["match_id"].to_numpy()
+        if len(pd.unique(ids)) != len(ids):
+            raise ValueError("duplicate match_id inside the appended batch")
+        clash = [i for i in ids if i in self._seen]
+        if clash:
+            raise ValueError(f"match_id already stored (use correct()): {clash[:5]}")
+
+        self._matches.append({c: new_matches[c].to_numpy() for c in MATCH_COLS})
+        rows = to_long(new_matches)
+        self._long.append(rows)
+        self._seen.update(ids.tolist())
+
+        # עדכון אגרגציות: רק על 2×m השורות החדשות
+        pos = self._team_index(rows["team_id"])
+        gf, ga = rows["gf"], rows["ga"]
+        delta = np.column_stack([
+            np.ones_like(gf), gf > ga, gf == ga, gf < ga, gf, ga, rows["pts"],
+        ]).astype(np.int64)
+        np.add.at(self._agg, pos, delta)
+        return len(gf)
+
+    def correct(self, fixed_matches):
+        """מחליף משחקים קיימים (לפי match_id) ובונה הכל מחדש – O(כל ההיסטוריה)."""
+        fixed = fixed_matches[MATCH_COLS]
+        current = self._matches.to_frame()
+        keep = current[~current["match_id"].isin(fixed["match_id"])]
+        merged = pd.concat([keep, fixed], ignore_index=True).sort_values(["match_date", "match_id"], kind="mergesort")
+        # בונים למצב חדש; אם append נכשל (למשל match_id כפול ב-fixed) – מחזירים את הישן כמו שהוא
+        old = {k: getattr(self, k) for k in ("_matches", "_long", "_seen", "_team_pos", "_team_ids", "_agg")}
+        self._reset()
+        try:
+            self.append(merged)
+        except Exception:
+            self.__dict__.update(old)
+            raise
+
+    @property
+    def long(self):
+        return self._long.to_frame()
+
+    @property
+    def matches(self):
+        return self._matches.to_frame()
+
+    def per_team(self):
+        """טבלת קבוצות (כמו Q1/Q2 ב-SQL): played/W/D/L/gf/ga/pts + gd וממוצע שערים למשחק."""
+        out = pd.DataFrame(self._agg, columns=AGG_COLS)
+        out.insert(0, "team_id", self._team_ids)
+        out["gd"] = out["gf"] - out["ga"]
+        out["gf_per_match"] = out["gf"] / out["played"].where(out["played"] > 0)
+        return out.sort_values("team_id").reset_index(drop=True)
+
+    def __len__(self):
+        return self._long.n
+
+
+# ==============================================================
+# 3) דמו – מחזור אחר מחזור מול rebuild מלא של Q2
+# ==============================================================
+
+def _demo_matches():
+    """אותו matches כמו ב-09_python_qna_advanced.py (seed 12)."""
+    rng = np.random.default_rng(12)
+    matches = pd.DataFrame({
+        "match_id"     : np.arange(1001, 1031),
+        "match_date"   : pd.to_datetime("2025-06-01") + pd.to_timedelta(rng.integers(0, 45, 30), unit="D"),
+        "home_team_id" : rng.integers(1, 6, 30),
+        "away_team_id" : rng.integers(1, 6, 30),
+        "home_score"   : rng.integers(0, 5, 30),
+        "away_score"   : rng.integers(0, 5, 30),
+    })
+    return matches[matches["home_team_id"] != matches["away_team_id"]].reset_index(drop=True)
+
+
+def _q2_per_team(matches):
+    """ה-rebuild המלא של Q2 (concat של שני עותקים) – לצורך השוואה."""
+    long = pd.concat([
+        matches.rename(columns={"home_team_id":"team_id","home_score":"gf","away_score":"ga"})[["match_id","match_date","team_id","gf","ga"]],
+        matches.rename(columns={"away_team_id":"team_id","away_score":"gf","home_score":"ga"})[["match_id","match_date","team_id","gf","ga"]],
+    ], ignore_index=True)
+    long["pts"] = np.select([long["gf"]>long["ga"], long["gf"]==long["ga"]], [3,1], default=0)
+    return long.groupby("team_id", as_index=False)[["gf","ga","pts"]].sum()
+
+
+def demo():
+    print("\n=== LongStore: matchday by matchday ===")
+    matches = _demo_matches()
+    store = LongStore()
+    for day, batch in matches.groupby("match_date", sort=True):
+        store.append(batch)
+
+    full = _q2_per_team(matches)
+    inc = store.per_team()
+    pd.testing.assert_frame_equal(inc[["team_id","gf","ga","pts"]], full, check_dtype=False)
+    assert len(store) == 2 * len(matches)
+    print(inc)
+
+    # תיקון תוצאה → rebuild
+    fix = matches.iloc[[0]].assign(home_score=9)
+    store.correct(fix)
+    fixed_matches = matches.copy()
+    fixed_matches.loc[0, "home_score"] = 9
+    pd.testing.assert_frame_equal(store.per_team()[["team_id","gf","ga","pts"]],
+                                  _q2_per_team(fixed_matches), check_dtype=False)
+    print("incremental == full rebuild ✔ (גם אחרי correct)")
+
+    # correct שנכשל (match_id כפול בתיקון) → ה-store לא נמחק
+    before = store.per_team()
+    try:
+        store.correct(pd.concat([fix, fix]))
+        raise AssertionError("expected ValueError")
+    except ValueError as e:
+        print("⚠️", e)
+    pd.testing.assert_frame_equal(store.per_team(), before)
+    assert len(store) == 2 * len(matches)
+
+
+# ==============================================================
+# 4) Benchmark – 20 עונות, הוספת מחזור אחד
+# ==============================================================
+
+def _synthetic_history(n_seasons=20, n_leagues=50, n_teams=20, seed=0):
+    rng = np.random.default_rng(seed)
+    per_day = n_leagues * n_teams // 2
+    n_days = n_seasons * 2 * (n_teams - 1)
+    n = per_day * n_days
+    home = rng.integers(0, n_leagues * n_teams, n)
+    away = (home + rng.integers(1, n_teams, n)) % (n_leagues * n_teams)
+    return pd.DataFrame({
+        "match_id": np.arange(n),
+        "match_date": pd.Timestamp("2005-08-01") + pd.to_timedelta(np.repeat(np.arange(n_days) * 7, per_day), unit="D"),
+        "home_team_id": home,
+        "away_team_id": away,
+        "home_score": rng.poisson(1.5, n),
+        "away_score": rng.poisson(1.1, n),
+    }), per_day
+
+
+def bench(n_days=20):
+    """בונה store על ההיסטוריה ומודד append של n_days המחזורים האחרונים, אחד אחד."""
+    hist, per_day = _synthetic_history()
+    cut = len(hist) - n_days * per_day
+    print(f"\n=== bench: history {cut:,} matches, matchday {per_day:,} matches ===")
+
+    store = LongStore(hist.iloc[:cut])
+    t_inc = []
+    for start in range(cut, len(hist), per_day):
+        day = hist.iloc[start:start + per_day]
+        t0 = time.perf_counter()
+        store.append(day)
+        t_inc.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    _q2_per_team(hist)
+    t_full = time.perf_counter() - t0
+    print(f"LongStore.append(matchday) : {np.median(t_inc)*1000:8.2f} ms (median of {n_days})")
+    print(f"Q2 full rebuild            : {t_full*1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    demo()
+    if "--bench" in sys.argv:
+        bench()
+
+######################################################################
+# 💡 TL;DR:
+# • long = שתי "נקודות מבט" על כל משחק; אין סיבה לבנות את כולן מחדש בכל מחזור.
+# • buffer עם הכפלת קיבולת → append זול; אגרגציות סכומיות → np.add.at על החדשות.
+# • תיקון רשומה היסטורית משנה סכומים מהעבר → כאן (ורק כאן) עושים rebuild.
+######################################################################
@@ -0,0 +1,257 @@
+######################################################################
+# 📌 15 – Odds Snapshot Index: "האודס האחרונים לפני שריקת הפתיחה" בלי מיון חוזר
+#
+# מה יש פה:
+#  1) OddsSnapshotIndex – נבנה פעם אחת לכל bookmaker, ממוין לפי (match_id, collected_at)
+#  2) asof() – lookup וקטורי (searchsorted) לכל המשחקים ולכמה bookmakers בקריאה אחת
+#  3) השוואה מול merge_asof של Q4 / safe_asof (אותה tolerance, אותה סמנטיקה)
+#  4) Benchmark  (python 15_odds_snapshot_index.py --bench)
+#
+# הרעיון:
+#  • merge_asof ממיין את matches ואת odds בכל קריאה → O(n log n) בכל בניית features.
+#  • כאן ממיינים את odds פעם אחת, ומקודדים כל שורה למפתח int64 מונוטוני:
+#        key = match_code × (U+1) + rank(collected_at)
+#    (rank = מיקום ב-collected_at הייחודיים; כך אין overflow גם בננו-שניות).
+#  • שאילתה (match_id, kickoff) → אותו קידוד → searchsorted(side="right") - 1
+#    = השורה האחרונה של אותו משחק עם collected_at <= kickoff.
+#
+# סמנטיקה (כמו merge_asof direction="backward"):
+#  • allow_exact_matches=True  → collected_at <= kickoff (ברירת המחדל של merge_asof/Q4)
+#  • allow_exact_matches=False → collected_at <  kickoff (כמו SQL Q5 – אנטי-דליפה קשיח)
+#  • tolerance → רק snapshot שגילו <= tolerance; אחרת NaN (כמו ב-merge_asof)
+#
+# דרישות: pandas, numpy
+######################################################################
+
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+PRICE_COLS = ["home_win", "draw", "away_win"]
+
+
+# ==============================================================
+# 1) אינדקס לבוקי יחיד
+# ==============================================================
+
+class _BookIndex:
+    """odds של bookmaker אחד, ממוינים פעם אחת ומקודדים למפתח אחד ממוין."""
+
+    def __init__(self, match_id, collected_at, prices):
+        order = np.lexsort((collected_at, match_id))      # יציב: עדכון מאוחר בקלט מנצח בתיקו
+        self.match_id = match_id[order]
+        self.ts = collected_at[order]
+        self.prices = prices[order]
+
+        self.uniq_mid = np.unique(self.match_id)
+        self.uniq_ts = np.unique(self.ts)
+        self._span = len(self.uniq_ts) + 1
+        code = np.searchsorted(self.uniq_mid, self.match_id)
+        rank = np.searchsorted(self.uniq_ts, self.ts) + 1  # 1..U
+        self.keys = code.astype(np.int64) * self._span + rank
+
+    def lookup(self, q_mid, q_ts, allow_exact_matches=True, tolerance=None):
+        """מחזיר (pos, ok): מיקום השורה האחרונה לפני q_ts לכל שאילתה + מסכת הצלחה."""
+        code = np.searchsorted(self.uniq_mid, q_mid)
+        code_c = np.minimum(code, len(self.uniq_mid) - 1)
+        known = (len(self.uniq_mid) > 0) & (self.uniq_mid[code_c] == q_mid)
+        side = "right" if allow_exact_matches else "left"
+        q_rank = np.searchsorted(self.uniq_ts, q_ts, side=side)  # כמה ts ייחודיים <= (או <) kickoff
+        q_key = code_c.astype(np.int64) * self._span + q_rank
+        pos = np.searchsorted(self.keys, q_key, side="right") - 1
+        pos_c = np.maximum(pos, 0)
+        ok = known & (pos >= 0) & (self.match_id[pos_c] == q_mid)
+        if tolerance is not None:
+            ok &= (q_ts - self.ts[pos_c]) <= tolerance
+        return pos_c, ok
+
+
+# ==============================================================
+# 2) אינדקס לכל הבוקים
+# ==============================================================
+
+class OddsSnapshotIndex:
+    """
+    אינדקס snapshot לאודס: build פעם אחת, asof() לכל בנייה של features.
+
+    idx = OddsSnapshotIndex(odds)                       # odds: match_id, bookmaker, collected_at, מחירים
+    snap = idx.asof(matches, tolerance="7D")           # כל הבוקים, פורמט long (שורה = משחק × בוקי)
+    wide = idx.asof(matches, bookmakers=["BK","PX"], wide=True)
+    """
+
+    def __init__(self, odds, price_cols=PRICE_COLS, bookmaker_col="bookmaker",
+                 match_col="match_id", time_col="collected_at"):
+        self.price_cols = list(price_cols)
+        self.match_col, self.time_col = match_col, time_col
+        self.books = {}
+        # בלי עמודת bookmaker → בוקי אחד בשם "default" (None היה נעלם ב-factorize)
+        book = odds[bookmaker_col].to_numpy() if bookmaker_col in odds else np.full(len(odds), "default", dtype=object)
+        codes, names = pd.factorize(book)
+        mid = odds[match_col].to_numpy()
+        ts = odds[time_col].to_numpy().astype("datetime64[ns]").view(np.int64)
+        px = odds[self.price_cols].to_numpy(dtype=np.float64)
+        for i, name in enumerate(names):
+            sel = codes == i
+            self.books[name] = _BookIndex(mid[sel], ts[sel], px[sel])
+
+    def asof(self, matches, bookmakers=None, on="match_date", tolerance="7D",
+             allow_exact_matches=True, wide=False):
+        """
+        האודס האחרונים לפני kickoff לכל משחק, לכל bookmaker מבוקש.
+
+        matches    : DataFrame עם match_id ועמודת kickoff (on)
+        bookmakers : רשימת בוקים (None = כולם)
+        tolerance  : כמו ב-merge_asof (מחרוזת/Timedelta/None)
+        wide       : True → עמודה לכל (מחיר, בוקי), שורה לכל משחק
+        """
+        books = list(self.books) if bookmakers is None else list(bookmakers)
+        missing = [b for b in books if b not in self.books]
+        if missing:
+            raise KeyError(f"unknown bookmakers: {missing}")
+        tol = None if tolerance is None else pd.Timedelta(tolerance).value
+        q_mid = matches[self.match_col].to_numpy()
+        q_ts = matches[on].to_numpy().astype("datetime64[ns]").view(np.int64)
+
+        parts = []
+        for b in books:
+            bi = self.books[b]
+            pos, ok = bi.lookup(q_mid, q_ts, allow_exact_matches, tol)
+            px = np.where(ok[:, None], bi.prices[pos], np.nan)
+            ts = np.where(ok, bi.ts[pos], np.iinfo(np.int64).min).view("datetime64[ns]")  # min → NaT
+            part = matches.copy()
+            part["bookmaker"] = b
+            part[self.price_cols] = px
+            part[self.time_col] = ts
+            parts.append(part)
+
+        if not wide:
+            return pd.concat(parts, ignore_index=True)
+        out = matches.copy()
+        for b, part in zip(books, parts):
+            for c in self.price_cols + [self.time_col]:
+                out[f"{c}_{b}"] = part[c].to_numpy()
+        return out
+
+
+# ==============================================================
+# 3) דמו – מול merge_asof (Q4 / safe_asof)
+# ==============================================================
+
+def _demo_data():
+    """אותם matches/odds כמו ב-09 (seed 12) + בוקי שני לצורך ההדגמה."""
+    rng = np.random.default_rng(12)
+    matches = pd.DataFrame({
+        "match_id"     : np.arange(1001, 1031),
+        "match_date"   : pd.to_datetime("2025-06-01") + pd.to_timedelta(rng.integers(0, 45, 30), unit="D"),
+        "home_team_id" : rng.integers(1, 6, 30),
+        "away_team_id" : rng.integers(1, 6, 30),
+        "home_score"   : rng.integers(0, 5, 30),
+        "away_score"   : rng.integers(0, 5, 30),
+    })
+    matches = matches[matches["home_team_id"] != matches["away_team_id"]].reset_index(drop=True)
+    odds = (
+        matches[["match_id","match_date"]]
+        .merge(pd.DataFrame({"bookmaker":["BK","PX"]}), how="cross")
+        .assign(
+            collected_at=lambda d: d["match_date"] - pd.to_timedelta(rng.integers(1, 72, len(d)), unit="h"),
+            home_win   = lambda d: np.round(rng.uniform(1.4, 3.2, len(d)), 2),
+            draw       = lambda d: np.round(rng.uniform(2.5, 4.5, len(d)), 2),
+            away_win   = lambda d: np.round(rng.uniform(1.6, 3.8, len(d)), 2),
+        )
+    )
+    extra = odds.sample(frac=0.7, random_state=7).assign(collected_at=lambda d: d["collected_at"] + pd.to_timedelta(rng.integers(1, 36, len(d)), unit="h"))
+    odds = pd.concat([odds, extra], ignore_index=True).drop(columns=["match_date"])
+    return matches, odds
+
+
+def _merge_asof_reference(matches, odds, bookmaker, tolerance="7D", allow_exact_matches=True):
+    """הדרך של Q4/safe_asof – merge_asof עם מיון מחדש של שני הצדדים."""
+    return pd.merge_asof(
+        matches.sort_values("match_date"),
+        odds[odds["bookmaker"] == bookmaker].sort_values("collected_at"),
+        left_on="match_date", right_on="collected_at", by="match_id",
+        direction="backward", tolerance=pd.Timedelta(tolerance),
+        allow_exact_matches=allow_exact_matches,
+    ).sort_values("match_id").reset_index(drop=True)
+
+
+def demo():
+    print("\n=== OddsSnapshotIndex vs merge_asof ===")
+    matches, odds = _demo_data()
+    idx = OddsSnapshotIndex(odds)
+    snap = idx.asof(matches, tolerance="7D")
+
+    cols = ["match_id","bookmaker","collected_at"] + PRICE_COLS
+    for b in ["BK", "PX"]:
+        for exact in (True, False):
+            ref = _merge_asof_reference(matches, odds, b, allow_exact_matches=exact)[cols]
+            got = (idx.asof(matches, bookmakers=[b], allow_exact_matches=exact)
+                   .sort_values("match_id").reset_index(drop=True)[cols])
+            ref["bookmaker"] = b    # merge_asof משאיר NaN בבוקי כשאין התאמה
+            pd.testing.assert_frame_equal(got, ref, check_dtype=False)
+    print("asof == merge_asof (BK, PX × allow_exact) ✔")
+
+    # anti-leak: אף snapshot לא נאסף אחרי kickoff
+    assert (snap["collected_at"].isna() | (snap["collected_at"] <= snap["match_date"])).all()
+    print(idx.asof(matches.head(5), wide=True)[["match_id","match_date","home_win_BK","home_win_PX"]])
+
+    # feed בלי עמודת bookmaker → בוקי יחיד "default"
+    one = odds[odds["bookmaker"] == "BK"].drop(columns="bookmaker")
+    got = OddsSnapshotIndex(one).asof(matches).sort_values("match_id").reset_index(drop=True)
+    assert (got["bookmaker"] == "default").all()
+    assert np.allclose(got["home_win"], idx.asof(matches, bookmakers=["BK"]).sort_values("match_id")["home_win"],
+                       equal_nan=True)
+    print("no bookmaker column → single 'default' book ✔")
+
+
+# ==============================================================
+# 4) Benchmark
+# ==============================================================
+
+def bench(n_matches=1_000_000, updates=5, books=("BK", "PX"), seed=0):
+    rng = np.random.default_rng(seed)
+    matches = pd.DataFrame({
+        "match_id": np.arange(n_matches),
+        "match_date": pd.Timestamp("2010-01-01") + pd.to_timedelta(rng.integers(0, 5000 * 24, n_matches), unit="h"),
+    })
+    n = n_matches * updates * len(books)
+    odds = pd.DataFrame({
+        "match_id": np.tile(np.repeat(matches["match_id"].to_numpy(), updates), len(books)),
+        "bookmaker": np.repeat(np.array(books, dtype=object), n_matches * updates),
+    })
+    kick = np.tile(np.repeat(matches["match_date"].to_numpy(), updates), len(books))
+    odds["collected_at"] = kick - pd.to_timedelta(rng.integers(-6, 240, n), unit="h").to_numpy()
+    for c in PRICE_COLS:
+        odds[c] = rng.uniform(1.2, 6.0, n)
+    odds = odds.sample(frac=1.0, random_state=seed).reset_index(drop=True)   # feed לא ממוין
+    print(f"\n=== bench: {n_matches:,} matches, {n:,} odds rows, {len(books)} bookmakers ===")
+
+    t0 = time.perf_counter()
+    idx = OddsSnapshotIndex(odds)
+    t_build = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    idx.asof(matches)
+    t_query = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for b in books:
+        _merge_asof_reference(matches, odds, b)
+    t_ref = time.perf_counter() - t0
+    print(f"index build (once)           : {t_build:8.2f} s")
+    print(f"index asof (every rebuild)   : {t_query:8.2f} s")
+    print(f"merge_asof per bookmaker     : {t_ref:8.2f} s (every rebuild)")
+
+
+if __name__ == "__main__":
+    demo()
+    if "--bench" in sys.argv:
+        bench()
+
+######################################################################
+# 💡 TL;DR:
+# • מיון אחד של odds לפי (match_id, collected_at) → כל שאילתה היא searchsorted.
+# • קידוד (match, rank(ts)) למפתח int64 אחד = "merge_asof עם by" בלי מיון.
+# • backward + tolerance + allow_exact_matches – אותה סמנטיקה כמו Q4 / safe_asof.
+######################################################################
@@ -0,0 +1,226 @@
+######################################################################
+# 📌 16 – Evaluator להסתברויות: hit@k, log-loss, Brier, RPS – בלי apply לשורה
+#
+# מה יש פה:
+#  1) true_rank / hit_at_k – דירוג ה-label האמיתי בין n תוצאות, בפס וקטורי אחד
+#  2) topk_outcomes – top-k תחזיות לכל שורה עם argpartition (בלי sort מלא)
+#  3) log_loss / brier / rps – מטריקות הסתברותיות לשווקים עם n תוצאות
+#  4) evaluate – טבלת מטריקות כוללת + פירוק לפי league / season / bookmaker
+#  5) השוואה מול Q12 ב-09 + Benchmark על 1M תחזיות  (--bench)
+#
+# הרעיון:
+#  • Q12 ממיין כל שורה בנפרד (apply axis=1) ואז רץ בלולאה על pred.iloc[i].
+#  • מספיק לדעת "כמה תוצאות קיבלו הסתברות גבוהה מה-label האמיתי":
+#        rank = #(p > p_true) + #(p == p_true לפני ה-label)   (0 = המועדף)
+#    ואז hit@j = rank < j לכל j=1..k בבת אחת.
+#  • שבירת תיקו: העמודה הראשונה מנצחת – בדיוק כמו idxmax של Q12.
+#
+# דרישות: pandas, numpy
+######################################################################
+
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+OUTCOMES = ["HOME", "DRAW", "AWAY"]      # סדר אורדינלי (חשוב ל-RPS)
+
+
+# ==============================================================
+# 1) דירוג ו-hit@k
+# ==============================================================
+
+def true_rank(P, y):
+    """מיקום (0-based) של התוצאה האמיתית y בכל שורה של P לפי הסתברות יורדת."""
+    P = np.asarray(P, dtype=np.float64)
+    y = np.asarray(y, dtype=np.int64)
+    p_true = np.take_along_axis(P, y[:, None], axis=1)
+    before = np.arange(P.shape[1])[None, :] < y[:, None]
+    return (P > p_true).sum(axis=1) + ((P == p_true) & before).sum(axis=1)
+
+
+def hit_at_k(P, y, k=2):
+    """מטריצה (n, k) בוליאנית: עמודה j-1 = hit@j."""
+    r = true_rank(P, y)
+    return r[:, None] < np.arange(1, k + 1)[None, :]
+
+
+def topk_outcomes(P, k=2):
+    """אינדקסי k התוצאות הסבירות ביותר לכל שורה (ממוינות), argpartition + sort של k בלבד."""
+    P = np.asarray(P, dtype=np.float64)
+    m = P.shape[1]
+    if k >= m:
+        return np.argsort(-P, axis=1, kind="stable")
+    part = np.argpartition(-P, k - 1, axis=1)[:, :k]
+    vals = np.take_along_axis(P, part, axis=1)
+    # סדר יציב בתוך ה-top-k: הסתברות יורדת, ובתיקו אינדקס עולה
+    order = np.lexsort((part, -vals), axis=1)
+    return np.take_along_axis(part, order, axis=1)
+
+
+# ==============================================================
+# 2) מטריקות הסתברותיות
+# ==============================================================
+
+def log_loss(P, y, eps=1e-15):
+    """-log(p_true) לכל שורה (ממוצע = log-loss)."""
+    p_true = np.take_along_axis(np.asarray(P, dtype=np.float64), np.asarray(y)[:, None], axis=1)[:, 0]
+    return -np.log(np.clip(p_true, eps, 1.0))
+
+
+def brier(P, y):
+    """Brier רב-מחלקתי לכל שורה: Σ_j (p_j - 1[y=j])²."""
+    P = np.asarray(P, dtype=np.float64)
+    d = P.copy()
+    d[np.arange(len(d)), y] -= 1.0
+    return (d * d).sum(axis=1)
+
+
+def rps(P, y):
+    """Ranked Probability Score לכל שורה (תוצאות אורדינליות, למשל HOME<DRAW<AWAY)."""
+    P = np.asarray(P, dtype=np.float64)
+    m = P.shape[1]
+    cp = np.cumsum(P, axis=1)[:, :-1]
+    co = (np.arange(m - 1)[None, :] >= np.asarray(y)[:, None]).astype(np.float64)
+    return ((cp - co) ** 2).sum(axis=1) / (m - 1)
+
+
+# ==============================================================
+# 3) evaluate – טבלה כוללת + פירוק לפי קבוצות
+# ==============================================================
+
+def evaluate(P, y, k=2, groups=None):
+    """
+    מטריקות לכל התחזיות (ואופציונלית לפי קבוצות).
+
+    P      : מטריצת הסתברויות (n, m) – שורה לכל תחזית, עמודה לכל תוצאה
+    y      : אינדקס התוצאה האמיתית (n,)
+    k      : hit@1..hit@k
+    groups : None, או DataFrame/Series/רשימת עמודות באורך n (למשל league, season, bookmaker)
+
+    מחזיר DataFrame: n, hit@1..hit@k, log_loss, brier, rps (שורה אחת, או שורה לכל קבוצה).
+    """
+    P = np.asarray(P, dtype=np.float64)
+    y = np.asarray(y, dtype=np.int64)
+    hits = hit_at_k(P, y, k)
+    rows = pd.DataFrame(hits.astype(np.float64), columns=[f"hit@{j}" for j in range(1, k + 1)])
+    rows["log_loss"] = log_loss(P, y)
+    rows["brier"] = brier(P, y)
+    rows["rps"] = rps(P, y)
+
+    if groups is None:
+        out = rows.mean().to_frame().T
+        out.insert(0, "n", len(rows))
+        return out
+    if isinstance(groups, pd.DataFrame):
+        keys = groups
+    elif isinstance(groups, pd.Series):
+        keys = groups.to_frame()
+    elif isinstance(groups, np.ndarray) and groups.ndim == 2:   # (n, c) – שורה לכל תחזית
+        keys = pd.DataFrame(groups, columns=[f"group{i}" for i in range(groups.shape[1])])
+    elif len(groups) and np.ndim(groups[0]) == 1:        # רשימת עמודות → עמודה לכל איבר (לא שורה)
+        keys = pd.concat([pd.Series(np.asarray(col), name=getattr(col, "name", None) or f"group{i}")
+                          for i, col in enumerate(groups)], axis=1)
+    else:                                                 # עמודה אחת (list/ndarray של labels)
+        keys = pd.DataFrame({"group": np.asarray(groups)})
+    if len(keys) != len(rows):
+        raise ValueError(f"groups has {len(keys)} rows, expected {len(rows)}")
+    keys = keys.reset_index(drop=True)
+    g = rows.groupby([keys[c] for c in keys.columns], sort=True)
+    out = g.mean()
+    out.insert(0, "n", g.size())
+    return out.reset_index()
+
+
+def labels_to_codes(labels, outcomes=OUTCOMES):
+    """'HOME'/'DRAW'/'AWAY' → 0/1/2 (לפי סדר outcomes)."""
+    codes = pd.Categorical(labels, categories=outcomes).codes.astype(np.int64)
+    if (codes < 0).any():
+        raise ValueError("labels outside outcomes")
+    return codes
+
+
+# ==============================================================
+# 4) דמו – מול הקוד של Q12
+# ==============================================================
+
+def _q12_hits(pred):
+    """הקוד המקורי של Q12 (idxmax + apply לשורה + לולאה)."""
+    argmax = pred[["p_home","p_draw","p_away"]].idxmax(axis=1).str.replace("p_","").str.upper()
+    hit1 = (argmax == pred["label"]).mean()
+    top2 = pred[["p_home","p_draw","p_away"]].apply(lambda r: r.sort_values(ascending=False).index[:2], axis=1).apply(lambda idx: set(idx.str.replace("p_","").str.upper()))
+    hit2 = np.mean([pred.iloc[i]["label"] in s for i, s in enumerate(top2)])
+    return hit1, hit2
+
+
+def _random_pred(n, seed=0):
+    rng = np.random.default_rng(seed)
+    odds = np.round(rng.uniform(1.3, 6.0, (n, 3)), 2)
+    inv = 1 / odds
+    P = inv / inv.sum(axis=1, keepdims=True)
+    y = (rng.random(n)[:, None] > np.cumsum(P, axis=1)).sum(axis=1)
+    pred = pd.DataFrame(P, columns=["p_home","p_draw","p_away"])
+    pred["label"] = np.array(OUTCOMES)[y]
+    pred["league"] = rng.choice(["EPL","LaLiga","SerieA"], n)
+    pred["season"] = rng.choice([2023, 2024], n)
+    pred["bookmaker"] = rng.choice(["BK","PX"], n)
+    return pred
+
+
+def demo():
+    print("\n=== evaluator vs Q12 ===")
+    pred = _random_pred(2_000)
+    P = pred[["p_home","p_draw","p_away"]].to_numpy()
+    y = labels_to_codes(pred["label"])
+
+    hit1, hit2 = _q12_hits(pred)
+    res = evaluate(P, y, k=2)
+    assert np.isclose(res.loc[0, "hit@1"], hit1) and np.isclose(res.loc[0, "hit@2"], hit2)
+    print(res.round(4))
+    print("hit@1 / hit@2 == Q12 ✔")
+
+    # בדיקת top-k מול argsort מלא
+    top = topk_outcomes(P, 2)
+    assert (top == np.argsort(-P, axis=1, kind="stable")[:, :2]).all()
+
+    print(evaluate(P, y, k=2, groups=pred[["league","season","bookmaker"]]).round(3).head(6))
+
+
+# ==============================================================
+# 5) Benchmark – 1M תחזיות
+# ==============================================================
+
+def bench(n=1_000_000, q12_rows=20_000):
+    pred = _random_pred(n)
+    P = pred[["p_home","p_draw","p_away"]].to_numpy()
+    print(f"\n=== bench: {n:,} predictions × 3 outcomes ===")
+
+    t0 = time.perf_counter()
+    y = labels_to_codes(pred["label"])
+    evaluate(P, y, k=2)
+    t_vec = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    evaluate(P, y, k=2, groups=pred[["league","season","bookmaker"]])
+    t_grp = time.perf_counter() - t0
+
+    sub = pred.iloc[:q12_rows]
+    t0 = time.perf_counter()
+    _q12_hits(sub)
+    t_q12 = time.perf_counter() - t0
+    print(f"evaluate (hit@1..2, logloss, brier, rps) : {t_vec:8.2f} s")
+    print(f"evaluate + groups (league×season×book)  : {t_grp:8.2f} s")
+    print(f"Q12 hit@1/hit@2 on {q12_rows:,} rows        : {t_q12:8.2f} s  (≈{t_q12 * n / q12_rows:,.0f} s for {n:,})")
+
+
+if __name__ == "__main__":
+    demo()
+    if "--bench" in sys.argv:
+        bench()
+
+######################################################################
+# 💡 TL;DR:
+# • hit@k לא צריך sort לכל שורה – מספיק rank של ה-label (השוואה וקטורית אחת).
+# • top-k בפועל: argpartition (O(m)) ואז sort של k בלבד.
+# • log-loss/Brier/RPS – כולן reductions על מטריצה (n, m); groupby רק על התוצאות לשורה.
+######################################################################
@@ -0,0 +1,201 @@
+######################################################################
+# 📌 17 – נרמול Odds → הסתברויות: proportional / Shin / power + overround
+#
+# מה יש פה:
+#  1) normalize_odds – מערך (n_snapshots, n_outcomes) → הסתברויות + overround בפס אחד
+#  2) שלוש שיטות להסרת margin: proportional (כמו Q12 / SQL Q6), Shin, power
+#  3) כתיבה in-place ל-buffers מוקצים מראש ב-float32 (chunk אחרי chunk)
+#  4) Benchmark בשורות לשנייה  (python 17_odds_normalization.py --bench)
+#
+# תזכורת:
+#  • π_i = 1/odds_i ;  B = Σπ_i ;  overround (margin) = B - 1
+#  • proportional : p_i = π_i / B
+#  • power        : p_i = π_i^k, כש-k נבחר כך ש-Σ π_i^k = 1   (Newton וקטורי)
+#  • Shin         : p_i = (sqrt(z² + 4(1-z)·π_i²/B) - z) / (2(1-z)),
+#                   z ∈ [0,1) נבחר כך ש-Σp_i = 1          (Newton וקטורי)
+#  • power ו-Shin מורידים יותר margin מה-longshots (favourite-longshot bias).
+#
+# דרישות: numpy (pandas רק לדמו)
+######################################################################
+
+import sys
+import time
+
+import numpy as np
+
+METHODS = ("proportional", "shin", "power")
+
+
+# ==============================================================
+# 1) פותרים לכל שיטה (על בלוק float64)
+# ==============================================================
+
+def _proportional(pi, B):
+    return pi / B[:, None]
+
+
+def _power(pi, B, tol=1e-12, max_iter=50):
+    """Newton על k לכל השורות במקביל; שורות שהתכנסו נעצרות."""
+    logpi = np.log(pi)
+    k = np.ones(len(pi))
+    active = np.ones(len(pi), dtype=bool)
+    for _ in range(max_iter):
+        if not active.any():
+            break
+        pk = np.exp(logpi[active] * k[active, None])
+        f = pk.sum(axis=1) - 1.0
+        df = (pk * logpi[active]).sum(axis=1)
+        step = f / df
+        k[active] -= step
+        active[active] = np.abs(step) > tol
+    return np.exp(logpi * k[:, None])
+
+
+def _shin_p(q, z):
+    z = z[:, None]
+    return (np.sqrt(z * z + (1 - z) * q) - z) / (2 * (1 - z))
+
+
+def _shin(pi, B, tol=1e-12, max_iter=50):
+    """
+    Newton על z לכל השורות במקביל. Σp_i = 1 שקול ל-
+        g(z) = Σ sqrt(z² + (1-z)·q_i) - (m-2)·z - 2 = 0,   q_i = 4π_i²/B
+    """
+    q = 4.0 * pi * pi / B[:, None]
+    m = pi.shape[1]
+    has_margin = B > 1.0
+    z = np.zeros(len(pi))
+    active = has_margin.copy()
+    for _ in range(max_iter):
+        if not active.any():
+            break
+        za = z[active]
+        qa = q[active]
+        r = np.sqrt(za[:, None] ** 2 + (1 - za[:, None]) * qa)
+        g = r.sum(axis=1) - (m - 2) * za - 2.0
+        dg = ((2 * za[:, None] - qa) / (2 * r)).sum(axis=1) - (m - 2)
+        new = np.clip(za - g / dg, 0.0, 0.999)
+        z[active] = new
+        active[active] = np.abs(new - za) > tol
+    # B <= 1 (אין margin) → z = 0 → נרמול רגיל
+    p = _shin_p(q, np.where(has_margin, z, 0.0))
+    return p / p.sum(axis=1, keepdims=True)   # ניקוי שארית האיטרציה
+
+
+_SOLVERS = {"proportional": _proportional, "power": _power, "shin": _shin}
+
+
+# ==============================================================
+# 2) API
+# ==============================================================
+
+def normalize_odds(odds, method="proportional", out=None, overround_out=None,
+                   chunk_rows=65_536, dtype=np.float32):
+    """
+    odds (decimal) → הסתברויות בלי margin + overround.
+
+    odds          : מערך (n, m) של odds עשרוניים (>1)
+    method        : "proportional" / "shin" / "power"
+    out           : buffer (n, m) מוקצה מראש (נכתב in-place); None → מוקצה כאן
+    overround_out : buffer (n,) ל-overround (Σ1/odds - 1); None → מוקצה כאן
+    chunk_rows    : גודל בלוק לחישוב ב-float64 (זיכרון זמני חסום)
+    dtype         : dtype של buffers שמוקצים כאן (ברירת מחדל float32)
+
+    מחזיר (out, overround_out). שורות עם odds לא חוקיים (<=1 / NaN) → NaN.
+    """
+    if method not in _SOLVERS:
+        raise ValueError(f"method must be one of {METHODS}")
+    odds = np.asarray(odds)
+    if odds.ndim != 2:
+        raise ValueError("odds must be 2-D (n_snapshots, n_outcomes)")
+    n, m = odds.shape
+    if out is None:
+        out = np.empty((n, m), dtype=dtype)
+    if overround_out is None:
+        overround_out = np.empty(n, dtype=dtype)
+    if out.shape != (n, m) or overround_out.shape != (n,):
+        raise ValueError("output buffers have the wrong shape")
+
+    solver = _SOLVERS[method]
+    for a in range(0, n, chunk_rows):
+        b = min(a + chunk_rows, n)
+        o = odds[a:b].astype(np.float64, copy=False)
+        ok = np.isfinite(o).all(axis=1) & (o > 1.0).all(axis=1)
+        pi = 1.0 / np.where(ok[:, None], o, 2.0)
+        B = pi.sum(axis=1)
+        p = solver(pi, B)
+        p[~ok] = np.nan
+        out[a:b] = p
+        overround_out[a:b] = np.where(ok, B - 1.0, np.nan)
+    return out, overround_out
+
+
+# ==============================================================
+# 3) דמו – proportional מול Q12, ובדיקות שפיות לשאר
+# ==============================================================
+
+def demo():
+    import pandas as pd
+
+    print("\n=== normalize_odds ===")
+    rng = np.random.default_rng(12)
+    snap = pd.DataFrame({
+        "home_win": np.round(rng.uniform(1.4, 3.2, 10), 2),
+        "draw"    : np.round(rng.uniform(2.5, 4.5, 10), 2),
+        "away_win": np.round(rng.uniform(1.6, 3.8, 10), 2),
+    })
+    # Q12 (עמודה אחרי עמודה)
+    inv_sum = (1/snap["home_win"] + 1/snap["draw"] + 1/snap["away_win"])
+    q12 = np.column_stack([(1/snap[c]) / inv_sum for c in ["home_win","draw","away_win"]])
+
+    O = snap.to_numpy()
+    P = np.empty(O.shape, dtype=np.float32)
+    margin = np.empty(len(O), dtype=np.float32)
+    normalize_odds(O, "proportional", out=P, overround_out=margin)
+    assert np.allclose(P, q12, atol=1e-6)
+    assert np.allclose(margin, inv_sum - 1, atol=1e-6)
+    print("proportional == Q12 ✔")
+
+    res = {"overround": margin}
+    for mth in METHODS:
+        Pm, _ = normalize_odds(O, mth, dtype=np.float64)
+        assert np.allclose(Pm.sum(axis=1), 1.0)
+        res[f"p_home_{mth}"] = Pm[:, 0]
+        res[f"p_away_{mth}"] = Pm[:, 2]
+    print(pd.DataFrame(res).round(4).head())
+
+    # Shin ו-power מורידים יותר margin מה-longshot (odds גבוה) ביחס ל-proportional
+    wide = np.array([[1.25, 6.0, 12.0]])
+    for mth in METHODS:
+        print(f"{mth:13s}", np.round(normalize_odds(wide, mth, dtype=np.float64)[0][0], 4))
+
+
+# ==============================================================
+# 4) Benchmark – rows/sec
+# ==============================================================
+
+def bench(n=10_000_000, m=3, seed=0):
+    rng = np.random.default_rng(seed)
+    fair = rng.dirichlet(np.ones(m) * 3, n)
+    odds = (1.0 / (fair * rng.uniform(1.02, 1.10, (n, 1)))).astype(np.float32)
+    P = np.empty((n, m), dtype=np.float32)
+    over = np.empty(n, dtype=np.float32)
+    print(f"\n=== bench: {n:,} snapshots × {m} outcomes (float32 in/out) ===")
+    for mth in METHODS:
+        t0 = time.perf_counter()
+        normalize_odds(odds, mth, out=P, overround_out=over)
+        dt = time.perf_counter() - t0
+        print(f"{mth:13s}: {dt:7.2f} s  → {n / dt:14,.0f} rows/s")
+
+
+if __name__ == "__main__":
+    demo()
+    if "--bench" in sys.argv:
+        bench()
+
+######################################################################
+# 💡 TL;DR:
+# • נרמול = פעולה על שורות של מטריצה; אין סיבה לעבור עמודה-עמודה ב-pandas.
+# • Newton / bisection וקטוריים פותרים מיליוני משוואות במקביל.
+# • buffers של float32 מוקצים פעם אחת; float64 רק בבלוק הזמני.
+######################################################################
@@ -0,0 +1,239 @@
+######################################################################
+# 📌 18 – Streaming CSV Ingest: חוקי Q1 (NA/תאריכים/טיפוסים/QA) chunk אחרי chunk
+#
+# מה יש פה:
+#  1) clean_chunk – אותם חוקים של Q1 ב-09, על chunk בודד
+#  2) KeyHashSet – סט קומפקטי של hash-ים (8 bytes למפתח) לבדיקת ייחודיות בין chunks
+#  3) ingest_csv – read_csv(chunksize) → ניקוי → QA → כתיבה מצטברת ל-Parquet
+#  4) דמו עם קובץ "מלוכלך" + מדידת peak memory (tracemalloc)
+#
+# הרעיון:
+#  • Q1 קורא את כל הקובץ, ואז to_datetime/astype/asserts על כל ה-frame.
+#    בקובץ של עשרות GB זה פשוט לא נכנס לזיכרון.
+#  • כאן כל chunk עובר את אותם חוקים ונכתב מיד כ-row group ב-Parquet.
+#  • is_unique בין chunks: לא שומרים את המפתחות עצמם – רק hash של 64 ביט,
+#    ב"ריצות" ממוינות שמתמזגות לפי גודל (size-tiered, כמו LSM) → חיפוש searchsorted;
+#    כל מפתח נכתב מחדש O(log n) פעמים, לא בכל מיזוג.
+#  • peak memory ∝ chunksize (+ 8 bytes לכל מפתח ייחודי), לא ∝ גודל הקובץ.
+#
+# הערה על תאריכים: infer_datetime_format של Q1 מסיק פורמט לפי השורה הראשונה –
+# ובקריאה ב-chunks כל chunk היה מסיק פורמט אחר. לכן ברירת המחדל כאן היא
+# format="mixed" (פענוח לכל ערך, pandas>=2) או date_format מפורש.
+#
+# דרישות: pandas, numpy, pyarrow (לכתיבת Parquet)
+######################################################################
+
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+NA_VALUES = ["", " ", "NA", "null"]
+Q1_DTYPES = {"order_id": "Int64", "customer_id": "Int64", "amount": "float64"}
+Q1_DATES = ["order_date"]
+
+
+# ==============================================================
+# 1) ניקוי chunk בודד (החוקים של Q1)
+# ==============================================================
+
+def clean_chunk(chunk, dtypes=Q1_DTYPES, date_cols=Q1_DATES, date_format=None):
+    """תאריכים עם errors='coerce' (שגוי → NaT) + nullable Int64/float לפי dtypes."""
+    for c in date_cols:
+        chunk[c] = pd.to_datetime(chunk[c], errors="coerce", format=date_format or "mixed")
+    return chunk.astype(dtypes)
+
+
+# ==============================================================
+# 2) סט hash-ים קומפקטי
+# ==============================================================
+
+def hash_keys(df, cols):
+    """hash של 64 ביט לכל שורה לפי עמודות המפתח (גם מפתח מורכב)."""
+    return pd.util.hash_pandas_object(df[cols], index=False).to_numpy()
+
+
+class KeyHashSet:
+    """
+    סט של uint64 ב-"ריצות" ממוינות. add_batch מחזיר מסכה של hash-ים שכבר נראו
+    (בתוך ה-batch או קודם). זיכרון ≈ 8 bytes למפתח ייחודי.
+    מיזוג size-tiered: הריצה החדשה מתמזגת לקודמת כל עוד היא לפחות בגודלה → O(log n) ריצות;
+    max_runs – תקרה קשיחה למספר הריצות (מיזוג הזנב גם אם הגדלים לא שווים).
+    """
+
+    def __init__(self, max_runs=8):
+        self.runs = []
+        self.max_runs = max_runs
+
+    def __len__(self):
+        return sum(len(r) for r in self.runs)
+
+    def __contains__(self, h):
+        return bool(self.contains(np.array([h], dtype=np.uint64))[0])
+
+    def contains(self, h):
+        found = np.zeros(len(h), dtype=bool)
+        for r in self.runs:
+            pos = np.minimum(np.searchsorted(r, h), len(r) - 1)
+            found |= r[pos] == h
+        return found
+
+    def add_batch(self, h):
+        h = np.asarray(h, dtype=np.uint64)
+        order = np.argsort(h, kind="stable")
+        hs = h[order]
+        dup_sorted = np.zeros(len(hs), dtype=bool)
+        dup_sorted[1:] = hs[1:] == hs[:-1]            # כפילות בתוך ה-batch
+        dup = np.empty(len(h), dtype=bool)
+        dup[order] = dup_sorted
+        dup |= self.contains(h)                        # כפילות מול מה שכבר נראה
+
+        new = np.unique(hs)
+        new = new[~self.contains(new)] if self.runs else new
+        if len(new):
+            self.runs.append(new)
+        runs = self.runs
+        while len(runs) > 1 and (len(runs[-1]) >= len(runs[-2]) or len(runs) > self.max_runs):
+            last = runs.pop()                          # הריצות זרות (new סונן) → מספיק sort
+            runs[-1] = np.sort(np.concatenate([runs[-1], last]), kind="stable")
+        return dup
+
+
+# ==============================================================
+# 3) ingest_csv
+# ==============================================================
+
+def ingest_csv(src, dst, key_cols=("order_id",), nonneg_cols=("amount",),
+               chunksize=1_000_000, dtypes=Q1_DTYPES, date_cols=Q1_DATES,
+               date_format=None, row_group_rows=None, on_error="raise"):
+    """
+    CSV ענק → Parquet, chunk אחרי chunk, עם חוקי Q1.
+
+    src / dst      : נתיב CSV / נתיב Parquet לכתיבה
+    key_cols       : מפתח שחייב להיות ייחודי בכל הקובץ (None/() = בלי בדיקה)
+    nonneg_cols    : עמודות שאסור שיהיו שליליות (כמו amount.ge(0) ב-Q1)
+    chunksize      : שורות לכל chunk (קובע את ה-peak memory)
+    row_group_rows : גודל row group ב-Parquet (ברירת מחדל = chunksize)
+    on_error       : "raise" – לעצור (כמו assert של Q1) | "drop" – להשמיט שורות פסולות ולספור
+
+    מחזיר dict סטטיסטיקות: rows, chunks, dropped, bad_dates, null_keys, seconds.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if on_error not in ("raise", "drop"):
+        raise ValueError("on_error must be 'raise' or 'drop'")
+    key_cols = list(key_cols or [])
+    seen = KeyHashSet()
+    stats = {"rows": 0, "chunks": 0, "dropped": 0, "bad_dates": 0, "null_keys": 0}
+    writer = None
+    t0 = time.perf_counter()
+    reader = pd.read_csv(src, na_values=NA_VALUES, chunksize=chunksize,
+                         dtype={c: "string" for c in date_cols})
+    try:
+        for i, chunk in enumerate(reader):
+            raw_dates = chunk[date_cols].notna()
+            chunk = clean_chunk(chunk, dtypes, date_cols, date_format)
+            stats["bad_dates"] += int((raw_dates & chunk[date_cols].isna()).to_numpy().sum())
+
+            bad = np.zeros(len(chunk), dtype=bool)
+            for c in nonneg_cols:
+                neg = chunk[c].lt(0).fillna(False).to_numpy(dtype=bool)
+                if neg.any() and on_error == "raise":
+                    raise ValueError(f"chunk {i}: {c} שלילי! ({int(neg.sum())} שורות)")
+                bad |= neg
+            if key_cols:
+                null_key = chunk[key_cols].isna().any(axis=1).to_numpy()
+                stats["null_keys"] += int(null_key.sum())
+                dup = seen.add_batch(hash_keys(chunk, key_cols))
+                dup &= ~null_key
+                if dup.any() and on_error == "raise":
+                    sample = chunk.loc[dup, key_cols].head().to_dict("records")
+                    raise ValueError(f"chunk {i}: {key_cols} לא ייחודי, למשל {sample}")
+                bad |= dup
+            if bad.any():
+                chunk = chunk[~bad]
+                stats["dropped"] += int(bad.sum())
+
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(dst, table.schema)
+            else:
+                table = table.cast(writer.schema)
+            writer.write_table(table, row_group_size=row_group_rows or chunksize)
+            stats["rows"] += len(chunk)
+            stats["chunks"] += 1
+    finally:
+        if writer is not None:
+            writer.close()
+    stats["seconds"] = round(time.perf_counter() - t0, 3)
+    stats["distinct_keys"] = len(seen)
+    return stats
+
+
+# ==============================================================
+# 4) דמו – קובץ מלוכלך + peak memory
+# ==============================================================
+
+def _write_dirty_csv(path, n_rows, seed=0):
+    """CSV בסגנון csv_like של Q1: פורמטים מעורבים, רווחים במקום NA, כמה תאריכים שבורים."""
+    rng = np.random.default_rng(seed)
+    dates = pd.Timestamp("2025-01-01") + pd.to_timedelta(rng.integers(0, 365, n_rows), unit="D")
+    fmt = rng.integers(0, 3, n_rows)
+    d_iso, d_slash, d_us = dates.strftime("%Y-%m-%d"), dates.strftime("%Y/%m/%d"), dates.strftime("%m-%d-%Y")
+    date_s = np.where(fmt == 0, d_iso, np.where(fmt == 1, d_slash, d_us)).astype(object)
+    date_s[rng.random(n_rows) < 0.001] = "not-a-date"
+    cust = rng.integers(1, 50_000, n_rows).astype(str).astype(object)
+    cust[rng.random(n_rows) < 0.01] = " "
+    pd.DataFrame({
+        "order_id": np.arange(100_000, 100_000 + n_rows),
+        "customer_id": cust,
+        "order_date": date_s,
+        "amount": np.round(rng.gamma(2.0, 60.0, n_rows), 2),
+    }).to_csv(path, index=False)
+
+
+def demo(n_rows=300_000, chunksize=50_000):
+    import tracemalloc
+
+    print("\n=== streaming ingest ===")
+    with tempfile.TemporaryDirectory(prefix="ingest_") as d:
+        tmp = Path(d)
+        src, dst = tmp / "orders.csv", tmp / "orders.parquet"
+        _write_dirty_csv(src, n_rows)
+
+        tracemalloc.start()
+        stats = ingest_csv(src, dst, chunksize=chunksize)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(stats)
+        print(f"csv {src.stat().st_size/1e6:.1f} MB → parquet {dst.stat().st_size/1e6:.1f} MB, "
+              f"peak traced memory {peak/1e6:.1f} MB (chunksize={chunksize:,})")
+
+        back = pd.read_parquet(dst)
+        assert len(back) == n_rows and back["order_id"].is_unique
+        print(back.dtypes.to_dict())
+
+        # כפילות בין chunks → נתפסת גם כשהיא ב-chunk אחר
+        with open(src, "a") as f:
+            f.write("100003,1,2025-07-01,10\n")
+        try:
+            ingest_csv(src, tmp / "dup.parquet", chunksize=chunksize)
+        except ValueError as e:
+            print("⚠️", e)
+        stats = ingest_csv(src, tmp / "dup.parquet", chunksize=chunksize, on_error="drop")
+        print("on_error='drop' →", {k: stats[k] for k in ("rows", "dropped")})
+
+
+if __name__ == "__main__":
+    demo(*(int(a) for a in sys.argv[1:3]))
+
+######################################################################
+# 💡 TL;DR:
+# • read_csv(chunksize=...) + ParquetWriter = זיכרון קבוע, לא משנה כמה גדול הקובץ.
+# • ייחודיות בין chunks: hash של 64 ביט במקום המפתחות עצמם (8 bytes למפתח).
+# • תאריכים בפורמט מעורב – format="mixed" / date_format מפורש, לא הסקה לכל chunk.
+######################################################################
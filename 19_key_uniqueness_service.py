@@ -0,0 +1,248 @@
+######################################################################
+# 📌 19 – Key Uniqueness Service: check_unique על דאטהסט מחולק (partitions)
+#
+# מה יש פה:
+#  1) KeyRegistry – טבלת hash-ים של מפתחות על דיסק (np.memmap), נשמרת בין ריצות
+#  2) ingest(partition, df) – מוסיף partition בודד ומחזיר כפילויות + מאיזה partition הגיעו
+#  3) duplicates() – דו"ח מצטבר (מפתח, partition ראשון, partition כפול)
+#  4) דמו: order_id ו-(league, season, match_date, teams) של SQL Q15 על פני partitions
+#
+# הרעיון:
+#  • check_unique ב-Q15 עושה duplicated() על frame אחד בזיכרון – לא רואה בין קבצים.
+#  • כאן כל מפתח (גם מורכב) → hash של 64 ביט + מזהה partition של 32 ביט = 12 bytes.
+#    ה-dtypes של המפתח נקבעים ב-partition הראשון ונשמרים ב-manifest; כל partition מומר אליהם
+#    לפני ה-hash (אחרת 2024-08-10 ב-us ≠ אותו תאריך ב-ns, 1 ≠ 1.0).
+#  • הטבלה היא "ריצות" ממוינות על דיסק (כל ingest = ריצה חדשה), נפתחות ב-mmap;
+#    חיפוש = searchsorted בכל ריצה; כשיש יותר מדי ריצות – compaction לריצה אחת.
+#  • זיכרון פעיל ∝ גודל ה-partition הנוכחי; הטבלה עצמה ב-page cache של מערכת ההפעלה.
+#  • hash של 64 ביט: סיכוי התנגשות ~ n²/2^65 (≈3% ב-10^9 מפתחות ייחודיים) → הדו"ח
+#    שומר גם את ערכי המפתח מהצד החדש כדי לאמת ידנית.
+#
+# דרישות: pandas, numpy
+######################################################################
+
+import json
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+_HASH = np.dtype("<u8")
+_PART = np.dtype("<u4")
+
+
+def key_dtype(s):
+    """dtype מנורמל לעמודת מפתח: datetime → ns, int / Int → Int64 (אותו hash כמו int64), float → float64."""
+    if pd.api.types.is_datetime64_any_dtype(s):
+        return str(s.dt.as_unit("ns").dtype)
+    if pd.api.types.is_bool_dtype(s):
+        return "bool"
+    if pd.api.types.is_integer_dtype(s):
+        return "Int64"
+    if pd.api.types.is_float_dtype(s):
+        return "float64"
+    return "object"
+
+
+def hash_keys(df, cols, dtypes=None):
+    """
+    hash של 64 ביט לכל שורה לפי עמודות המפתח. hash תלוי dtype (ns מול us, int מול float) →
+    כל עמודה מומרת קודם ל-dtypes (ברירת מחדל: key_dtype שלה).
+    """
+    cols = list(cols)
+    dtypes = dtypes or {c: key_dtype(df[c]) for c in cols}
+    keys = {}
+    for c in cols:
+        try:
+            keys[c] = df[c].astype(dtypes[c])
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"key column {c!r} ({df[c].dtype}) cannot be cast to {dtypes[c]}: {e}") from e
+    return pd.util.hash_pandas_object(pd.DataFrame(keys), index=False).to_numpy().astype(_HASH)
+
+
+class KeyRegistry:
+    """
+    רישום מפתחות ייחודיים על דיסק.
+
+    reg = KeyRegistry("keys/matches", key_cols=["league","season","match_date","home_team_id","away_team_id"])
+    dups = reg.ingest("2024-08", part_df)   # DataFrame של כפילויות (ריק אם הכל תקין)
+    reg.duplicates()                        # כל הכפילויות שנמצאו עד עכשיו
+    """
+
+    def __init__(self, path, key_cols=None, max_runs=16):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._manifest_path = self.path / "manifest.json"
+        if self._manifest_path.exists():
+            self.manifest = json.loads(self._manifest_path.read_text(encoding="utf-8"))
+            if key_cols is not None and list(key_cols) != self.manifest["key_cols"]:
+                raise ValueError(f"registry was created for {self.manifest['key_cols']}")
+        else:
+            if key_cols is None:
+                raise ValueError("key_cols is required for a new registry")
+            self.manifest = {"key_cols": list(key_cols), "partitions": [], "runs": [], "next_run": 0}
+            self._save_manifest()
+        self.key_cols = self.manifest["key_cols"]
+        self.max_runs = max_runs
+
+    # --- קבצים ---
+    def _save_manifest(self):
+        tmp = self._manifest_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+        tmp.replace(self._manifest_path)
+
+    def _open_run(self, run):
+        n = run["n"]
+        h = np.memmap(self.path / f"{run['name']}.hash", dtype=_HASH, mode="r", shape=(n,))
+        p = np.memmap(self.path / f"{run['name']}.part", dtype=_PART, mode="r", shape=(n,))
+        return h, p
+
+    def _write_run(self, hashes, parts):
+        name = f"run{self.manifest['next_run']:06d}"
+        self.manifest["next_run"] += 1
+        hashes.astype(_HASH).tofile(self.path / f"{name}.hash")
+        parts.astype(_PART).tofile(self.path / f"{name}.part")
+        return {"name": name, "n": int(len(hashes))}
+
+    # --- חיפוש ---
+    def _lookup(self, h):
+        """לכל hash: partition id שבו נראה לראשונה, או -1."""
+        found = np.full(len(h), -1, dtype=np.int64)
+        for run in self.manifest["runs"]:
+            rh, rp = self._open_run(run)
+            pos = np.minimum(np.searchsorted(rh, h), len(rh) - 1)
+            hit = (rh[pos] == h) & (found < 0)
+            found[hit] = rp[pos[hit]]
+        return found
+
+    def __len__(self):
+        return sum(r["n"] for r in self.manifest["runs"])
+
+    @property
+    def partitions(self):
+        return list(self.manifest["partitions"])
+
+    # --- API ---
+    def ingest(self, partition, df):
+        """מוסיף partition; מחזיר DataFrame של שורות שהמפתח שלהן כבר קיים (כולל בתוך ה-partition)."""
+        partition = str(partition)
+        if partition in self.manifest["partitions"]:
+            raise ValueError(f"partition {partition!r} already ingested")
+        pid = len(self.manifest["partitions"])
+        if "key_dtypes" not in self.manifest:
+            self.manifest["key_dtypes"] = {c: key_dtype(df[c]) for c in self.key_cols}
+        h = hash_keys(df, self.key_cols, self.manifest["key_dtypes"])
+
+        # כפילות מול partitions קודמים
+        first = self._lookup(h)
+        # כפילות בתוך ה-partition: כל מופע מלבד הראשון
+        order = np.argsort(h, kind="stable")
+        hs = h[order]
+        inner = np.zeros(len(h), dtype=bool)
+        inner[order[1:]] = hs[1:] == hs[:-1]
+        first = np.where((first < 0) & inner, pid, first)
+
+        is_dup = first >= 0
+        dups = df.loc[is_dup, self.key_cols].reset_index(drop=True)
+        dups["key_hash"] = h[is_dup]
+        dups["first_partition"] = [self.manifest["partitions"][i] if i < pid else partition for i in first[is_dup]]
+        dups["dup_partition"] = partition
+        if len(dups):
+            log = self.path / "duplicates.csv"
+            dups.to_csv(log, mode="a", header=not log.exists(), index=False)
+
+        new = np.unique(hs)
+        new = new[self._lookup(new) < 0]
+        self.manifest["partitions"].append(partition)
+        if len(new):
+            self.manifest["runs"].append(self._write_run(new, np.full(len(new), pid)))
+        if len(self.manifest["runs"]) > self.max_runs:
+            self.compact()
+        self._save_manifest()
+        return dups
+
+    def compact(self):
+        """ממזג את כל הריצות לריצה ממוינת אחת (בקריאה אחת מ-mmap)."""
+        runs = self.manifest["runs"]
+        if len(runs) <= 1:
+            return
+        hs, ps = zip(*(self._open_run(r) for r in runs))
+        h = np.concatenate(hs)
+        p = np.concatenate(ps)
+        order = np.argsort(h, kind="stable")
+        merged = self._write_run(h[order], p[order])
+        del hs, ps, h, p
+        # קודם manifest (atomic replace) ורק אז מחיקה: קריסה באמצע משאירה לכל היותר קבצים יתומים
+        self.manifest["runs"] = [merged]
+        self._save_manifest()
+        for r in runs:
+            for ext in (".hash", ".part"):
+                (self.path / f"{r['name']}{ext}").unlink(missing_ok=True)
+
+    def duplicates(self):
+        """כל הכפילויות שנמצאו עד עכשיו (מתוך duplicates.csv)."""
+        log = self.path / "duplicates.csv"
+        if not log.exists():
+            return pd.DataFrame(columns=self.key_cols + ["key_hash", "first_partition", "dup_partition"])
+        return pd.read_csv(log)
+
+    def bytes_on_disk(self):
+        return sum(f.stat().st_size for f in self.path.glob("run*"))
+
+
+# ==============================================================
+# דמו
+# ==============================================================
+
+def demo(n_parts=12, rows_per_part=200_000):
+    print("\n=== KeyRegistry ===")
+    with tempfile.TemporaryDirectory(prefix="keys_") as d:
+        root = Path(d)
+        rng = np.random.default_rng(0)
+
+        # order_id על פני partitions חודשיים, עם 3 כפילויות מוזרקות בין חודשים
+        reg = KeyRegistry(root / "orders", key_cols=["order_id"], max_runs=4)
+        next_id = 0
+        for m in range(n_parts):
+            ids = np.arange(next_id, next_id + rows_per_part)
+            next_id += rows_per_part
+            if m in (3, 7, 11):
+                ids[:1] = rng.integers(0, next_id - rows_per_part)   # מזהה שכבר הופיע
+            reg.ingest(f"2025-{m+1:02d}", pd.DataFrame({"order_id": ids}))
+        print(reg.duplicates())
+        print(f"{len(reg):,} distinct keys, {reg.bytes_on_disk()/len(reg):.0f} bytes/key on disk, runs={len(reg.manifest['runs'])}")
+
+        # registry נשמר בין ריצות: פותחים מחדש ומוסיפים
+        reg2 = KeyRegistry(root / "orders")
+        assert len(reg2) == len(reg)
+        print("reopened:", reg2.partitions[-2:])
+
+        # מפתח מורכב של SQL Q15 – כולל כפילות בתוך partition אחד
+        key = ["league", "season", "match_date", "home_team_id", "away_team_id"]
+        mreg = KeyRegistry(root / "matches", key_cols=key)
+        part = pd.DataFrame({
+            "league": ["EPL", "EPL", "EPL"], "season": [2024, 2024, 2024],
+            "match_date": pd.to_datetime(["2024-08-10", "2024-08-10", "2024-08-10"]),
+            "home_team_id": [1, 3, 1], "away_team_id": [2, 4, 2],
+        })
+        print(mreg.ingest("EPL-2024-08", part)[key + ["first_partition", "dup_partition"]])
+
+        # partition מאוחר עם dtypes אחרים (datetime[us], season float) – עדיין אותו מפתח
+        later = part.iloc[:1].assign(match_date=part["match_date"].iloc[:1].astype("datetime64[us]"),
+                                     season=[2024.0], home_team_id=pd.array([1], dtype="Int32"))
+        dups = mreg.ingest("EPL-2024-08-late", later)
+        assert len(dups) == 1 and dups["first_partition"].iloc[0] == "EPL-2024-08"
+        print("dtype drift (us / float / Int32) → אותו hash ✔", mreg.manifest["key_dtypes"])
+
+
+if __name__ == "__main__":
+    demo()
+
+######################################################################
+# 💡 TL;DR:
+# • ייחודיות על דאטהסט מחולק = "סט גלובלי" של מפתחות, לא duplicated() לכל קובץ.
+# • hash 8 bytes + partition 4 bytes, בריצות ממוינות על דיסק (mmap) + compaction.
+# • הדו"ח אומר מאיזה partition הגיע המופע הראשון – בדיוק מה שצריך לתיקון.
+######################################################################
@@ -0,0 +1,358 @@
+######################################################################
+# 📌 20 – Dtype Planner: downcast / category / nullable – כתוכנית אחת שמיושמת כבר בקריאה
+#
+# מה יש פה:
+#  1) plan_dtypes – סריקה של DataFrame / סכמת Parquet (סטטיסטיקות row groups) / דגימה מ-CSV
+#  2) DtypePlan – dtype לכל עמודה + דו"ח bytes (נוכחי / צפוי / בפועל)
+#  3) apply / read_csv / read_parquet – החלת התוכנית בזמן קריאה (בלי לבנות את הגרסה הרחבה)
+#  4) to_json / from_json – שמירת התוכנית ושימוש חוזר בין ריצות
+#
+# הרעיון:
+#  • ב-03 §7.4, 04 §11 ו-09 Q14 עושים pd.to_numeric(..., downcast=...) לעמודה אחת
+#    ומשווים memory_usage(deep=True) ביד – אחרי שה-int64/float64/object כבר בזיכרון.
+#  • כאן מחליטים פעם אחת:
+#      int   → int8/16/32/64 (או uint) לפי min/max; עם NA → Int8/16/32/64 (nullable)
+#      float → int אם כל הערכים שלמים; float32 אם המרה הלוך-חזור מדויקת (או בתוך float_rtol)
+#      טקסט  → category אם nunique/n קטן; אחרת string[pyarrow] (או object בלי pyarrow)
+#  • read_csv ב-chunks / cast ב-Arrow → ה-dtype הרחב קיים לכל היותר ל-chunk אחד.
+#
+# שימו לב: תוכנית מדגימת CSV מבוססת על הדגימה בלבד. read_csv עם dtype צר עוטף ערכים
+# חורגים בשקט (overflow), ולכן DtypePlan.read_csv קורא ב-chunks ובודק טווח לפני ההמרה –
+# חריגה → ValueError, ואז בונים תוכנית עם sample_rows גדול יותר.
+#
+# דרישות: pandas, numpy (אופציונלי: pyarrow ל-Parquet ול-string[pyarrow])
+######################################################################
+
+import json
+import sys
+import tempfile
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401
+    HAS_ARROW = True
+except ImportError:
+    HAS_ARROW = False
+
+_INTS = [np.int8, np.int16, np.int32, np.int64]
+_UINTS = [np.uint8, np.uint16, np.uint32, np.uint64]
+
+
+# ==============================================================
+# 1) בחירת dtype לעמודה
+# ==============================================================
+
+def _narrowest_int(lo, hi, nullable):
+    """int הכי צר שמכיל את [lo, hi]; nullable → Int8..Int64 (עם מסכת NA)."""
+    if lo >= 0 and not nullable:
+        for t in _UINTS:
+            if hi <= np.iinfo(t).max:
+                return np.dtype(t).name
+    for t in _INTS:
+        if np.iinfo(t).min <= lo and hi <= np.iinfo(t).max:
+            name = np.dtype(t).name
+            return name.capitalize() if nullable else name
+    return "Int64" if nullable else "int64"
+
+
+def _plan_numeric(s, float_rtol):
+    vals = s.dropna().to_numpy()
+    nullable = len(vals) < len(s)
+    if len(vals) == 0:
+        return str(s.dtype)
+    if pd.api.types.is_bool_dtype(s.dtype):
+        return "boolean" if nullable else "bool"
+    if np.issubdtype(vals.dtype, np.integer):
+        return _narrowest_int(int(vals.min()), int(vals.max()), nullable)
+    vals = vals.astype(np.float64)
+    if np.isfinite(vals).all() and (vals == np.round(vals)).all() and np.abs(vals).max() < 2**53:
+        return _narrowest_int(int(vals.min()), int(vals.max()), nullable)
+    v32 = vals.astype(np.float32).astype(np.float64)
+    with np.errstate(invalid="ignore"):
+        ok = (v32 == vals) | (np.isnan(vals) & np.isnan(v32))
+        if float_rtol:
+            ok |= np.abs(v32 - vals) <= float_rtol * np.abs(vals)
+    return "float32" if ok.all() else "float64"
+
+
+def _plan_text(s, category_max_ratio, category_max_unique):
+    n = max(len(s), 1)
+    nunique = s.nunique(dropna=True)
+    if nunique <= category_max_unique and nunique / n <= category_max_ratio:
+        return "category"
+    return "string[pyarrow]" if HAS_ARROW else "object"
+
+
+def _plan_series(s, float_rtol, category_max_ratio, category_max_unique):
+    if isinstance(s.dtype, pd.CategoricalDtype) or pd.api.types.is_datetime64_any_dtype(s.dtype):
+        return str(s.dtype)
+    if pd.api.types.is_numeric_dtype(s.dtype) or pd.api.types.is_bool_dtype(s.dtype):
+        return _plan_numeric(s, float_rtol)
+    return _plan_text(s, category_max_ratio, category_max_unique)
+
+
+# ==============================================================
+# 2) הערכת bytes לעמודה (לפני שממירים)
+# ==============================================================
+
+def _projected_bytes(s, dtype):
+    n = len(s)
+    if dtype == "category":
+        k = s.nunique(dropna=True)
+        code = 1 if k < 2**7 else 2 if k < 2**15 else 4
+        cats = s.dropna().drop_duplicates()
+        return n * code + int(cats.memory_usage(deep=True, index=False))
+    if dtype.startswith("string"):
+        lens = s.dropna().astype(str).str.len()
+        return int(lens.sum()) + 4 * (n + 1) + (n + 7) // 8
+    if dtype == "object":
+        return int(s.memory_usage(deep=True, index=False))
+    dt = pd.api.types.pandas_dtype(dtype)
+    extra = n if isinstance(dt, pd.api.extensions.ExtensionDtype) else 0   # מסכת NA של nullable
+    return n * dt.itemsize + extra
+
+
+# ==============================================================
+# 3) התוכנית
+# ==============================================================
+
+@dataclass
+class DtypePlan:
+    dtypes: dict
+    report: pd.DataFrame = field(default=None, repr=False)
+    date_cols: list = field(default_factory=list)
+    float_rtol: float = 0.0
+
+    def apply(self, df):
+        """ממיר DataFrame קיים ומוסיף לדו"ח את actual_bytes."""
+        cols = {c: t for c, t in self.dtypes.items() if c in df}
+        out = df.astype(cols)
+        if self.report is not None:
+            actual = out.memory_usage(deep=True, index=False)
+            self.report["actual_bytes"] = self.report["column"].map(actual)
+        return out
+
+    def read_csv(self, path, chunksize=1_000_000, **kw):
+        """
+        read_csv לפי התוכנית. הקריאה ב-chunks: כל chunk מומר ונבדק מיד, כך שהגרסה הרחבה
+        קיימת רק לגודל chunk אחד. ערך שחורג מטווח ה-int המתוכנן, ערך לא שלם בעמודת int,
+        או ערך שלא חוזר מ-float32 (בתוך float_rtol) → ValueError
+        (read_csv / astype עם dtype צר היו עוטפים / חותכים / מעגלים אותו בשקט).
+        """
+        text = {c: t for c, t in self.dtypes.items() if t == "category" or t.startswith("string")}
+        parts = []
+        for chunk in pd.read_csv(path, dtype=text, parse_dates=self.date_cols or None,
+                                 chunksize=chunksize, **kw):
+            parts.append(self._cast_checked(chunk))
+        out = pd.concat(parts, ignore_index=True)
+        for c, t in self.dtypes.items():
+            # קטגוריות שונות בין chunks → concat מחזיר object; מאחדים מחדש
+            if t == "category" and c in out and not isinstance(out[c].dtype, pd.CategoricalDtype):
+                out[c] = pd.api.types.union_categoricals([p[c] for p in parts], sort_categories=True)
+        return out
+
+    def _cast_checked(self, chunk):
+        for c, t in self.dtypes.items():
+            if c not in chunk or c in self.date_cols:
+                continue
+            dt = pd.api.types.pandas_dtype(t)
+            hint = "rebuild the plan with a larger sample"
+            if pd.api.types.is_integer_dtype(dt):
+                vals = chunk[c].dropna()
+                info = np.iinfo(dt.numpy_dtype if hasattr(dt, "numpy_dtype") else dt)
+                if len(vals) and (vals.min() < info.min or vals.max() > info.max):
+                    raise ValueError(f"{c}: values [{vals.min()}, {vals.max()}] outside planned {t} – {hint}")
+                if pd.api.types.is_float_dtype(vals.dtype) and len(vals):
+                    frac = vals.to_numpy() != np.round(vals.to_numpy())
+                    if frac.any():
+                        raise ValueError(f"{c}: non-integer value {vals[frac].iloc[0]} in planned {t} – {hint}")
+            elif dt == np.float32 and chunk[c].dtype == np.float64:
+                vals = chunk[c].to_numpy()
+                v32 = vals.astype(np.float32).astype(np.float64)
+                with np.errstate(invalid="ignore"):
+                    ok = (v32 == vals) | np.isnan(vals)
+                    if self.float_rtol:
+                        ok |= np.abs(v32 - vals) <= self.float_rtol * np.abs(vals)
+                if not ok.all():
+                    raise ValueError(f"{c}: value {vals[~ok][0]} does not fit planned float32 – {hint}")
+        return chunk.astype({c: t for c, t in self.dtypes.items() if c in chunk and c not in self.date_cols})
+
+    def read_parquet(self, path, columns=None):
+        """
+        Parquet → cast ב-Arrow (עמודה-עמודה, safe=True זורק על overflow) → pandas.
+        ints צרים ו-dictionary (category) נבנים ב-Arrow, כך ש-to_pandas לא יוצר int64/object.
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        table = pq.read_table(path, columns=columns)
+        for c, t in self.dtypes.items():
+            if c not in table.column_names:
+                continue
+            i = table.column_names.index(c)
+            col = table.column(i)
+            if t == "category":
+                col = col.dictionary_encode()
+            elif pd.api.types.is_numeric_dtype(pd.api.types.pandas_dtype(t)):
+                dt = pd.api.types.pandas_dtype(t)
+                col = col.cast(pa.from_numpy_dtype(getattr(dt, "numpy_dtype", dt)), safe=True)
+            table = table.set_column(i, c, col)
+        df = table.to_pandas(types_mapper={
+            pa.string(): pd.StringDtype("pyarrow"),
+            pa.large_string(): pd.StringDtype("pyarrow"),
+        }.get)
+        return df.astype({c: t for c, t in self.dtypes.items() if c in df and str(df[c].dtype) != t})
+
+    def to_json(self, path=None):
+        doc = json.dumps({"dtypes": self.dtypes, "date_cols": self.date_cols, "float_rtol": self.float_rtol},
+                         indent=2)
+        if path:
+            Path(path).write_text(doc, encoding="utf-8")
+        return doc
+
+    @classmethod
+    def from_json(cls, src):
+        text = Path(src).read_text(encoding="utf-8") if not str(src).lstrip().startswith("{") else src
+        doc = json.loads(text)
+        return cls(dtypes=doc["dtypes"], date_cols=doc.get("date_cols", []), float_rtol=doc.get("float_rtol", 0.0))
+
+
+def plan_dtypes(source, sample_rows=100_000, float_rtol=0.0,
+                category_max_ratio=0.5, category_max_unique=32_767, date_cols=()):
+    """
+    בונה DtypePlan ל-DataFrame / קובץ Parquet / קובץ CSV.
+
+    source             : DataFrame, או נתיב .parquet / .csv
+    sample_rows        : כמה שורות לדגום מ-CSV (Parquet: רק לעמודות טקסט – משאר העמודות
+                         לוקחים min/max/null_count מהסטטיסטיקות, בלי לקרוא דאטה)
+    float_rtol         : שגיאה יחסית מותרת ב-float32 (0 = רק המרה מדויקת)
+    category_max_ratio : category רק אם nunique/n <= זה
+    category_max_unique: ומספר הקטגוריות לא עולה על זה
+    date_cols          : עמודות תאריך (ב-CSV – יועברו ל-parse_dates)
+    """
+    date_cols = list(date_cols)
+    if isinstance(source, pd.DataFrame):
+        df, n_rows, stats = source, len(source), None
+    else:
+        path = Path(source)
+        if path.suffix == ".parquet":
+            df, n_rows, stats = _parquet_scan(path, sample_rows)
+        else:
+            df = pd.read_csv(path, nrows=sample_rows, parse_dates=date_cols or None)
+            n_rows, stats = len(df), None
+
+    dtypes, rows = {}, []
+    for c in df.columns:
+        s = df[c]
+        if stats and c in stats:
+            lo, hi, nulls = stats[c]
+            planned = _narrowest_int(lo, hi, nulls > 0)
+        else:
+            planned = _plan_series(s, float_rtol, category_max_ratio, category_max_unique)
+        dtypes[c] = planned
+        scale = n_rows / max(len(s), 1)
+        rows.append({
+            "column": c,
+            "current": str(s.dtype),
+            "planned": planned,
+            "current_bytes": int(s.memory_usage(deep=True, index=False) * scale),
+            "projected_bytes": int(_projected_bytes(s, planned) * scale),
+        })
+    report = pd.DataFrame(rows)
+    report["saving_pct"] = 100 * (1 - report["projected_bytes"] / report["current_bytes"].clip(lower=1))
+    return DtypePlan(dtypes=dtypes, report=report, date_cols=date_cols, float_rtol=float_rtol)
+
+
+def _parquet_scan(path, sample_rows):
+    """עמודות int: min/max/nulls מסטטיסטיקות ה-row groups; שאר העמודות: דגימה מה-row group הראשון."""
+    import pyarrow.parquet as pq
+    pf = pq.ParquetFile(path)
+    meta = pf.metadata
+    stats = {}
+    for j in range(meta.num_columns):
+        col = meta.schema.column(j)
+        if col.physical_type not in ("INT32", "INT64") or col.logical_type.type not in ("NONE", "INT"):
+            continue
+        lo, hi, nulls, ok = None, None, 0, True
+        for g in range(meta.num_row_groups):
+            st = meta.row_group(g).column(j).statistics
+            if st is None or not st.has_min_max:
+                ok = False
+                break
+            lo = st.min if lo is None else min(lo, st.min)
+            hi = st.max if hi is None else max(hi, st.max)
+            nulls += st.null_count
+        if ok and lo is not None:
+            stats[col.name] = (int(lo), int(hi), nulls)
+    sample = next(pf.iter_batches(batch_size=sample_rows)).to_pandas()
+    return sample, meta.num_rows, stats
+
+
+# ==============================================================
+# 4) דמו – אותן דוגמאות של 03 §7.4 / 04 §11 / 09 Q14, בתוכנית אחת
+# ==============================================================
+
+def demo(n=200_000):
+    print("\n=== dtype planner ===")
+    rng = np.random.default_rng(0)
+    big = pd.DataFrame({
+        "i64": pd.Series(np.arange(0, n), dtype="int64"),
+        "f64": pd.Series(rng.normal(0, 1, n), dtype="float64"),
+        "price": np.round(rng.uniform(1, 100, n), 1).astype(np.float32).astype(np.float64),
+        "key": pd.Series(rng.integers(0, 200, n), dtype="int64"),
+        "maybe_id": pd.Series(np.where(rng.random(n) < 0.05, np.nan, rng.integers(0, 1000, n))),
+        "city": rng.choice(["TA","HAIFA","JLM"], size=n),
+        "email": [f"user{i}@mail.com" for i in range(n)],
+    })
+    plan = plan_dtypes(big)
+    opt = plan.apply(big)
+    pd.set_option("display.width", 140)
+    print(plan.report)
+    print(f"total MB: {big.memory_usage(deep=True).sum()/1e6:.2f} → {opt.memory_usage(deep=True).sum()/1e6:.2f}")
+    assert (opt["maybe_id"].astype("float64").fillna(-1) == big["maybe_id"].fillna(-1)).all()
+
+    # תוכנית מ-CSV (דגימה) → read_csv עם dtype מראש
+    with tempfile.TemporaryDirectory(prefix="dtypes_") as d:
+        tmp = Path(d)
+        big.drop(columns=["email"]).to_csv(tmp / "big.csv", index=False)
+        plan_csv = plan_dtypes(tmp / "big.csv", sample_rows=50_000)
+        plan_csv.to_json(tmp / "plan.json")
+        try:
+            DtypePlan.from_json(tmp / "plan.json").read_csv(tmp / "big.csv")
+        except ValueError as e:
+            print("⚠️", e)                                   # i64 בדגימה עד 49,999 → uint16 לא מספיק
+        plan_csv = plan_dtypes(tmp / "big.csv", sample_rows=n)
+        df_csv = plan_csv.read_csv(tmp / "big.csv", chunksize=50_000)
+        print("csv dtypes:", df_csv.dtypes.astype(str).to_dict())
+
+        # תוכנית מסכמת Parquet (ints – בלי לקרוא דאטה)
+        if HAS_ARROW:
+            big.to_parquet(tmp / "big.parquet", index=False, row_group_size=50_000)
+            plan_pq = plan_dtypes(tmp / "big.parquet", sample_rows=20_000)
+            print(plan_pq.report[["column","current","planned","projected_bytes"]])
+            print("parquet dtypes:", plan_pq.read_parquet(tmp / "big.parquet").dtypes.astype(str).to_dict())
+
+        # ערכים אחרי הדגימה: 2.5 בעמודה שתוכננה uint8, 0.1 בעמודה שתוכננה float32 → שגיאה, לא עיגול שקט
+        pd.DataFrame({"k": [1.0] * 10 + [2.5], "x": [0.5] * 10 + [0.1]}).to_csv(tmp / "late.csv", index=False)
+        plan_late = plan_dtypes(tmp / "late.csv", sample_rows=10)
+        assert plan_late.dtypes == {"k": "uint8", "x": "float32"}, plan_late.dtypes
+        for col in ("k", "x"):
+            try:
+                DtypePlan({col: plan_late.dtypes[col]}).read_csv(tmp / "late.csv", usecols=[col])
+                raise AssertionError("expected ValueError")
+            except ValueError as e:
+                print("⚠️", e)
+
+
+if __name__ == "__main__":
+    demo(*(int(a) for a in sys.argv[1:2]))
+
+######################################################################
+# 💡 TL;DR:
+# • לא ממירים "אחרי" – מתכננים dtype פעם אחת ומעבירים ל-read_csv/Parquet.
+# • min/max → רוחב int; NA → Int*/boolean; float32 רק אם ההמרה מדויקת.
+# • category לטקסט עם מעט ערכים; string[pyarrow] לטקסט ייחודי (לא object).
+######################################################################
@@ -0,0 +1,255 @@
+######################################################################
+# 📌 21 – Grouped Weighted Stats: ממוצע/שונות/קוונטילים/סכומים משוקללים לפי קבוצה
+#
+# מה יש פה:
+#  1) group_codes – groupby של pandas / Series / DataFrame / מערך codes → (codes, n_groups, labels)
+#  2) weighted_sum / weighted_mean / weighted_var – reductions עם np.bincount על codes
+#  3) weighted_quantile – קוונטילים משוקללים לכל הקבוצות במיון אחד + searchsorted
+#  4) grouped_weighted_stats – טבלה אחת לכל הסטטיסטיקות
+#  5) השוואה מול wavg של 04 §6 / Q7 ב-09 + Benchmark עם 1M קבוצות  (--bench)
+#
+# הרעיון:
+#  • groupby.apply(lambda sub: wavg(...)) בונה sub-DataFrame לכל קבוצה → קריאת פייתון לקבוצה.
+#  • ממוצע משוקלל = Σ(x·w) / Σw לכל קבוצה = שני bincount על אותם codes. אין לולאה.
+#  • קוונטיל: ממיינים פעם אחת לפי (code, x), cumsum של w מנורמל לקבוצה ∈ (0, 1],
+#    ואז key = code + cumw מונוטוני בכל המערך → searchsorted(key, g + q) לכל הקבוצות יחד.
+#
+# דרישות: pandas, numpy
+######################################################################
+
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+
+# ==============================================================
+# 1) codes של קבוצות
+# ==============================================================
+
+def group_codes(keys):
+    """
+    keys: DataFrameGroupBy/SeriesGroupBy, Series, DataFrame (כמה עמודות מפתח) או מערך codes שלמים.
+    מחזיר (codes int64, n_groups, labels) – labels = Index של ערכי הקבוצה (או None למערך codes).
+    """
+    if isinstance(keys, (pd.core.groupby.DataFrameGroupBy, pd.core.groupby.SeriesGroupBy)):
+        codes = keys.ngroup().to_numpy().astype(np.int64)
+        return codes, keys.ngroups, pd.Index(list(keys.groups.keys()))
+    if isinstance(keys, pd.DataFrame):
+        codes, labels = pd.MultiIndex.from_frame(keys).factorize(sort=True)
+        return codes.astype(np.int64), len(labels), labels
+    if isinstance(keys, pd.Series):
+        codes, labels = pd.factorize(keys, sort=True)
+        return codes.astype(np.int64), len(labels), pd.Index(labels, name=keys.name)
+    codes = np.asarray(keys).astype(np.int64)
+    return codes, int(codes.max()) + 1 if len(codes) else 0, None
+
+
+def _clean(x, w, codes):
+    """מסנן שורות עם NaN ב-x/w או code שלילי (NaN במפתח של factorize)."""
+    x = np.asarray(x, dtype=np.float64)
+    w = np.asarray(w, dtype=np.float64)
+    ok = ~(np.isnan(x) | np.isnan(w)) & (codes >= 0)
+    if ok.all():
+        return x, w, codes
+    return x[ok], w[ok], codes[ok]
+
+
+# ==============================================================
+# 2) סכום / ממוצע / שונות
+# ==============================================================
+
+def weighted_sum(x, w, codes, n_groups):
+    """Σ(x·w) לכל קבוצה."""
+    x, w, codes = _clean(x, w, codes)
+    return np.bincount(codes, weights=x * w, minlength=n_groups)
+
+
+def weighted_mean(x, w, codes, n_groups):
+    """Σ(x·w) / Σw לכל קבוצה; NaN אם Σw == 0 (כמו wavg של 04 §6)."""
+    x, w, codes = _clean(x, w, codes)
+    sw = np.bincount(codes, weights=w, minlength=n_groups)
+    sxw = np.bincount(codes, weights=x * w, minlength=n_groups)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(sw != 0, sxw / sw, np.nan)
+
+
+def weighted_var(x, w, codes, n_groups, unbiased=False):
+    """
+    שונות משוקללת לכל קבוצה (שני מעברים: קודם ממוצע, אחר כך Σw(x-μ)² – יציב נומרית).
+    unbiased=False : Σw(x-μ)² / Σw
+    unbiased=True  : reliability weights → Σw(x-μ)² / (V1 - V2/V1)
+    """
+    x, w, codes = _clean(x, w, codes)
+    sw = np.bincount(codes, weights=w, minlength=n_groups)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mu = np.bincount(codes, weights=x * w, minlength=n_groups) / sw
+        d = x - mu[codes]
+        ss = np.bincount(codes, weights=w * d * d, minlength=n_groups)
+        if unbiased:
+            sw2 = np.bincount(codes, weights=w * w, minlength=n_groups)
+            return ss / (sw - sw2 / sw)
+        return ss / sw
+
+
+# ==============================================================
+# 3) קוונטילים משוקללים
+# ==============================================================
+
+def weighted_quantile(x, w, codes, n_groups, q=(0.5,)):
+    """
+    קוונטילים משוקללים (inverted CDF): הערך הקטן ביותר שחלק המשקל המצטבר שלו >= q.
+    זהה ל-np.quantile(x, q, weights=w, method="inverted_cdf") לכל קבוצה בנפרד.
+    מחזיר מערך (n_groups, len(q)); קבוצה ריקה / Σw == 0 → NaN.
+    """
+    x, w, codes = _clean(x, w, codes)
+    q = np.atleast_1d(np.asarray(q, dtype=np.float64))
+    order = np.lexsort((x, codes))
+    xs, ws, cs = x[order], w[order], codes[order]
+
+    g = np.arange(n_groups)
+    starts = np.searchsorted(cs, g, side="left")
+    ends = np.searchsorted(cs, g, side="right")
+    cw = np.cumsum(ws)
+    cwg = cw - np.where(starts > 0, cw[np.maximum(starts - 1, 0)], 0.0)[cs] if len(xs) else cw
+    tot = np.where(ends > starts, cwg[np.maximum(ends - 1, 0)] if len(xs) else 0.0, 0.0)   # Σw לקבוצה
+    with np.errstate(invalid="ignore", divide="ignore"):
+        share = np.where(tot[cs] > 0, cwg / tot[cs], 0.0)        # ∈ [0, 1]; בסוף הקבוצה בדיוק 1
+    key = 2.0 * cs + np.minimum(share, 1.0)                      # מונוטוני; רווח של 1 בין קבוצות
+
+    # q > 0 → הערך הראשון עם share >= q;  q = 0 → הערך הראשון עם משקל חיובי (share > 0)
+    pos = np.where(q[None, :] > 0,
+                   np.searchsorted(key, (2.0 * g[:, None] + q[None, :]).ravel(), side="left").reshape(-1, len(q)),
+                   np.searchsorted(key, 2.0 * g, side="right")[:, None])
+    out = xs[np.minimum(pos, len(xs) - 1)] if len(xs) else np.full(pos.shape, np.nan)
+    ok = (tot > 0)[:, None] & (pos < ends[:, None])
+    return np.where(ok, out, np.nan)
+
+
+# ==============================================================
+# 4) טבלה אחת
+# ==============================================================
+
+def grouped_weighted_stats(df, by, x, w, stats=("sum", "mean", "var"), quantiles=(), unbiased=False):
+    """
+    df        : DataFrame (או None אם by/x/w הם מערכים)
+    by        : עמודה/רשימת עמודות, groupby קיים, או מערך codes
+    x, w      : שמות עמודות או מערכים
+    stats     : sum / mean / var / weight (Σw)
+    quantiles : למשל (0.25, 0.5, 0.75) → עמודות q25/q50/q75
+    """
+    if df is not None:
+        if isinstance(by, str):
+            by = df[by]
+        elif isinstance(by, list):
+            by = df[by[0]] if len(by) == 1 else df[by]
+        x = df[x] if isinstance(x, str) else x
+        w = df[w] if isinstance(w, str) else w
+    codes, n, labels = group_codes(by)
+    out = {}
+    xv, wv, cv = _clean(x, w, codes)
+    if "weight" in stats:
+        out["weight"] = np.bincount(cv, weights=wv, minlength=n)
+    if "sum" in stats:
+        out["wsum"] = weighted_sum(xv, wv, cv, n)
+    if "mean" in stats:
+        out["wmean"] = weighted_mean(xv, wv, cv, n)
+    if "var" in stats:
+        out["wvar"] = weighted_var(xv, wv, cv, n, unbiased=unbiased)
+    if len(quantiles):
+        Q = weighted_quantile(xv, wv, cv, n, quantiles)
+        for j, qq in enumerate(quantiles):
+            out[f"q{round(100 * qq):02d}"] = Q[:, j]
+    return pd.DataFrame(out, index=labels)
+
+
+# ==============================================================
+# 5) דמו – מול wavg של 04 §6
+# ==============================================================
+
+def wavg(x, w):
+    """ה-wavg של 04 §6 (לצורך השוואה)."""
+    x, w = np.asarray(x), np.asarray(w)
+    return (x * w).sum() / w.sum() if w.sum() else np.nan
+
+
+def demo():
+    print("\n=== grouped weighted stats ===")
+    df = pd.DataFrame({
+        "order_id":   [101, 102, 103, 104, 105, 106],
+        "customer_id":[1,   1,   2,   2,   3,   1  ],
+        "amount":     [120,  80,   50,  150,  300,  90],
+    })
+    df["is_big"] = df["amount"].ge(120)
+    weights = 1 + 9 * df["is_big"].astype(int)
+
+    ref = df.groupby("customer_id")[["amount","is_big"]].apply(lambda sub: wavg(sub["amount"], 1 + 9*sub["is_big"].astype(int)))
+    res = grouped_weighted_stats(df.assign(w=weights), "customer_id", "amount", "w",
+                                 stats=("weight", "sum", "mean", "var"), quantiles=(0.5, 0.9))
+    assert np.allclose(res["wmean"].to_numpy(), ref.to_numpy())
+    print(res)
+    print("wmean == groupby.apply(wavg) ✔")
+
+    # אותו API עם groupby קיים / codes של numpy
+    g = df.groupby("customer_id")
+    codes, n, _ = group_codes(g)
+    assert np.allclose(weighted_mean(df["amount"], weights, codes, n), ref.to_numpy())
+
+    # קוונטילים מול np.quantile(weights=...) לכל קבוצה
+    rng = np.random.default_rng(0)
+    x, w, c = rng.normal(size=5000), rng.integers(0, 4, 5000).astype(float), rng.integers(0, 40, 5000)
+    qs = (0.0, 0.1, 0.5, 0.9, 1.0)
+    Q = weighted_quantile(x, w, c, 40, q=qs)
+    for gi in range(40):
+        m = c == gi
+        exp = np.quantile(x[m], qs, weights=w[m], method="inverted_cdf")
+        assert np.allclose(Q[gi], exp), (gi, Q[gi], exp)
+    assert np.array_equal(weighted_quantile([1, 2, 3, 4], [1] * 4, np.array([0, 0, 1, 1]), 2, q=(0, 0.5)),
+                          [[1, 1], [3, 3]])
+    V = weighted_var(x, w, c, 40)
+    for gi in range(40):
+        m = c == gi
+        assert np.isclose(V[gi], np.cov(x[m], aweights=w[m], ddof=0))
+    print("quantiles == np.quantile(weights, inverted_cdf), var == np.cov(aweights) ✔")
+
+
+# ==============================================================
+# 6) Benchmark – 1M קבוצות
+# ==============================================================
+
+def bench(n_rows=10_000_000, n_groups=1_000_000, apply_groups=10_000, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "customer_id": rng.integers(0, n_groups, n_rows),
+        "amount": rng.gamma(2.0, 50.0, n_rows),
+        "w": rng.integers(1, 10, n_rows).astype(np.float64),
+    })
+    print(f"\n=== bench: {n_rows:,} rows, {n_groups:,} groups ===")
+    t0 = time.perf_counter()
+    grouped_weighted_stats(df, "customer_id", "amount", "w", stats=("sum", "mean"))
+    t_mean = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    grouped_weighted_stats(df, "customer_id", "amount", "w", stats=("sum", "mean", "var"), quantiles=(0.5, 0.9))
+    t_all = time.perf_counter() - t0
+
+    sub = df[df["customer_id"] < apply_groups]
+    t0 = time.perf_counter()
+    sub.groupby("customer_id")[["amount","w"]].apply(lambda s: wavg(s["amount"], s["w"]))
+    t_apply = time.perf_counter() - t0
+    print(f"wsum + wmean                     : {t_mean:8.2f} s")
+    print(f"wsum + wmean + wvar + q50/q90    : {t_all:8.2f} s")
+    print(f"groupby.apply(wavg), {apply_groups:,} groups : {t_apply:8.2f} s  (≈{t_apply * n_groups / apply_groups:,.0f} s for {n_groups:,})")
+
+
+if __name__ == "__main__":
+    demo()
+    if "--bench" in sys.argv:
+        bench()
+
+######################################################################
+# 💡 TL;DR:
+# • "weighted X לקבוצה" = bincount(codes, weights=...) – לא apply.
+# • שונות בשני מעברים (μ ואז Σw(x-μ)²) – יציב יותר מ-Σwx² - μ².
+# • קוונטילים לכל הקבוצות: מיון אחד + key = code + משקל מצטבר מנורמל.
+######################################################################
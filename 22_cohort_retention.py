@@ -0,0 +1,248 @@
+######################################################################
+# 📌 22 – Cohort Retention Engine: retention לכל חלון, במעבר streaming אחד
+#
+# מה יש פה:
+#  1) CohortRetention – מקבל chunks של אירועים ממוינים לפי user, ומקפל כל משתמש שהסתיים
+#  2) matrix() – מטריצת cohort × day-offset (כמה חזרו ביום d בדיוק)
+#  3) windows() / overall() – retention בתוך k ימים לכל k (כמו ret7/ret14/ret30 ב-Q8)
+#  4) דמו: אותם events של 09 → אותם מספרים של Q8 בדיוק
+#
+# הרעיון:
+#  • Q8 עושה visits.merge(first) על כל הטבלה, ואז within() מריץ groupby().any() מחדש לכל חלון.
+#  • כאן: אירועים ממוינים לפי user → כל משתמש הוא בלוק רציף. מה שצריך ממנו:
+#      first_ts (min), ואת קבוצת ה-day offsets שבהם חזר (0 < d <= max_offset).
+#    משתמש "נסגר" ברגע שה-chunk עובר אותו → מקפלים אותו מיד לספירות ה-cohort ושוכחים אותו.
+#  • "חזר בתוך k ימים" ⟺ ה-offset החיובי המינימלי <= k → כל החלונות מאותו מספר אחד.
+#  • זיכרון: chunk אחד + המשתמש האחרון (שממשיך ל-chunk הבא) + טבלת cohorts × offsets.
+#
+# דרישות: pandas, numpy
+######################################################################
+
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+_DAY = np.int64(86_400 * 10**9)
+
+
+class CohortRetention:
+    """
+    eng = CohortRetention(max_offset=30, cohort_freq="W")
+    for chunk in chunks:           # DataFrame עם user_col, ts_col – ממוין (מקובץ) לפי user
+        eng.update(chunk)
+    eng.finalize()
+    eng.windows([7, 14, 30]); eng.matrix(); eng.overall([7, 14, 30])
+    """
+
+    def __init__(self, max_offset=30, cohort_freq="D", user_col="user_id", ts_col="ts"):
+        self.max_offset = int(max_offset)
+        self.cohort_freq = cohort_freq
+        self.user_col, self.ts_col = user_col, ts_col
+        D = self.max_offset + 1
+        # לכל cohort: users, active[d] (חזרו ביום d), first_return[d] (הפעם הראשונה שחזרו = d)
+        self._cohorts = {}
+        self._users = np.zeros(0, dtype=np.int64)
+        self._active = np.zeros((0, D), dtype=np.int64)
+        self._first = np.zeros((0, D), dtype=np.int64)
+        self._carry = None
+        self._last_user = None
+        self._done = False
+
+    # --- קליטה ---
+    def update(self, chunk):
+        if self._done:
+            raise RuntimeError("finalize() already called")
+        u = chunk[self.user_col].to_numpy()
+        t = chunk[self.ts_col].to_numpy().astype("datetime64[ns]").view(np.int64)
+        if self._carry is not None:
+            u = np.concatenate([self._carry[0], u])
+            t = np.concatenate([self._carry[1], t])
+        if len(u) == 0:
+            return self
+        if (u[1:] < u[:-1]).any() or (self._last_user is not None and u[0] < self._last_user):
+            raise ValueError("events must be sorted by user (each user's events contiguous)")
+        # המשתמש האחרון עלול להמשיך ב-chunk הבא → מחזיקים אותו בצד
+        tail = np.searchsorted(u, u[-1], side="left")
+        self._carry = (u[tail:], t[tail:])
+        self._last_user = u[-1]
+        if tail:
+            self._fold(u[:tail], t[:tail])
+        return self
+
+    def finalize(self):
+        if self._carry is not None and len(self._carry[0]):
+            self._fold(*self._carry)
+        self._carry = None
+        self._done = True
+        return self
+
+    def _fold(self, u, t):
+        """מקפל משתמשים שלמים לספירות לפי cohort."""
+        D = self.max_offset + 1
+        start = np.flatnonzero(np.r_[True, u[1:] != u[:-1]])
+        user_idx = np.repeat(np.arange(len(start)), np.diff(np.r_[start, len(u)]))
+        first_ts = np.minimum.reduceat(t, start)
+        delta = (t - first_ts[user_idx]) // _DAY
+
+        cohort = pd.PeriodIndex(first_ts.view("datetime64[ns]"), freq=self.cohort_freq)
+        ccode = self._cohort_codes(cohort)
+
+        keep = (delta >= 1) & (delta <= self.max_offset)
+        pairs = np.unique(user_idx[keep] * D + delta[keep])          # (user, offset) ייחודי
+        pu, pd_ = pairs // D, pairs % D
+        n_c = len(self._cohorts)
+        self._users += np.bincount(ccode, minlength=n_c)
+        self._active += np.bincount(ccode[pu] * D + pd_, minlength=n_c * D).reshape(n_c, D)
+        # offset חיובי מינימלי לכל משתמש = הפעם הראשונה שחזר
+        first_ret = np.full(len(start), D, dtype=np.int64)
+        np.minimum.at(first_ret, pu, pd_)
+        hit = first_ret < D
+        self._first += np.bincount(ccode[hit] * D + first_ret[hit], minlength=n_c * D).reshape(n_c, D)
+
+    def _cohort_codes(self, cohort):
+        uniq, inv = np.unique(cohort.asi8, return_inverse=True)       # ordinals → מעט ערכים
+        labels = pd.PeriodIndex.from_ordinals(uniq, freq=self.cohort_freq)
+        new = [c for c in labels if c not in self._cohorts]
+        for c in new:
+            self._cohorts[c] = len(self._cohorts)
+        if new:
+            D = self.max_offset + 1
+            self._users = np.concatenate([self._users, np.zeros(len(new), dtype=np.int64)])
+            self._active = np.vstack([self._active, np.zeros((len(new), D), dtype=np.int64)])
+            self._first = np.vstack([self._first, np.zeros((len(new), D), dtype=np.int64)])
+        return np.array([self._cohorts[c] for c in labels], dtype=np.int64)[inv]
+
+    # --- תוצאות ---
+    def _index(self):
+        order = np.argsort(np.array([c.ordinal for c in self._cohorts]))
+        labels = pd.PeriodIndex(list(self._cohorts), freq=self.cohort_freq)[order]
+        return order, labels.rename("cohort")
+
+    def users(self):
+        order, idx = self._index()
+        return pd.Series(self._users[order], index=idx, name="users")
+
+    def matrix(self, counts=False):
+        """cohort × offset (1..max_offset): אחוז (או מספר) המשתמשים שחזרו ביום d בדיוק."""
+        order, idx = self._index()
+        m = self._active[order][:, 1:]
+        out = pd.DataFrame(m, index=idx, columns=pd.RangeIndex(1, self.max_offset + 1, name="day"))
+        return out if counts else out.div(self._users[order], axis=0)
+
+    def windows(self, ks=(7, 14, 30), counts=False):
+        """cohort × k: אחוז המשתמשים שחזרו בתוך 1..k ימים (כמו within של Q8, לכל cohort)."""
+        bad = [k for k in ks if k > self.max_offset or k < 1]
+        if bad:
+            raise ValueError(f"windows must be in 1..max_offset={self.max_offset}: {bad}")
+        order, idx = self._index()
+        cum = np.cumsum(self._first[order], axis=1)
+        out = pd.DataFrame({f"ret{k}": cum[:, k] for k in ks}, index=idx)
+        return out if counts else out.div(self._users[order], axis=0)
+
+    def overall(self, ks=(7, 14, 30)):
+        """retention כולל על כל המשתמשים – אותה הגדרה כמו Q8."""
+        c = self.windows(ks, counts=True).sum()
+        return {k: float(v / self._users.sum()) for k, v in c.items()}
+
+
+def cohort_retention(chunks, max_offset=30, windows=(7, 14, 30), cohort_freq="D", **kw):
+    """עטיפה: מריץ CohortRetention על iterable של chunks ומחזיר את המנוע הסגור."""
+    eng = CohortRetention(max_offset=max_offset, cohort_freq=cohort_freq, **kw)
+    for ch in chunks:
+        eng.update(ch)
+    return eng.finalize()
+
+
+# ==============================================================
+# דמו – אותם events של 09, מול Q8
+# ==============================================================
+
+def _events_09():
+    """משחזר את events של 09_python_qna_advanced.py (כל קריאות ה-rng לפי הסדר, seed 12)."""
+    rng = np.random.default_rng(12)
+    matches = pd.DataFrame({
+        "match_id"     : np.arange(1001, 1031),
+        "match_date"   : pd.to_datetime("2025-06-01") + pd.to_timedelta(rng.integers(0, 45, 30), unit="D"),
+        "home_team_id" : rng.integers(1, 6, 30),
+        "away_team_id" : rng.integers(1, 6, 30),
+        "home_score"   : rng.integers(0, 5, 30),
+        "away_score"   : rng.integers(0, 5, 30),
+    })
+    matches = matches[matches["home_team_id"] != matches["away_team_id"]].reset_index(drop=True)
+    odds = (
+        matches[["match_id","match_date"]]
+        .merge(pd.DataFrame({"bookmaker":["BK"]}), how="cross")
+        .assign(
+            collected_at=lambda d: d["match_date"] - pd.to_timedelta(rng.integers(1, 72, len(d)), unit="h"),
+            home_win   = lambda d: np.round(rng.uniform(1.4, 3.2, len(d)), 2),
+            draw       = lambda d: np.round(rng.uniform(2.5, 4.5, len(d)), 2),
+            away_win   = lambda d: np.round(rng.uniform(1.6, 3.8, len(d)), 2),
+        )
+    )
+    odds.sample(frac=0.7, random_state=7).assign(collected_at=lambda d: d["collected_at"] + pd.to_timedelta(rng.integers(1, 36, len(d)), unit="h"))
+    return pd.DataFrame({
+        "user_id"  : rng.integers(1, 400, 1500),
+        "event"    : rng.choice(["visit","signup","purchase"], 1500, p=[0.6,0.25,0.15]),
+        "ts"       : pd.to_datetime("2025-06-01") + pd.to_timedelta(rng.integers(0, 45, 1500), unit="D"),
+        "amount"   : np.round(rng.gamma(2.2, 30, 1500), 2),
+        "variant"  : rng.choice(["A","B"], 1500),
+    })
+
+
+def _q8(events):
+    """הקוד של Q8."""
+    visits = events[events["event"]=="visit"][["user_id","ts"]].rename(columns={"ts":"visit_ts"})
+    first = visits.groupby("user_id", as_index=False)["visit_ts"].min().rename(columns={"visit_ts":"first_ts"})
+    ret = visits.merge(first, on="user_id", how="left")
+    ret["delta"] = (ret["visit_ts"] - ret["first_ts"]).dt.days
+    def within(d, k): return (ret["delta"].between(1, k)).groupby(ret["user_id"]).any().mean()
+    return {"ret7": within(ret, 7), "ret14": within(ret, 14), "ret30": within(ret, 30)}
+
+
+def demo():
+    print("\n=== cohort retention vs Q8 ===")
+    events = _events_09()
+    visits = events[events["event"]=="visit"].sort_values(["user_id","ts"])
+    chunks = (visits.iloc[i:i + 100] for i in range(0, len(visits), 100))   # chunks קטנים בכוונה
+    eng = cohort_retention(chunks, max_offset=30, cohort_freq="W")
+
+    ref = _q8(events)
+    got = eng.overall((7, 14, 30))
+    assert got == ref, (got, ref)
+    print(got)
+    print("overall == Q8 (ret7/ret14/ret30) ✔")
+    print(eng.windows((1, 7, 14, 30)).round(3))
+    print(eng.matrix().iloc[:, :10].round(2))
+
+
+# ==============================================================
+# Benchmark
+# ==============================================================
+
+def bench(n_events=50_000_000, n_users=5_000_000, chunk=5_000_000, seed=0):
+    rng = np.random.default_rng(seed)
+    users = np.sort(rng.integers(0, n_users, n_events))
+    ts = (np.datetime64("2024-01-01", "ns") + rng.integers(0, 365 * 86_400, n_events) * np.int64(10**9))
+    df = pd.DataFrame({"user_id": users, "ts": ts})
+    print(f"\n=== bench: {n_events:,} events, {n_users:,} users, chunk={chunk:,} ===")
+    t0 = time.perf_counter()
+    eng = cohort_retention((df.iloc[i:i + chunk] for i in range(0, n_events, chunk)),
+                           max_offset=90, cohort_freq="M")
+    t = time.perf_counter() - t0
+    print(f"streaming engine : {t:8.2f} s  ({n_events / t:,.0f} events/s)")
+    print(eng.windows((7, 30, 90)).round(3).head())
+
+
+if __name__ == "__main__":
+    demo()
+    if "--bench" in sys.argv:
+        bench()
+
+######################################################################
+# 💡 TL;DR:
+# • מיון לפי user → כל משתמש נסגר פעם אחת ומתקפל לספירות; אין merge ואין טבלה מלאה בזיכרון.
+# • "חזר בתוך k" = offset חיובי ראשון <= k → cumsum אחד נותן את כל החלונות.
+# • המשתמש האחרון ב-chunk עובר ל-chunk הבא – התוצאה זהה לכל גודל chunk.
+######################################################################
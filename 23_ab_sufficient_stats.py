@@ -0,0 +1,376 @@
+######################################################################
+# 📌 23 – A/B Engine: Welch t-test מ-sufficient statistics (streaming, mergeable)
+#
+# מה יש פה:
+#  1) batch_moments / merge_moments – (n, mean, M2) לכל תא, בצורת Welford (Chan et al.)
+#  2) ABStats – צובר batches לפי (experiment, metric, variant); merge בין workers; שמירה ל-frame
+#  3) results() – lift, Welch t, df (Welch–Satterthwaite), p-value מדויק מה-CDF של t, CI
+#  4) t_sf / t_ppf – CDF של t (scipy אם קיים, אחרת incomplete beta וקטורי)
+#  5) דמו: אותם events של 09 → t ו-df זהים ל-welch_t של Q9, + p-value
+#
+# הרעיון:
+#  • welch_t ב-Q9 צריך את A ו-B כ-arrays מלאים, ומחזיר רק t ו-df.
+#  • כל מה שהמבחן צריך הוא n, mean, var לכל צד → שלושה מספרים לתא, לא הדאטה.
+#  • sum / sum of squares נאיבי מאבד דיוק (var = E[x²]−E[x]² על מספרים גדולים);
+#    לכן שומרים (n, mean, M2) ומאחדים עם נוסחת Chan:
+#        δ = mean_b − mean_a,  n = n_a + n_b
+#        mean = mean_a + δ·n_b/n,   M2 = M2_a + M2_b + δ²·n_a·n_b/n
+#  • הכל וקטורי על כל התאים בבת אחת → אלפי ניסויים × מדדים בקריאה אחת.
+#
+# דרישות: pandas, numpy (אופציונלי: scipy ל-stdtr/stdtrit)
+######################################################################
+
+import math
+import sys
+import time
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+try:
+    from scipy import special as _sp
+    HAS_SCIPY = True
+except ImportError:
+    HAS_SCIPY = False
+
+
+# ==============================================================
+# 1) מומנטים: batch + merge
+# ==============================================================
+
+def batch_moments(codes, x, n_cells):
+    """(n, mean, M2) לכל תא מתוך batch אחד (שני מעברים בתוך ה-batch → יציב)."""
+    n = np.bincount(codes, minlength=n_cells).astype(np.float64)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.bincount(codes, weights=x, minlength=n_cells) / n
+    mean = np.where(n > 0, mean, 0.0)
+    m2 = np.bincount(codes, weights=(x - mean[codes]) ** 2, minlength=n_cells)
+    return n, mean, m2
+
+
+def merge_moments(a, b):
+    """איחוד שני סטים של (n, mean, M2) – אסוציאטיבי, לא תלוי בסדר ה-batches."""
+    na, ma, m2a = a
+    nb, mb, m2b = b
+    n = na + nb
+    with np.errstate(invalid="ignore", divide="ignore"):
+        delta = mb - ma
+        mean = np.where(n > 0, ma + delta * nb / n, 0.0)
+        m2 = m2a + m2b + np.where(n > 0, delta ** 2 * na * nb / n, 0.0)
+    return n, mean, m2
+
+
+# ==============================================================
+# 2) התפלגות t: sf ו-ppf
+# ==============================================================
+
+_lgamma = np.vectorize(math.lgamma, otypes=[np.float64])
+
+
+def _betacf(a, b, x, n_iter=300, eps=1e-15):
+    """שבר משולב של incomplete beta (Lentz), וקטורי."""
+    tiny = 1e-300
+    qab, qap, qam = a + b, a + 1.0, a - 1.0
+    c = np.ones_like(x)
+    d = 1.0 - qab * x / qap
+    d = 1.0 / np.where(np.abs(d) < tiny, tiny, d)
+    h = d.copy()
+    for m in range(1, n_iter + 1):
+        m2 = 2 * m
+        aa = m * (b - m) * x / ((qam + m2) * (a + m2))
+        d = 1.0 + aa * d
+        d = 1.0 / np.where(np.abs(d) < tiny, tiny, d)
+        c = 1.0 + aa / c
+        c = np.where(np.abs(c) < tiny, tiny, c)
+        h *= d * c
+        aa = -(a + m) * (qab + m) * x / ((a + m2) * (qap + m2))
+        d = 1.0 + aa * d
+        d = 1.0 / np.where(np.abs(d) < tiny, tiny, d)
+        c = 1.0 + aa / c
+        c = np.where(np.abs(c) < tiny, tiny, c)
+        step = d * c
+        h *= step
+        if np.all(np.abs(step - 1.0) < eps):
+            break
+    return h
+
+
+def betainc(a, b, x):
+    """I_x(a, b) – regularized incomplete beta, וקטורי (בלי scipy)."""
+    a, b, x = np.broadcast_arrays(*(np.asarray(v, dtype=np.float64) for v in (a, b, x)))
+    x = np.clip(x, 0.0, 1.0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        lbt = _lgamma(a + b) - _lgamma(a) - _lgamma(b) + a * np.log(x) + b * np.log1p(-x)
+        front = np.exp(lbt)
+        swap = x > (a + 1.0) / (a + b + 2.0)
+        aa, bb, xx = np.where(swap, b, a), np.where(swap, a, b), np.where(swap, 1 - x, x)
+        cf = front * _betacf(aa, bb, xx) / aa
+    out = np.where(swap, 1.0 - cf, cf)
+    return np.where(x <= 0, 0.0, np.where(x >= 1, 1.0, out))
+
+
+def t_sf(t, df):
+    """P(T > t) להתפלגות t עם df (לא חייב להיות שלם – Welch)."""
+    t, df = np.broadcast_arrays(np.asarray(t, dtype=np.float64), np.asarray(df, dtype=np.float64))
+    if HAS_SCIPY:
+        return _sp.stdtr(df, -t)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        tail = 0.5 * betainc(df / 2.0, 0.5, df / (df + t * t))
+    return np.where(t >= 0, tail, 1.0 - tail)
+
+
+def t_ppf(q, df, n_iter=50):
+    """הקוונטיל q של t (q > 0.5); Newton על t_sf מתוך קוונטיל נורמלי."""
+    df = np.asarray(df, dtype=np.float64)
+    if HAS_SCIPY:
+        return _sp.stdtrit(df, q)
+    t = np.full(df.shape, NormalDist().inv_cdf(q))
+    log_c = _lgamma((df + 1) / 2) - _lgamma(df / 2) - 0.5 * np.log(df * np.pi)
+    for _ in range(n_iter):
+        pdf = np.exp(log_c - (df + 1) / 2 * np.log1p(t * t / df))
+        step = (t_sf(t, df) - (1 - q)) / pdf
+        t = t + step
+        if np.all(np.abs(step) < 1e-12 * np.maximum(1, np.abs(t))):
+            break
+    return t
+
+
+# ==============================================================
+# 3) ABStats – צובר לפי (experiment, metric, variant)
+# ==============================================================
+
+class ABStats:
+    """
+    ab = ABStats()
+    for batch in stream:                         # DataFrame: experiment, variant, <metrics...>
+        ab.update(batch, metrics=["amount"], experiment="experiment")
+    ab.merge(other_worker)                       # או ABStats.from_frame(saved)
+    ab.results(control="A", treatment="B")
+    """
+
+    def __init__(self):
+        self._index = {}                         # (experiment, metric, variant) → תא
+        self.n = np.zeros(0)
+        self.mean = np.zeros(0)
+        self.m2 = np.zeros(0)
+
+    def __len__(self):
+        return len(self._index)
+
+    def _cells(self, keys):
+        """מפתחות → מספרי תאים; תאים חדשים נוספים בסוף המערכים."""
+        new = list(dict.fromkeys(k for k in keys if k not in self._index))   # אותו מפתח חדש פעמיים → תא אחד
+        for k in new:
+            self._index[k] = len(self._index)
+        if new:
+            pad = np.zeros(len(new))
+            self.n, self.mean, self.m2 = (np.concatenate([v, pad]) for v in (self.n, self.mean, self.m2))
+        return np.fromiter((self._index[k] for k in keys), dtype=np.int64, count=len(keys))
+
+    def _absorb(self, cells, n, mean, m2):
+        cur = (self.n[cells], self.mean[cells], self.m2[cells])
+        self.n[cells], self.mean[cells], self.m2[cells] = merge_moments(cur, (n, mean, m2))
+
+    def update(self, df, metrics, variant="variant", experiment=None):
+        """batch אחד. experiment=None → ניסוי יחיד בשם "default". ערכי NaN מדולגים."""
+        if experiment is not None:
+            ec, eu = pd.factorize(df[experiment])
+        else:
+            ec, eu = np.zeros(len(df), dtype=np.int64), np.array(["default"], dtype=object)
+        vc, vu = pd.factorize(df[variant])
+        codes = np.where((ec < 0) | (vc < 0), -1, ec * len(vu) + vc)
+        uniq = [(e, v) for e in eu for v in vu]               # לפי סדר codes
+        for metric in metrics:
+            x = df[metric].to_numpy(dtype=np.float64)
+            ok = ~np.isnan(x) & (codes >= 0)
+            n, mean, m2 = batch_moments(codes[ok], x[ok], len(uniq))
+            seen = n > 0
+            n, mean, m2 = n[seen], mean[seen], m2[seen]
+            cells = self._cells([k for k, s in zip(((e, metric, v) for e, v in uniq), seen) if s])
+            self._absorb(cells, n, mean, m2)
+        return self
+
+    def merge(self, other):
+        """מאחד צובר של worker / partition אחר לתוך זה."""
+        keys = list(other._index)
+        src = np.fromiter(other._index.values(), dtype=np.int64, count=len(keys))
+        self._absorb(self._cells(keys), other.n[src], other.mean[src], other.m2[src])
+        return self
+
+    # --- שמירה ---
+    def to_frame(self):
+        keys = list(self._index)
+        out = pd.DataFrame(keys, columns=["experiment", "metric", "variant"])
+        idx = np.fromiter(self._index.values(), dtype=np.int64, count=len(keys))
+        return out.assign(n=self.n[idx], mean=self.mean[idx], m2=self.m2[idx])
+
+    @classmethod
+    def from_frame(cls, frame):
+        """frame של to_frame – גם כמה frames אחרי concat: שורות עם אותו מפתח מתאחדות ב-merge_moments."""
+        self = cls()
+        cols = ["experiment", "metric", "variant"]
+        rnd = frame.groupby(cols, sort=False, dropna=False).cumcount().to_numpy()
+        for r in range(int(rnd.max()) + 1 if len(frame) else 0):   # בכל סבב כל מפתח מופיע לכל היותר פעם אחת
+            part = frame[rnd == r]
+            keys = list(part[cols].itertuples(index=False, name=None))
+            self._absorb(self._cells(keys), part["n"].to_numpy(float),
+                         part["mean"].to_numpy(float), part["m2"].to_numpy(float))
+        return self
+
+    # --- מבחן ---
+    def results(self, control="A", treatment="B", alpha=0.05):
+        """
+        שורה לכל (experiment, metric) שיש לו את שני הצדדים.
+        t ו-diff בכיוון treatment − control (כמו lift); p דו-צדדי; CI ברמה 1−alpha.
+        lift_ci – delta method (קירוב; מתאים כשה-mean של control רחוק מ-0).
+        """
+        st = self.to_frame()
+        st["var"] = st["m2"] / (st["n"] - 1).where(st["n"] > 1)
+        wide = st.pivot_table(index=["experiment", "metric"], columns="variant",
+                              values=["n", "mean", "var"], aggfunc="first")
+        wide = wide.dropna(subset=[("n", control), ("n", treatment)])
+        na, nb = wide[("n", control)].to_numpy(), wide[("n", treatment)].to_numpy()
+        ma, mb = wide[("mean", control)].to_numpy(), wide[("mean", treatment)].to_numpy()
+        va, vb = wide[("var", control)].to_numpy(), wide[("var", treatment)].to_numpy()
+
+        sa, sb = va / na, vb / nb
+        se = np.sqrt(sa + sb)
+        diff = mb - ma
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t = diff / se
+            dof = (sa + sb) ** 2 / (sa ** 2 / (na - 1) + sb ** 2 / (nb - 1))
+            p = np.minimum(1.0, 2 * t_sf(np.abs(t), dof))
+            crit = t_ppf(1 - alpha / 2, dof)
+            base = np.maximum(ma, 1e-9)
+            lift = diff / base
+            lift_se = np.sqrt(sb / base ** 2 + mb ** 2 * sa / base ** 4)
+
+        return pd.DataFrame({
+            "n_control": na, "n_treatment": nb,
+            "mean_control": ma, "mean_treatment": mb,
+            "diff": diff, "diff_ci_low": diff - crit * se, "diff_ci_high": diff + crit * se,
+            "lift": lift, "lift_ci_low": lift - crit * lift_se, "lift_ci_high": lift + crit * lift_se,
+            "t": t, "df": dof, "p_value": p,
+        }, index=wide.index)
+
+
+# ==============================================================
+# דמו – מול welch_t של Q9
+# ==============================================================
+
+def _events_09():
+    """משחזר את events של 09 (אותו seed ואותו סדר קריאות rng)."""
+    rng = np.random.default_rng(12)
+    matches = pd.DataFrame({
+        "match_id"     : np.arange(1001, 1031),
+        "match_date"   : pd.to_datetime("2025-06-01") + pd.to_timedelta(rng.integers(0, 45, 30), unit="D"),
+        "home_team_id" : rng.integers(1, 6, 30),
+        "away_team_id" : rng.integers(1, 6, 30),
+        "home_score"   : rng.integers(0, 5, 30),
+        "away_score"   : rng.integers(0, 5, 30),
+    })
+    n = int((matches["home_team_id"] != matches["away_team_id"]).sum())
+    rng.integers(1, 72, n); rng.uniform(1.4, 3.2, n); rng.uniform(2.5, 4.5, n); rng.uniform(1.6, 3.8, n)
+    rng.integers(1, 36, round(n * 0.7))
+    return pd.DataFrame({
+        "user_id"  : rng.integers(1, 400, 1500),
+        "event"    : rng.choice(["visit","signup","purchase"], 1500, p=[0.6,0.25,0.15]),
+        "ts"       : pd.to_datetime("2025-06-01") + pd.to_timedelta(rng.integers(0, 45, 1500), unit="D"),
+        "amount"   : np.round(rng.gamma(2.2, 30, 1500), 2),
+        "variant"  : rng.choice(["A","B"], 1500),
+    })
+
+
+def welch_t(a, b):
+    """הקוד של Q9."""
+    ma, mb = a.mean(), b.mean()
+    va, vb = a.var(ddof=1), b.var(ddof=1)
+    na, nb = len(a), len(b)
+    t = (ma-mb) / np.sqrt(va/na + vb/nb)
+    df = (va/na + vb/nb)**2 / ( (va**2)/((na**2)*(na-1)) + (vb**2)/((nb**2)*(nb-1)) )
+    return t, df
+
+
+def demo():
+    print("\n=== A/B sufficient stats vs Q9 ===")
+    events = _events_09()
+    purch = events[events["event"]=="purchase"][["variant","amount"]]
+    A = purch.loc[purch["variant"]=="A","amount"].to_numpy()
+    B = purch.loc[purch["variant"]=="B","amount"].to_numpy()
+
+    # שני "workers", כל אחד מקבל batches קטנים; בסוף merge
+    w1, w2 = ABStats(), ABStats()
+    for i in range(0, len(purch), 25):
+        (w1 if (i // 25) % 2 else w2).update(purch.iloc[i:i + 25], metrics=["amount"])
+    ab = ABStats.from_frame(w1.to_frame()).merge(w2)
+    r = ab.results(control="A", treatment="B").iloc[0]
+
+    t_ref, df_ref = welch_t(B, A)                       # אותו כיוון: B − A
+    lift_ref = (B.mean() - A.mean()) / max(A.mean(), 1e-9)
+    assert np.isclose(r["t"], t_ref, rtol=1e-12) and np.isclose(r["df"], df_ref, rtol=1e-12)
+    assert np.isclose(r["lift"], lift_ref, rtol=1e-12)
+    print(f"lift={r['lift']:.3%}, t={r['t']:.3f}, df≈{r['df']:.1f}, p={r['p_value']:.4f}")
+    print(f"diff={r['diff']:.2f}  95% CI [{r['diff_ci_low']:.2f}, {r['diff_ci_high']:.2f}]")
+    print("t / df / lift == welch_t של Q9 ✔")
+
+    # frames שמורים של שני workers אחרי concat == מעבר אחד על הכל
+    single = ABStats().update(purch, metrics=["amount"]).to_frame().sort_values("variant", ignore_index=True)
+    both = ABStats.from_frame(pd.concat([w1.to_frame(), w2.to_frame()], ignore_index=True))
+    both = both.to_frame().sort_values("variant", ignore_index=True)
+    pd.testing.assert_frame_equal(both, single, check_exact=False, rtol=1e-12)
+    print("from_frame(concat(workers)) == update על הכל ✔")
+
+    # fallback בלי scipy מול scipy
+    if HAS_SCIPY:
+        tt = np.array([-3.0, -0.5, 0.0, 0.7, 2.1, 8.0])
+        dd = np.array([1.5, 3.0, 10.0, 57.3, 200.0, 4.2])
+        ref_sf, ref_q = _sp.stdtr(dd, -tt), _sp.stdtrit(dd, 0.975)
+        globals()["HAS_SCIPY"] = False
+        try:
+            got_sf, got_q = t_sf(tt, dd), t_ppf(0.975, dd)
+        finally:
+            globals()["HAS_SCIPY"] = True
+        assert np.allclose(got_sf, ref_sf, rtol=1e-10, atol=1e-14), (got_sf, ref_sf)
+        assert np.allclose(got_q, ref_q, rtol=1e-10)
+        print("t_sf / t_ppf בלי scipy == scipy.special ✔")
+
+
+# ==============================================================
+# Benchmark – אלפי ניסויים × מדדים, streaming
+# ==============================================================
+
+def bench(n_rows=20_000_000, n_exp=2_000, n_metrics=5, batch=2_000_000, seed=0):
+    rng = np.random.default_rng(seed)
+    metrics = [f"m{j}" for j in range(n_metrics)]
+    print(f"\n=== bench: {n_rows:,} rows, {n_exp:,} experiments × {n_metrics} metrics ===")
+    ab = ABStats()
+    t_upd = 0.0
+    for start in range(0, n_rows, batch):
+        m = min(batch, n_rows - start)
+        df = pd.DataFrame({"experiment": rng.integers(0, n_exp, m),
+                           "variant": rng.choice(np.array(["A", "B"]), m)})
+        for j, c in enumerate(metrics):
+            df[c] = rng.gamma(2.0, 10.0 + j, m)
+        t0 = time.perf_counter()
+        ab.update(df, metrics=metrics, experiment="experiment")
+        t_upd += time.perf_counter() - t0
+    t0 = time.perf_counter()
+    res = ab.results()
+    t_res = time.perf_counter() - t0
+    print(f"update : {t_upd:6.2f} s  ({n_rows * n_metrics / t_upd:,.0f} values/s)")
+    print(f"results: {t_res:6.2f} s  for {len(res):,} tests  (scipy={HAS_SCIPY})")
+    print(f"p<0.05 : {(res['p_value'] < 0.05).mean():.3f}  (≈0.05 תחת H0)")
+
+
+if __name__ == "__main__":
+    demo()
+    if "--bench" in sys.argv:
+        bench()
+
+######################################################################
+# 💡 TL;DR:
+# • מבחן Welch צריך רק (n, mean, var) לכל צד → צוברים (n, mean, M2) ולא את הדאטה.
+# • Chan merge = אסוציאטיבי → batches, workers, partitions – אותה תוצאה.
+# • p-value מ-CDF של t עם df לא שלם (incomplete beta); CI ל-diff ול-lift.
+######################################################################
@@ -0,0 +1,285 @@
+######################################################################
+# 📌 24 – Leakage Auditor: בדיקת "מידע מהעתיד" לכל טבלאות הפיצ'רים, בלי merge
+#
+# מה יש פה:
+#  1) LeakageAuditor(reference, key, cutoff) – ציר זמן ייחוס (למשל match_id → match_date)
+#  2) check(name, table, ts, on=..., lag=...) – טבלת עובדות אחת (DataFrame או iterable של chunks)
+#  3) report() / samples / assert_clean() – ספירות, אחוזים, דוגמאות; gate לבניית פיצ'רים
+#  4) דמו: odds של 09 מול Q10 + injuries עם "3 ימים לפני" (SQL Q9) + מפתח מורכב
+#
+# הרעיון:
+#  • Q10 עושה odds.merge(matches) מלא ורק אז משווה collected_at >= match_date.
+#    ב-SQL (Q11 בקובץ ה-sports) אותו דבר עם JOIN; ו-Injuries / PlayerStats חוזרים על זה.
+#  • כאן: הייחוס נשמר פעם אחת כמערך ממוין של מפתחות + cutoff תואם.
+#    לכל שורה בטבלת עובדות: pos = searchsorted(keys, key) → cutoff[pos] → השוואה אחת.
+#    אין טבלה ממוזגת, אין עמודות כפולות; זיכרון ∝ chunk + הייחוס.
+#  • מפתח int בודד → משתמשים בערך עצמו (ואם הטווח צפוף – טבלת lookup ישירה, בלי חיפוש);
+#    מפתח מורכב / טקסט → hash של 64 ביט (כמו 19).
+#  • leak  = ts >= cutoff − lag   (lag=0 → בדיוק התנאי של Q10 / SQL Q11)
+#    orphan = מפתח שלא קיים בייחוס (גם זה באג בבניית פיצ'רים – מדווחים בנפרד)
+#
+# דרישות: pandas, numpy
+######################################################################
+
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+
+def _as_list(cols):
+    return [cols] if isinstance(cols, str) else list(cols)
+
+
+class LeakageAuditor:
+    """
+    aud = LeakageAuditor(matches, key="match_id", cutoff="match_date")
+    aud.check("odds", odds, ts="collected_at")
+    aud.check("injuries", inj_feat, ts="reported_at", lag="3D")
+    aud.report(); aud.samples["odds"]; aud.assert_clean()
+    """
+
+    def __init__(self, reference, key, cutoff, n_samples=5):
+        self.key = _as_list(key)
+        self.n_samples = n_samples
+        self._int_key = len(self.key) == 1 and pd.api.types.is_integer_dtype(reference[self.key[0]])
+        k = self._encode(reference, self.key)
+        c = reference[cutoff].to_numpy().astype("datetime64[ns]").view(np.int64)
+        order = np.argsort(k, kind="stable")
+        self._keys, self._cut = k[order], c[order]
+        dup = self._keys[1:] == self._keys[:-1]
+        if dup.any():
+            raise ValueError(f"reference key {self.key} is not unique "
+                             f"({int(dup.sum())} duplicate keys) – cutoff is ambiguous")
+        # מפתח int צפוף (match_id רץ) → טבלת lookup ישירה במקום חיפוש בינארי
+        self._dense = None
+        if self._int_key and len(k):
+            lo, hi = int(self._keys[0]), int(self._keys[-1])
+            if hi - lo <= 4 * len(k) + 1024:
+                present = np.zeros(hi - lo + 1, dtype=bool)
+                cut = np.zeros(hi - lo + 1, dtype=np.int64)
+                present[self._keys - lo] = True
+                cut[self._keys - lo] = self._cut
+                self._dense = (lo, present, cut)
+        self._rows = []
+        self.samples = {}
+
+    def _encode(self, df, cols):
+        """מפתח → מספר אחד לשורה (int64, או hash uint64 למפתח מורכב)."""
+        if self._int_key:
+            s = df[cols[0]]
+            if s.hasnans:
+                return s.to_numpy(dtype=np.int64, na_value=np.iinfo(np.int64).min)
+            return s.to_numpy(dtype=np.int64)
+        # אותו dtype בשני הצדדים → אותו hash (datetime[us] מול [ns], int32 מול int64)
+        cols_df = pd.DataFrame({
+            k: (df[c].astype("datetime64[ns]") if pd.api.types.is_datetime64_any_dtype(df[c])
+                else df[c].astype(np.int64) if pd.api.types.is_integer_dtype(df[c]) else df[c])
+            for k, c in zip(self.key, cols)
+        })
+        return pd.util.hash_pandas_object(cols_df, index=False).to_numpy()
+
+    def _cutoffs(self, df, on):
+        """cutoff לכל שורה + מסכת found (False → orphan; ה-cutoff שלה לא רלוונטי)."""
+        k = self._encode(df, on)
+        if self._dense is not None:
+            lo, present, cut = self._dense
+            i = k - lo
+            ok = (i >= 0) & (i < len(present))
+            i = np.where(ok, i, 0)
+            return cut[i], ok & present[i]
+        # חיפוש בינארי עם needles ממוינים: ~פי 4 מהיר יותר מגישה אקראית
+        order = np.argsort(k)
+        pos = np.empty(len(k), dtype=np.intp)
+        pos[order] = np.searchsorted(self._keys, k[order])
+        pos = np.minimum(pos, len(self._keys) - 1)
+        found = self._keys[pos] == k
+        return self._cut[pos], found
+
+    def check(self, name, table, ts, on=None, lag=None):
+        """
+        table: DataFrame או iterable של DataFrames (chunks).
+        on: עמודות המפתח בטבלה, באותו סדר כמו key של הייחוס (ברירת מחדל: אותם שמות).
+        lag: "3D" → חייב להיות לפחות 3 ימים לפני ה-cutoff.
+        """
+        on = self.key if on is None else _as_list(on)
+        if len(on) != len(self.key):
+            raise ValueError(f"on={on} does not match reference key {self.key}")
+        lag_ns = 0 if lag is None else int(pd.Timedelta(lag).value)
+        chunks = [table] if isinstance(table, pd.DataFrame) else table
+
+        rows = leaked = orphan = missing_ts = 0
+        max_lead = None
+        samples = []
+        for ch in chunks:
+            cut, found = self._cutoffs(ch, on)
+            t = ch[ts].to_numpy().astype("datetime64[ns]").view(np.int64)
+            nat = t == np.iinfo(np.int64).min
+            lead = t - (cut - lag_ns)                      # >= 0 → דליפה
+            bad = found & ~nat & (lead >= 0)
+            rows += len(ch)
+            leaked += int(bad.sum())
+            orphan += int((~found).sum())
+            missing_ts += int((found & nat).sum())
+            if bad.any():
+                m = int(lead[bad].max())
+                max_lead = m if max_lead is None else max(max_lead, m)
+                if len(samples) < self.n_samples:
+                    idx = np.flatnonzero(bad)[: self.n_samples - len(samples)]
+                    s = ch.iloc[idx][on + [ts]].copy()
+                    s["cutoff"] = cut[idx].view("datetime64[ns]")
+                    samples.append(s)
+
+        self.samples[name] = (pd.concat(samples, ignore_index=True) if samples
+                              else pd.DataFrame(columns=on + [ts, "cutoff"]))
+        self._rows = [r for r in self._rows if r["table"] != name]
+        self._rows.append({
+            "table": name, "rows": rows, "leaked": leaked,
+            "leaked_pct": leaked / rows if rows else 0.0,
+            "orphan": orphan, "missing_ts": missing_ts,
+            "max_lead": pd.NaT if max_lead is None else pd.Timedelta(max_lead),
+            "lag": pd.Timedelta(lag_ns),
+        })
+        return leaked
+
+    def report(self):
+        cols = ["table", "rows", "leaked", "leaked_pct", "orphan", "missing_ts", "max_lead", "lag"]
+        return pd.DataFrame(self._rows, columns=cols).set_index("table")
+
+    def assert_clean(self, allow_orphans=False):
+        """gate: ValueError אם יש דליפה (או orphan, אלא אם allow_orphans)."""
+        rep = self.report()
+        bad = rep["leaked"] > 0
+        if not allow_orphans:
+            bad |= rep["orphan"] > 0
+        if bad.any():
+            raise ValueError(f"leakage audit failed:\n{rep[bad]}")
+        return rep
+
+
+def audit(reference, key, cutoff, tables, n_samples=5):
+    """tables: {name: (table, ts) או (table, ts, {"on":..., "lag":...})} → LeakageAuditor שרץ."""
+    aud = LeakageAuditor(reference, key, cutoff, n_samples=n_samples)
+    for name, spec in tables.items():
+        table, ts, *opts = spec
+        aud.check(name, table, ts, **(opts[0] if opts else {}))
+    return aud
+
+
+# ==============================================================
+# דמו
+# ==============================================================
+
+def _frames_09():
+    """matches + odds כמו ב-09 (seed 12)."""
+    rng = np.random.default_rng(12)
+    matches = pd.DataFrame({
+        "match_id"     : np.arange(1001, 1031),
+        "match_date"   : pd.to_datetime("2025-06-01") + pd.to_timedelta(rng.integers(0, 45, 30), unit="D"),
+        "home_team_id" : rng.integers(1, 6, 30),
+        "away_team_id" : rng.integers(1, 6, 30),
+        "home_score"   : rng.integers(0, 5, 30),
+        "away_score"   : rng.integers(0, 5, 30),
+    })
+    matches = matches[matches["home_team_id"] != matches["away_team_id"]].reset_index(drop=True)
+    odds = (
+        matches[["match_id","match_date"]]
+        .merge(pd.DataFrame({"bookmaker":["BK"]}), how="cross")
+        .assign(
+            collected_at=lambda d: d["match_date"] - pd.to_timedelta(rng.integers(1, 72, len(d)), unit="h"),
+            home_win   = lambda d: np.round(rng.uniform(1.4, 3.2, len(d)), 2),
+            draw       = lambda d: np.round(rng.uniform(2.5, 4.5, len(d)), 2),
+            away_win   = lambda d: np.round(rng.uniform(1.6, 3.8, len(d)), 2),
+        )
+    )
+    extra = odds.sample(frac=0.7, random_state=7).assign(collected_at=lambda d: d["collected_at"] + pd.to_timedelta(rng.integers(1, 36, len(d)), unit="h"))
+    odds = pd.concat([odds, extra], ignore_index=True).sort_values(["match_id","collected_at"]).reset_index(drop=True)
+    return matches, odds.drop(columns="match_date")
+
+
+def demo():
+    print("\n=== leakage auditor ===")
+    matches, odds = _frames_09()
+
+    # Q10 כמו שהוא
+    leak = odds.merge(matches[["match_id","match_date"]], on="match_id", how="left")
+    q10 = leak["collected_at"] >= leak["match_date"]
+
+    aud = LeakageAuditor(matches, key="match_id", cutoff="match_date")
+    aud.check("odds", odds, ts="collected_at")
+    assert aud.report().loc["odds", "leaked"] == int(q10.sum())
+    print(f"Q10 leaked rows = {int(q10.sum())}  ==  auditor ✔")
+
+    # injuries "עד 3 ימים לפני המשחק" (SQL Q9), ב-chunks, עם מפתח שלא קיים
+    rng = np.random.default_rng(1)
+    inj = pd.DataFrame({
+        "match_id": rng.choice(np.r_[matches["match_id"].to_numpy(), 9999], 400),
+        "player_id": rng.integers(1, 60, 400),
+    })
+    md = inj["match_id"].map(matches.set_index("match_id")["match_date"])
+    inj["reported_at"] = md.fillna(pd.Timestamp("2025-06-15")) - pd.to_timedelta(rng.integers(0, 10 * 24, 400), unit="h")
+    aud.check("injuries", (inj.iloc[i:i + 100] for i in range(0, len(inj), 100)), ts="reported_at", lag="3D")
+
+    # מפתח מורכב בשמות אחרים: (home, away, date) → טבלת ייחוס אחרת
+    key = ["home_team_id", "away_team_id", "match_date"]
+    try:
+        LeakageAuditor(matches, key=key, cutoff="match_date")
+    except ValueError as e:
+        print("reference:", e)                                      # בדאטה של 09 יש צמד כפול
+    aud2 = LeakageAuditor(matches.drop_duplicates(key), key=key, cutoff="match_date")
+    feats = matches.rename(columns={"home_team_id": "h", "away_team_id": "a", "match_date": "d"})[["h", "a", "d"]]
+    feats["as_of"] = feats["d"] - pd.Timedelta("1D")
+    feats.loc[::7, "as_of"] += pd.Timedelta("2D")                    # דליפות מוזרקות
+    aud2.check("team_form", feats, ts="as_of", on=["h", "a", "d"])
+
+    print(pd.concat([aud.report(), aud2.report()]))
+    print(aud.samples["injuries"].head(3))
+    try:
+        aud2.assert_clean()
+    except ValueError as e:
+        print("gate:", str(e).splitlines()[0])
+
+
+# ==============================================================
+# Benchmark
+# ==============================================================
+
+def bench(n_matches=5_000_000, n_rows=100_000_000, chunk=10_000_000, seed=0):
+    rng = np.random.default_rng(seed)
+    t0 = np.datetime64("2000-01-01", "ns")
+    matches = pd.DataFrame({
+        "match_id": rng.permutation(n_matches).astype(np.int64) + 1,
+        "match_date": t0 + rng.integers(0, 20 * 365, n_matches) * np.timedelta64(1, "D"),
+    })
+    print(f"\n=== bench: {n_rows:,} fact rows vs {n_matches:,} matches ===")
+    aud = LeakageAuditor(matches, key="match_id", cutoff="match_date")
+
+    # chunk אחד בגודל קבוע, חוזר n_rows / chunk פעמים (מודדים את הבדיקה, לא את יצירת הדאטה)
+    ch = pd.DataFrame({"match_id": rng.integers(1, n_matches + 1, chunk),
+                       "collected_at": t0 + rng.integers(0, 20 * 365 * 24, chunk) * np.timedelta64(1, "h")})
+    data = [ch] * (n_rows // chunk)
+    t = time.perf_counter()
+    aud.check("odds", data, ts="collected_at")
+    t_aud = time.perf_counter() - t
+    print(f"auditor        : {t_aud:7.2f} s  ({n_rows / t_aud:,.0f} rows/s)")
+
+    t = time.perf_counter()
+    m = ch.merge(matches, on="match_id", how="left")
+    int((m["collected_at"] >= m["match_date"]).sum())
+    t_merge = (time.perf_counter() - t) * len(data)
+    print(f"merge (Q10)    : {t_merge:7.2f} s  (הוערך מ-chunk אחד)")
+    print(aud.report())
+
+
+if __name__ == "__main__":
+    demo()
+    if "--bench" in sys.argv:
+        bench()
+
+######################################################################
+# 💡 TL;DR:
+# • בדיקת דליפה = "cutoff לכל מפתח" + השוואה; לא צריך לבנות את ה-JOIN.
+# • ייחוס ממוין פעם אחת → searchsorted לכל chunk → עובד על מאות מיליוני שורות.
+# • מדווחים גם orphan ו-ts חסר – כל אחד מהם שובר את הבטחת "עד זמן המשחק".
+######################################################################
@@ -0,0 +1,270 @@
+######################################################################
+# 📌 25 – Segmentation Engine: חוקי סגמנטציה מקומפלים → Categorical מסודר
+#
+# מה יש פה:
+#  1) compile_segments(rules, default) – רשימת חוקים הצהרתית → Segmenter
+#  2) מסלול "bins": ספים מונוטוניים על עמודה אחת → np.searchsorted אחד + טבלת קודים
+#  3) מסלול "masked": חוקים כלליים → כל חוק נבדק רק על השורות שעוד לא קיבלו סגמנט
+#  4) הפלט: pd.Categorical(ordered=True) ישירות מ-codes (בלי מערך מחרוזות באמצע)
+#  5) דמו: Q11 (np.select), 04 §10 (np.where מקונן), 04 size_bucket (apply) → אותן תוצאות
+#
+# הרעיון:
+#  • np.select / np.where מחשבים כל תנאי על כל המערך, בונים מערך מחרוזות (<U3 = 12 bytes לשורה),
+#    ואז pd.Categorical עושה factorize על המחרוזות. apply(lambda) – לולאת Python לכל שורה.
+#  • "x >= 180 → VIP, x >= 120 → A, x >= 80 → B, אחרת C" = bins ממוינים:
+#        k = searchsorted([80, 120, 180], x, side="right")   # כמה ספים <= x
+#        code = table[k]                                     # 0→C, 1→B, 2→A, 3→VIP
+#    מעבר אחד, int8 לשורה, ו-Categorical.from_codes בלי factorize.
+#  • חוק כללי (כמה עמודות, ==, in, callable): first-match כמו np.select, אבל כל חוק רץ
+#    רק על מה שנשאר – הסגמנטים הגדולים שמופיעים ראשונים חוסכים את רוב העבודה.
+#  • NaN: כמו np.select – אף תנאי לא מתקיים → default (או missing_label משלו).
+#
+# דרישות: pandas, numpy
+######################################################################
+
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+_OPS = {
+    ">=": np.greater_equal, ">": np.greater, "<=": np.less_equal, "<": np.less,
+    "==": np.equal, "!=": np.not_equal,
+    "in": lambda x, v: np.isin(x, list(v)),
+    "between": lambda x, v: (x >= v[0]) & (x <= v[1]),
+}
+# לאיזה צד של searchsorted כל אופרטור, ובאיזה כיוון הספים צריכים להיות (first-match)
+_BIN_OPS = {">=": ("right", -1), ">": ("left", -1), "<": ("right", 1), "<=": ("left", 1)}
+
+
+def _codes_dtype(n):
+    return np.int8 if n < 127 else np.int16 if n < 32_767 else np.int32
+
+
+def _columns(data):
+    """DataFrame / dict / Series → dict של מערכי numpy (בלי העתקה כשאפשר)."""
+    if isinstance(data, pd.Series):
+        return {data.name: data.to_numpy()}
+    if isinstance(data, pd.DataFrame):
+        return {c: data[c].to_numpy() for c in data.columns}
+    return {k: np.asarray(v) for k, v in data.items()}
+
+
+class _View:
+    """גישה לעמודות רק בשורות idx (None = הכל), עם cache לכל עמודה."""
+
+    def __init__(self, cols, idx):
+        self._cols, self._idx, self._cache = cols, idx, {}
+
+    def __getitem__(self, name):
+        if name not in self._cache:
+            col = self._cols[name]
+            self._cache[name] = col if self._idx is None else col[self._idx]
+        return self._cache[name]
+
+
+def _compile_cond(cond):
+    """(col, op, value) / רשימה של כאלה (AND) / callable(view) → callable(view) → mask."""
+    if callable(cond):
+        return cond
+    if isinstance(cond, tuple) and len(cond) == 3 and isinstance(cond[1], str):
+        col, op, val = cond
+        if op not in _OPS:
+            raise ValueError(f"unknown operator {op!r}; expected one of {sorted(_OPS)}")
+        f = _OPS[op]
+        return lambda v: f(v[col], val)
+    parts = [_compile_cond(c) for c in cond]
+
+    def _and(v):
+        m = parts[0](v)
+        for p in parts[1:]:
+            m = m & p(v)
+        return m
+    return _and
+
+
+class Segmenter:
+    """
+    תוצאה של compile_segments. seg(df) → pd.Categorical (ordered).
+    kind: "bins" (searchsorted אחד) או "masked" (first-match עם short-circuit).
+    """
+
+    def __init__(self, rules, default, categories=None, missing_label=None):
+        self.rules = [(r[:-1] if len(r) > 2 else r[0], r[-1]) for r in rules]
+        self.default = default
+        self.missing_label = missing_label
+        labels = [lab for _, lab in self.rules] + [default]
+        if missing_label is not None:
+            labels.append(missing_label)
+        self.categories = list(dict.fromkeys(categories if categories is not None else labels))
+        unknown = set(labels) - set(self.categories)
+        if unknown:
+            raise ValueError(f"labels {sorted(unknown)} are not in categories")
+        self._code = {c: i for i, c in enumerate(self.categories)}
+        self._dtype = _codes_dtype(len(self.categories))
+        self.kind, self._plan = self._compile()
+
+    def _compile(self):
+        """אם כל החוקים הם ספים מונוטוניים על אותה עמודה ואותו אופרטור → bins."""
+        conds = [c for c, _ in self.rules]
+        simple = all(isinstance(c, tuple) and len(c) == 3 and isinstance(c[1], str) for c in conds)
+        if simple and len({(c[0], c[1]) for c in conds}) == 1 and conds[0][1] in _BIN_OPS:
+            col, op = conds[0][0], conds[0][1]
+            side, direction = _BIN_OPS[op]
+            th = np.array([c[2] for c in conds])
+            if th.dtype.kind in "iuf" and np.all(np.diff(th) * direction > 0):
+                labels = [self._code[lab] for _, lab in self.rules]
+                d = self._code[self.default]
+                if direction < 0:            # >= / > : ספים יורדים; k ספים <= x → חוק n-k
+                    edges = th[::-1]
+                    table = [d] + labels[::-1]
+                else:                        # < / <= : ספים עולים; k ספים <= x → חוק k
+                    edges = th
+                    table = labels + [d]
+                return "bins", (col, edges, side, np.array(table, dtype=self._dtype))
+        return "masked", [(_compile_cond(c), self._code[lab]) for c, lab in self.rules]
+
+    def codes(self, data):
+        cols = _columns(data)
+        if self.kind == "bins":
+            col, edges, side, table = self._plan
+            x = cols[col]
+            codes = table[np.searchsorted(edges, x, side=side)]
+            if x.dtype.kind == "f":
+                nan = np.isnan(x)
+                if nan.any():
+                    codes[nan] = self._code[self.missing_label if self.missing_label is not None else self.default]
+            return codes
+
+        n = len(next(iter(cols.values())))
+        codes = np.full(n, self._code[self.default], dtype=self._dtype)
+        rem = None                                   # None = כל השורות עדיין פתוחות
+        for cond, code in self._plan:
+            m = np.asarray(cond(_View(cols, rem)), dtype=bool)
+            if rem is None:
+                hit, rem = np.flatnonzero(m), np.flatnonzero(~m)
+            else:
+                hit, rem = rem[m], rem[~m]
+            codes[hit] = code
+            if not len(rem):
+                break
+        return codes
+
+    def __call__(self, data):
+        return pd.Categorical.from_codes(self.codes(data), categories=self.categories, ordered=True)
+
+    def __repr__(self):
+        return f"Segmenter(kind={self.kind!r}, categories={self.categories})"
+
+
+def compile_segments(rules, default, categories=None, missing_label=None):
+    """
+    rules: רשימה לפי סדר עדיפות (first-match, כמו np.select):
+        ("amount", ">=", 180, "VIP")                       – סף על עמודה
+        ([("amount", ">=", 100), ("country", "in", {"IL"})], "IL_BIG")   – AND של תנאים
+        (lambda v: v["a"] > v["b"], "UP")                  – callable על view של עמודות
+    categories: סדר הקטגוריות (ברירת מחדל: סדר החוקים ואז default).
+    """
+    return Segmenter(rules, default, categories=categories, missing_label=missing_label)
+
+
+# ==============================================================
+# דמו
+# ==============================================================
+
+def demo():
+    print("\n=== segmentation engine ===")
+    rng = np.random.default_rng(0)
+    amounts = pd.Series(np.round(rng.normal(120, 50, 2000).clip(5), 2), name="amount")
+    amounts[::97] = np.nan
+
+    # Q11 (09): np.select
+    q11 = compile_segments([("amount", ">=", 180, "VIP"), ("amount", ">=", 120, "A"),
+                            ("amount", ">=", 80, "B")], default="C")
+    ref = pd.Categorical(np.select([amounts>=180, amounts>=120, amounts>=80], ["VIP","A","B"], default="C"),
+                         categories=["VIP","A","B","C"], ordered=True)
+    got = q11(amounts)
+    assert q11.kind == "bins" and got.equals(ref)
+    print(q11, "== Q11 ✔")
+
+    # 04 §10: np.where מקונן
+    seg04 = compile_segments([("amount", ">=", 120, "A"), ("amount", ">=", 80, "B")], default="C")
+    ref = pd.Categorical(np.where(amounts>=120, "A", np.where(amounts>=80, "B", "C")),
+                         categories=["A","B","C"], ordered=True)
+    assert seg04(amounts).equals(ref)
+    print(seg04, "== 04 §10 ✔")
+
+    # 04 size_bucket: apply(lambda); הסדר הטבעי הוא Low < Mid < High
+    size = compile_segments([("amount", ">=", 120, "High"), ("amount", ">=", 80, "Mid")], default="Low",
+                            categories=["Low", "Mid", "High"])
+    ref = amounts.apply(lambda x: "High" if x>=120 else ("Mid" if x>=80 else "Low"))
+    assert (np.asarray(size(amounts)).astype(object) == ref.to_numpy()).all()
+    print(size, "== size_bucket ✔")
+
+    # "<" עם ספים עולים + missing_label
+    age = compile_segments([("age", "<", 18, "minor"), ("age", "<", 30, "young"), ("age", "<", 65, "adult")],
+                           default="senior", missing_label="unknown")
+    ages = pd.DataFrame({"age": [5, 18, 29.9, 30, 64, 65, np.nan]})
+    print(age.kind, list(age(ages)))
+
+    # חוקים כלליים (כמה עמודות) → masked
+    df = pd.DataFrame({"amount": amounts.fillna(0), "country": rng.choice(["IL", "US", "DE"], len(amounts)),
+                       "visits": rng.integers(0, 20, len(amounts))})
+    gen = compile_segments([
+        ([("amount", ">=", 150), ("country", "==", "IL")], "IL_BIG"),
+        (lambda v: v["visits"] > 15, "LOYAL"),
+        (("country", "in", {"US", "DE"}), "ABROAD"),
+    ], default="OTHER")
+    ref = np.select([(df["amount"]>=150) & (df["country"]=="IL"), df["visits"]>15, df["country"].isin(["US","DE"])],
+                    ["IL_BIG","LOYAL","ABROAD"], default="OTHER")
+    assert (np.asarray(gen(df)).astype(object) == ref).all()
+    print(gen, pd.Series(gen(df)).value_counts().to_dict())
+
+
+# ==============================================================
+# Benchmark
+# ==============================================================
+
+def bench(n=50_000_000, n_apply=1_000_000, seed=0):
+    rng = np.random.default_rng(seed)
+    x = rng.normal(120, 50, n).clip(5)
+    s = pd.Series(x, name="amount")
+    cats = ["VIP", "A", "B", "C"]
+    seg = compile_segments([("amount", ">=", 180, "VIP"), ("amount", ">=", 120, "A"),
+                            ("amount", ">=", 80, "B")], default="C")
+    print(f"\n=== bench: {n:,} rows, 4 segments ===")
+
+    def run(name, f, rows=n):
+        t = time.perf_counter()
+        out = f()
+        dt = (time.perf_counter() - t) * n / rows
+        note = "" if rows == n else f"  (הוערך מ-{rows:,} שורות)"
+        print(f"{name:<28}: {dt:8.2f} s{note}")
+        return out
+
+    got = run("compiled (searchsorted)", lambda: seg(s))
+    ref = run("np.select + Categorical", lambda: pd.Categorical(
+        np.select([x >= 180, x >= 120, x >= 80], ["VIP", "A", "B"], default="C"), categories=cats, ordered=True))
+    assert got.equals(ref)
+    del ref
+    run("nested np.where + Categorical", lambda: pd.Categorical(
+        np.where(x >= 180, "VIP", np.where(x >= 120, "A", np.where(x >= 80, "B", "C"))), categories=cats, ordered=True))
+    small = s.iloc[:n_apply]
+    run("apply(lambda) (size_bucket)", lambda: small.apply(
+        lambda v: "VIP" if v >= 180 else ("A" if v >= 120 else ("B" if v >= 80 else "C"))), rows=n_apply)
+    run("pd.cut", lambda: pd.cut(s, [-np.inf, 80, 120, 180, np.inf], right=False, labels=cats[::-1]))
+    print(f"memory: codes {got.codes.nbytes / 1e6:.0f} MB  vs  <U3 array {n * 12 / 1e6:.0f} MB")
+
+
+if __name__ == "__main__":
+    demo()
+    if "--bench" in sys.argv:
+        bench()
+
+######################################################################
+# 💡 TL;DR:
+# • ספים מונוטוניים = bins → searchsorted אחד + טבלת קודים, ולא N תנאים על כל המערך.
+# • Categorical.from_codes → בלי מערך מחרוזות ובלי factorize; int8 לשורה.
+# • חוקים כלליים: first-match כמו np.select, אבל כל חוק רק על מה שנשאר.
+######################################################################
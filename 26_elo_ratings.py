@@ -0,0 +1,299 @@
+######################################################################
+# 📌 26 – Elo Ratings: דירוג Elo רציף ב-NumPy (Q13 בקובץ ה-SQL של sports, בפייתון)
+#
+# מה יש פה:
+#  1) EloRatings – state במערכים (rating + games לכל קבוצה), update(matches) לפי סדר תאריכים
+#  2) פלט לכל משחק: Elo לפני המשחק לשני הצדדים (בלי leakage), delta, p_home, ו-Elo אחרי
+#  3) K schedule (לפי מספר משחקים), margin-of-victory, יתרון בית, רגרסיה לממוצע בין עונות
+#  4) save / load – המשך אינקרמנטלי מ-state שמור (JSON)
+#  5) דמו: matches של 09; בדיקה מול Q13 (ROW_NUMBER על TeamElo עם as_of_date < match_date)
+#
+# הרעיון:
+#  • Elo הוא רקורסיבי – אי אפשר ב-SQL set-based (Q13 רק "שולף" TeamElo מוכן).
+#  • Q13 לוקח את ה-Elo האחרון עם as_of_date < match_date → שני משחקים באותו יום רואים
+#    את הדירוג של סוף היום הקודם. לכן היחידה הרציפה היא "יום", לא "משחק":
+#        לכל תאריך: pre = R[teams] (וקטורי) → expected → delta → np.add.at(R, teams, delta)
+#    לולאת Python רק על תאריכים (אלפים), לא על משחקים (מיליונים).
+#  • expected = 1 / (1 + 10^(−(R_home + home_adv − R_away) / 400))
+#    delta    = K(team) · G(margin) · (S − expected),  S ∈ {1, 0.5, 0}
+#  • עונה חדשה: R ← init + (R − init)·(1 − regress)
+#
+# דרישות: pandas, numpy
+######################################################################
+
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+OUT_COLS = ["match_id", "home_elo_pre", "away_elo_pre", "elo_delta", "p_home",
+            "home_elo_post", "away_elo_post"]
+
+
+def _margin_multiplier(gd):
+    """World Football Elo: 1 עד הפרש 1, 1.5 להפרש 2, (11+N)/8 להפרש 3+."""
+    gd = np.abs(gd)
+    return np.where(gd <= 1, 1.0, np.where(gd == 2, 1.5, (11.0 + gd) / 8.0))
+
+
+class EloRatings:
+    """
+    elo = EloRatings(k=[(30, 40), (None, 20)], home_adv=60, regress=1/3)
+    feats = elo.update(matches)          # Elo לפני כל משחק (ואחריו)
+    elo.save("elo_state.json")
+    ...
+    elo = EloRatings.load("elo_state.json"); elo.update(new_matches)
+
+    k: מספר קבוע, או schedule של (עד כמה משחקים, K) – None = ללא גבול.
+    season_col: עמודת עונה; אם חסרה ו-regress > 0 → עונה מתאריך (season_start_month).
+    """
+
+    def __init__(self, k=20.0, home_adv=60.0, init=1500.0, regress=0.0, margin=False,
+                 season_col="season", season_start_month=7):
+        self.params = {
+            "k": k if np.isscalar(k) else [list(s) for s in k],
+            "home_adv": float(home_adv), "init": float(init), "regress": float(regress),
+            "margin": bool(margin), "season_col": season_col,
+            "season_start_month": int(season_start_month),
+        }
+        self._index = {}                               # team_id → מקום במערכים
+        self._R = np.zeros(0)
+        self._G = np.zeros(0, dtype=np.int64)
+        self.last_date = None
+        self.last_season = None
+
+    # --- state ---
+    def _teams(self, ids):
+        uniq, inv = np.unique(ids, return_inverse=True)
+        new = [int(t) for t in uniq if int(t) not in self._index]
+        for t in new:
+            self._index[t] = len(self._index)
+        if new:
+            self._R = np.concatenate([self._R, np.full(len(new), self.params["init"])])
+            self._G = np.concatenate([self._G, np.zeros(len(new), dtype=np.int64)])
+        return np.array([self._index[int(t)] for t in uniq], dtype=np.int64)[inv]
+
+    def _k(self, games):
+        k = self.params["k"]
+        if np.isscalar(k):
+            return np.full(len(games), float(k))
+        limits = np.array([np.inf if lim is None else lim for lim, _ in k], dtype=np.float64)
+        values = np.array([v for _, v in k], dtype=np.float64)
+        return values[np.minimum(np.searchsorted(limits, games, side="right"), len(values) - 1)]
+
+    def _seasons(self, m, dates):
+        col = self.params["season_col"]
+        if col in m.columns:
+            return m[col].to_numpy()
+        if self.params["regress"] == 0:
+            return None
+        d = pd.DatetimeIndex(dates)
+        return np.where(d.month >= self.params["season_start_month"], d.year, d.year - 1)
+
+    def ratings(self):
+        """דירוג נוכחי לכל קבוצה."""
+        ids = np.fromiter(self._index, dtype=np.int64, count=len(self._index))
+        idx = np.fromiter(self._index.values(), dtype=np.int64, count=len(self._index))
+        return (pd.DataFrame({"team_id": ids, "elo": self._R[idx], "games": self._G[idx]})
+                .sort_values("elo", ascending=False, ignore_index=True))
+
+    # --- עדכון ---
+    def update(self, matches):
+        """מעבד משחקים חדשים (כולם אחרי last_date) ומחזיר Elo לפני/אחרי לכל משחק."""
+        p = self.params
+        m = matches.sort_values("match_date", kind="stable")
+        dates = m["match_date"].to_numpy().astype("datetime64[ns]")
+        if len(m) == 0:
+            return pd.DataFrame(columns=OUT_COLS)
+        if self.last_date is not None and dates[0] <= np.datetime64(self.last_date, "ns"):
+            raise ValueError(f"matches must be after last processed date {self.last_date}")
+
+        h = self._teams(m["home_team_id"].to_numpy())
+        a = self._teams(m["away_team_id"].to_numpy())
+        gd = (m["home_score"] - m["away_score"]).to_numpy()
+        S = np.where(gd > 0, 1.0, np.where(gd < 0, 0.0, 0.5))
+        G = _margin_multiplier(gd) if p["margin"] else np.ones(len(m))
+        seasons = self._seasons(m, dates)
+
+        n = len(m)
+        pre_h, pre_a, exp_h = np.empty(n), np.empty(n), np.empty(n)
+        post_h, post_a = np.empty(n), np.empty(n)
+        bounds = np.r_[0, np.flatnonzero(dates[1:] != dates[:-1]) + 1, n]
+        R, Gm, init = self._R, self._G, p["init"]
+        for s, e in zip(bounds[:-1], bounds[1:]):
+            if seasons is not None and seasons[s] != self.last_season:
+                if self.last_season is not None and p["regress"]:
+                    R += (init - R) * p["regress"]
+                self.last_season = seasons[s].item() if hasattr(seasons[s], "item") else seasons[s]
+            hh, aa = h[s:e], a[s:e]
+            rh, ra = R[hh], R[aa]
+            ex = 1.0 / (1.0 + 10.0 ** (-(rh + p["home_adv"] - ra) / 400.0))
+            dh = self._k(Gm[hh]) * G[s:e] * (S[s:e] - ex)
+            da = self._k(Gm[aa]) * G[s:e] * (ex - S[s:e])
+            teams = np.concatenate([hh, aa])
+            np.add.at(R, teams, np.concatenate([dh, da]))
+            np.add.at(Gm, teams, 1)
+            pre_h[s:e], pre_a[s:e], exp_h[s:e] = rh, ra, ex
+            post_h[s:e], post_a[s:e] = R[hh], R[aa]
+        self.last_date = str(dates[-1])
+
+        return pd.DataFrame({
+            "match_id": m["match_id"].to_numpy(),
+            "home_elo_pre": pre_h, "away_elo_pre": pre_a, "elo_delta": pre_h - pre_a,
+            "p_home": exp_h, "home_elo_post": post_h, "away_elo_post": post_a,
+        }, index=m.index).sort_index()
+
+    # --- שמירה ---
+    def to_dict(self):
+        idx = list(self._index.values())
+        return {
+            "params": self.params, "last_date": self.last_date,
+            "last_season": self.last_season,
+            "teams": list(self._index), "rating": self._R[idx].tolist(), "games": self._G[idx].tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        self = cls(**d["params"])
+        self._index = {int(t): i for i, t in enumerate(d["teams"])}
+        self._R = np.array(d["rating"], dtype=np.float64)
+        self._G = np.array(d["games"], dtype=np.int64)
+        self.last_date, self.last_season = d["last_date"], d["last_season"]
+        return self
+
+    def save(self, path):
+        Path(path).write_text(json.dumps(self.to_dict()), encoding="utf-8")
+
+    @classmethod
+    def load(cls, path):
+        return cls.from_dict(json.loads(Path(path).read_text(encoding="utf-8")))
+
+
+# ==============================================================
+# דמו
+# ==============================================================
+
+def _matches_09():
+    rng = np.random.default_rng(12)
+    matches = pd.DataFrame({
+        "match_id"     : np.arange(1001, 1031),
+        "match_date"   : pd.to_datetime("2025-06-01") + pd.to_timedelta(rng.integers(0, 45, 30), unit="D"),
+        "home_team_id" : rng.integers(1, 6, 30),
+        "away_team_id" : rng.integers(1, 6, 30),
+        "home_score"   : rng.integers(0, 5, 30),
+        "away_score"   : rng.integers(0, 5, 30),
+    })
+    return matches[matches["home_team_id"] != matches["away_team_id"]].reset_index(drop=True)
+
+
+def _q13_reference(matches, feats, init):
+    """Q13: TeamElo(team_id, as_of_date, elo) = Elo אחרי כל יום; לוקחים את האחרון < match_date."""
+    m = matches.merge(feats, on="match_id")
+    hist = pd.concat([
+        m[["home_team_id", "match_date", "home_elo_post"]].set_axis(["team_id", "as_of_date", "elo"], axis=1),
+        m[["away_team_id", "match_date", "away_elo_post"]].set_axis(["team_id", "as_of_date", "elo"], axis=1),
+    ]).drop_duplicates(["team_id", "as_of_date"], keep="last").sort_values("as_of_date")
+    # ב-TeamElo יש שורה אחת לקבוצה ליום = ה-Elo בסוף היום (אחרי כל המשחקים שלה)
+    out = {}
+    for side in ("home", "away"):
+        q = m[["match_id", "match_date", f"{side}_team_id"]].sort_values("match_date")
+        r = pd.merge_asof(q, hist, left_on="match_date", right_on="as_of_date",
+                          left_by=f"{side}_team_id", right_by="team_id", allow_exact_matches=False)
+        out[side] = r.set_index("match_id")["elo"].fillna(init)
+    return out
+
+
+def demo():
+    print("\n=== Elo ratings ===")
+    matches = _matches_09()
+    elo = EloRatings(k=20, home_adv=60)
+    feats = elo.update(matches)
+    print(matches[["match_id", "match_date", "home_team_id", "away_team_id", "home_score", "away_score"]]
+          .merge(feats[["match_id", "home_elo_pre", "away_elo_pre", "elo_delta", "p_home"]], on="match_id")
+          .sort_values("match_date").head(8).round(1))
+
+    ref = _q13_reference(matches, feats, elo.params["init"])
+    f = feats.set_index("match_id")
+    assert np.allclose(f["home_elo_pre"], ref["home"].reindex(f.index))
+    assert np.allclose(f["away_elo_pre"], ref["away"].reindex(f.index))
+    print("Elo לפני משחק == Q13 (TeamElo עם as_of_date < match_date) ✔")
+    print(elo.ratings().round(1))
+
+    # אינקרמנטלי: חצי ראשון → save → load → חצי שני == ריצה אחת מלאה
+    # (עונה מתחלפת ב-1 ביולי → גם הרגרסיה לממוצע נבדקת במעבר)
+    full = EloRatings(k=[(5, 40), (None, 20)], home_adv=60, regress=1/3, margin=True).update(matches)
+    cut = matches["match_date"].sort_values().iloc[len(matches) // 2]
+    e1 = EloRatings(k=[(5, 40), (None, 20)], home_adv=60, regress=1/3, margin=True)
+    part1 = e1.update(matches[matches["match_date"] < cut])
+    with tempfile.TemporaryDirectory(prefix="elo_") as d:
+        state = Path(d) / "elo_state.json"
+        e1.save(state)
+        part2 = EloRatings.load(state).update(matches[matches["match_date"] >= cut])
+    inc = pd.concat([part1, part2]).set_index("match_id").sort_index()
+    assert np.allclose(inc.to_numpy(), full.set_index("match_id").sort_index().to_numpy())
+    print("save → load → update == ריצה מלאה ✔")
+
+
+# ==============================================================
+# Benchmark
+# ==============================================================
+
+def _naive(matches, k=20.0, home_adv=60.0, init=1500.0):
+    """לולאת Python על משחקים (אותה סמנטיקה: דירוג סוף-יום קודם)."""
+    R, pending, last = {}, {}, None
+    pre = []
+    for mid, d, h, a, hs, as_ in matches[["match_id", "match_date", "home_team_id", "away_team_id",
+                                           "home_score", "away_score"]].itertuples(index=False):
+        if d != last:
+            for t, dv in pending.items():
+                R[t] = R.get(t, init) + dv
+            pending, last = {}, d
+        rh, ra = R.get(h, init), R.get(a, init)
+        ex = 1 / (1 + 10 ** (-(rh + home_adv - ra) / 400))
+        s = 1.0 if hs > as_ else 0.0 if hs < as_ else 0.5
+        pending[h] = pending.get(h, 0.0) + k * (s - ex)
+        pending[a] = pending.get(a, 0.0) + k * (ex - s)
+        pre.append((mid, rh, ra))
+    return pd.DataFrame(pre, columns=["match_id", "home_elo_pre", "away_elo_pre"])
+
+
+def bench(n_matches=3_000_000, n_teams=20_000, n_days=30 * 365, seed=0):
+    rng = np.random.default_rng(seed)
+    h = rng.integers(0, n_teams, n_matches)
+    a = (h + rng.integers(1, n_teams, n_matches)) % n_teams
+    m = pd.DataFrame({
+        "match_id": np.arange(n_matches),
+        "match_date": np.datetime64("1995-01-01", "ns") + np.sort(rng.integers(0, n_days, n_matches)) * np.timedelta64(1, "D"),
+        "home_team_id": h, "away_team_id": a,
+        "home_score": rng.poisson(1.5, n_matches), "away_score": rng.poisson(1.1, n_matches),
+    })
+    print(f"\n=== bench: {n_matches:,} matches, {n_teams:,} teams, {n_days:,} days ===")
+    t = time.perf_counter()
+    feats = EloRatings(k=20, home_adv=60).update(m)
+    t_vec = time.perf_counter() - t
+    print(f"EloRatings (per-day batches): {t_vec:6.2f} s")
+
+    sub = m.iloc[: n_matches // 10]
+    t = time.perf_counter()
+    ref = _naive(sub)
+    t_naive = (time.perf_counter() - t) * 10
+    print(f"python loop per match       : {t_naive:6.2f} s  (הוערך מ-10%)")
+    assert np.allclose(ref["home_elo_pre"], feats["home_elo_pre"].iloc[: len(sub)])
+    assert np.allclose(ref["away_elo_pre"], feats["away_elo_pre"].iloc[: len(sub)])
+
+
+if __name__ == "__main__":
+    demo()
+    if "--bench" in sys.argv:
+        bench()
+
+######################################################################
+# 💡 TL;DR:
+# • Elo רקורסיבי → state במערכים, ולולאה על תאריכים בלבד; כל יום = עדכון וקטורי אחד.
+# • "Elo לפני משחק" = הדירוג של סוף היום הקודם – בדיוק as_of_date < match_date של Q13.
+# • state נשמר ל-JSON → ממשיכים מהמחזור הבא בלי לחשב מחדש את כל ההיסטוריה.
+######################################################################
@@ -0,0 +1,225 @@
+######################################################################
+# 📌 27 – Head-to-Head Index: היסטוריית מפגשים לכל צמד קבוצות (SQL sports Q14 בפייתון)
+#
+# מה יש פה:
+#  1) head_to_head(matches, last_n=(5,)) – לכל משחק: מפגשים קודמים בין שתי הקבוצות
+#     (תאריך מוקדם ממש), ניצחונות/תיקו/הפסדים, שיעורים והפרש שערים – מנקודת המבט של הבית
+#  2) pair_keys – מפתח צמד לא-מסודר (lo, hi) כך ש-A–B ו-B–A הם אותו צמד
+#  3) דמו: matches של 09 + סט גדול יותר מול self-join בסגנון Q14 (ROW_NUMBER ... rn <= 5)
+#
+# הרעיון:
+#  • Q14 עושה self-join של Matches עם עצמה על הצמד → O(n · מפגשים לצמד), ב-pandas merge ענק.
+#  • כאן: מיון אחד לפי (pair, date). כל מפגש נשמר מנקודת המבט של lo:
+#        win_lo, draw, loss_lo, gd_lo   → cumsum לאורך הצמד
+#    למשחק i: המפגשים הקודמים הם [start_pair, start_of_day_i) – משחק באותו יום לא נספר.
+#    N אחרונים = C[j0] − C[max(start_pair, j0 − N)]   (אותו טריק כמו 13)
+#  • בסוף הופכים לנקודת המבט של הבית: אם home == hi → מחליפים wins↔losses ו-gd → −gd.
+#
+# דרישות: pandas, numpy
+######################################################################
+
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+
+def pair_keys(home, away):
+    """(lo, hi) לכל משחק + מזהה צמד שלם (lo · (max+1) + hi; אחרת factorize של הזוג)."""
+    lo, hi = np.minimum(home, away), np.maximum(home, away)
+    if lo.dtype.kind in "iu" and len(lo) and lo.min() >= 0 and hi.max() < 2**31:
+        return lo, hi, lo.astype(np.int64) * (int(hi.max()) + 1) + hi
+    pair, _ = pd.factorize(pd.MultiIndex.from_arrays([lo, hi]))
+    return lo, hi, pair
+
+
+def _pair_date_order(pair, d):
+    """סדר לפי (pair, date). אם נכנס ב-int64 → argsort אחד על מפתח משולב (פי ~5 מ-lexsort)."""
+    if len(d) == 0:
+        return np.zeros(0, dtype=np.intp)
+    unit = 86_400 * 10**9 if not (d % (86_400 * 10**9)).any() else 1   # תאריכים בלי שעה → ימים
+    t = (d - d.min()) // unit
+    span = int(t.max()) + 1
+    if int(pair.max()) < (2**62) // span:
+        return np.argsort(pair.astype(np.int64) * span + t)   # סדר בתוך (צמד, יום) לא משנה
+    return np.lexsort((d, pair))
+
+
+def head_to_head(matches, last_n=(5,), home="home_team_id", away="away_team_id",
+                 date="match_date", home_score="home_score", away_score="away_score"):
+    """
+    מחזיר DataFrame באותו index כמו matches, עם:
+      h2h_meetings           – כל המפגשים הקודמים
+      h2h{N}_n               – כמה מפגשים ב-N האחרונים (<= N)
+      h2h{N}_home_wins / _draws / _home_losses  (ניצחונות של קבוצת הבית של המשחק הנוכחי)
+      h2h{N}_home_win_rate / _draw_rate / _home_loss_rate  (NaN אם אין מפגשים)
+      h2h{N}_home_gd / h2h{N}_home_gd_avg      (הפרש שערים מצטבר מנקודת מבט הבית)
+    """
+    last_n = [last_n] if np.isscalar(last_n) else list(last_n)
+    h = matches[home].to_numpy()
+    a = matches[away].to_numpy()
+    lo, hi, pair = pair_keys(h, a)
+    d = matches[date].to_numpy().astype("datetime64[ns]").view(np.int64)
+
+    order = _pair_date_order(pair, d)
+    ps, ds = pair[order], d[order]
+    n = len(order)
+
+    # ערכים מנקודת המבט של lo
+    hs = matches[home_score].to_numpy()[order]
+    as_ = matches[away_score].to_numpy()[order]
+    flip = h != lo                                                   # הבית הנוכחי הוא hi
+    lo_is_home = ~flip[order]
+    gd_lo = np.where(lo_is_home, hs - as_, as_ - hs).astype(np.float64)
+    vals = np.column_stack([gd_lo > 0, gd_lo == 0, gd_lo < 0, gd_lo]).astype(np.float64)
+    C = np.zeros((n + 1, 4))
+    np.cumsum(vals, axis=0, out=C[1:])
+
+    idx = np.arange(n)
+    new_pair = np.r_[True, ps[1:] != ps[:-1]]
+    new_day = new_pair | np.r_[True, ds[1:] != ds[:-1]]
+    start = np.maximum.accumulate(np.where(new_pair, idx, 0))       # תחילת הצמד
+    j0 = np.maximum.accumulate(np.where(new_day, idx, 0))           # תחילת "היום" בתוך הצמד
+
+    # חזרה לסדר המקורי: gather של בלוק (n × 5) לכל N – שורה רציפה לכל משחק
+    inv_rows = np.empty(n, dtype=np.intp)
+    inv_rows[order] = idx
+    Cj0 = np.take(C, j0, axis=0)
+    res = {"h2h_meetings": (j0 - start)[inv_rows]}
+    for N in last_n:
+        s = np.maximum(start, j0 - N)
+        block = np.empty((n, 5))
+        np.subtract(Cj0, np.take(C, s, axis=0), out=block[:, :4])
+        block[:, 4] = j0 - s
+        w, dr, l, gd, cnt = np.take(block, inv_rows, axis=0).T
+        w, l = np.where(flip, l, w), np.where(flip, w, l)
+        gd = np.where(flip, -gd, gd) + 0.0                          # בלי -0.0
+        with np.errstate(invalid="ignore", divide="ignore"):
+            rate = 1.0 / np.where(cnt > 0, cnt, np.nan)
+        p = f"h2h{N}_"
+        res.update({
+            p + "n": cnt.astype(np.int64),
+            p + "home_wins": w.astype(np.int64), p + "draws": dr.astype(np.int64),
+            p + "home_losses": l.astype(np.int64),
+            p + "home_win_rate": w * rate, p + "draw_rate": dr * rate, p + "home_loss_rate": l * rate,
+            p + "home_gd": gd, p + "home_gd_avg": gd * rate,
+        })
+    return pd.DataFrame(res, index=matches.index)
+
+
+# ==============================================================
+# reference – Q14 כ-self-join ב-pandas
+# ==============================================================
+
+def q14_reference(matches, N=5):
+    """self-join על הצמד, m2.match_date < m1.match_date, ROW_NUMBER ... DESC, rn <= N."""
+    m = matches[["match_id", "match_date", "home_team_id", "away_team_id", "home_score", "away_score"]]
+    lo = np.minimum(m["home_team_id"], m["away_team_id"])
+    hi = np.maximum(m["home_team_id"], m["away_team_id"])
+    m = m.assign(lo=lo, hi=hi)
+    j = m.merge(m, on=["lo", "hi"], suffixes=("", "_p"))
+    j = j[j["match_date_p"] < j["match_date"]]
+    won = (((j["home_team_id_p"] == j["home_team_id"]) & (j["home_score_p"] > j["away_score_p"])) |
+           ((j["away_team_id_p"] == j["home_team_id"]) & (j["away_score_p"] > j["home_score_p"])))
+    j = j.assign(home_team_won_past=won.astype(int))
+    j["rn"] = j.sort_values("match_date_p", ascending=False).groupby("match_id").cumcount() + 1
+    return j[j["rn"] <= N].groupby("match_id")["home_team_won_past"].sum()
+
+
+# ==============================================================
+# דמו
+# ==============================================================
+
+def _matches_09():
+    rng = np.random.default_rng(12)
+    matches = pd.DataFrame({
+        "match_id"     : np.arange(1001, 1031),
+        "match_date"   : pd.to_datetime("2025-06-01") + pd.to_timedelta(rng.integers(0, 45, 30), unit="D"),
+        "home_team_id" : rng.integers(1, 6, 30),
+        "away_team_id" : rng.integers(1, 6, 30),
+        "home_score"   : rng.integers(0, 5, 30),
+        "away_score"   : rng.integers(0, 5, 30),
+    })
+    return matches[matches["home_team_id"] != matches["away_team_id"]].reset_index(drop=True)
+
+
+def _synthetic(n_matches, n_teams, seed=0, unique_dates=False):
+    rng = np.random.default_rng(seed)
+    h = rng.integers(0, n_teams, n_matches)
+    a = (h + rng.integers(1, n_teams, n_matches)) % n_teams
+    days = rng.permutation(n_matches) if unique_dates else rng.integers(0, 20 * 365, n_matches)
+    return pd.DataFrame({
+        "match_id": np.arange(n_matches),
+        "match_date": np.datetime64("2000-01-01", "ns") + days * np.timedelta64(1, "D"),
+        "home_team_id": h, "away_team_id": a,
+        "home_score": rng.poisson(1.5, n_matches), "away_score": rng.poisson(1.1, n_matches),
+    })
+
+
+def _check_q14(matches, N=5):
+    got = head_to_head(matches, last_n=N).set_index(matches["match_id"])[f"h2h{N}_home_wins"]
+    ref = q14_reference(matches, N)
+    # ב-SQL משחק בלי מפגשים קודמים לא מופיע (INNER JOIN) → אצלנו 0
+    assert (got.reindex(ref.index) == ref).all()
+    assert (got.drop(ref.index) == 0).all()
+    return got
+
+
+def demo():
+    print("\n=== head-to-head index ===")
+    matches = _matches_09()
+    feats = head_to_head(matches, last_n=(3, 5))
+    _check_q14(matches, 5)
+    cols = ["h2h_meetings", "h2h5_n", "h2h5_home_wins", "h2h5_draws", "h2h5_home_losses", "h2h5_home_gd"]
+    print(matches[["match_id", "match_date", "home_team_id", "away_team_id"]].join(feats[cols])
+          .sort_values("match_date").tail(8))
+    print("h2h5_home_wins == Q14 (self-join, rn <= 5) ✔  [09]")
+
+    # סט גדול יותר, תאריכים ייחודיים (כדי ש-ROW_NUMBER של Q14 יהיה חד-משמעי)
+    big = _synthetic(20_000, 12, seed=1, unique_dates=True)
+    for N in (1, 5, 10):
+        _check_q14(big, N)
+    print("h2h{1,5,10}_home_wins == Q14  ✔  [20,000 matches, 12 teams]")
+
+    # משחק חוזר באותו יום לא רואה את עצמו / את "אחיו"
+    same_day = pd.DataFrame({"match_id": [1, 2, 3], "match_date": pd.to_datetime(["2025-01-01"] * 2 + ["2025-02-01"]),
+                             "home_team_id": [1, 2, 1], "away_team_id": [2, 1, 2],
+                             "home_score": [2, 0, 1], "away_score": [0, 0, 1]})
+    print(head_to_head(same_day)[["h2h_meetings", "h2h5_home_wins", "h2h5_draws", "h2h5_home_losses"]])
+
+
+# ==============================================================
+# Benchmark
+# ==============================================================
+
+def bench(n_matches=5_000_000, n_teams=200, seed=0):
+    m = _synthetic(n_matches, n_teams, seed=seed)
+    print(f"\n=== bench: {n_matches:,} matches, {n_teams:,} teams ===")
+    t = time.perf_counter()
+    head_to_head(m, last_n=(5, 10))
+    t_idx = time.perf_counter() - t
+    print(f"head_to_head (sort + cumsum): {t_idx:6.2f} s")
+
+    # self-join: עלות ∝ סכום (מפגשים לצמד)² – מודדים על תת-קבוצה ומדווחים את גודל ה-join
+    sub = m.iloc[: n_matches // 20]
+    t = time.perf_counter()
+    q14_reference(sub, 5)
+    t_join = time.perf_counter() - t
+    lo = np.minimum(m["home_team_id"], m["away_team_id"])
+    hi = np.maximum(m["home_team_id"], m["away_team_id"])
+    sizes = pd.Series(1, index=[lo, hi]).groupby(level=[0, 1]).size().to_numpy(np.float64)
+    print(f"self-join (Q14) on 5%      : {t_join:6.2f} s;  full join would be {(sizes ** 2).sum():,.0f} rows")
+
+
+if __name__ == "__main__":
+    demo()
+    if "--bench" in sys.argv:
+        bench()
+
+######################################################################
+# 💡 TL;DR:
+# • צמד לא-מסודר = (min, max); מיון אחד לפי (צמד, תאריך) ו-cumsum של W/D/L/GD.
+# • "מפגשים קודמים" = עד תחילת היום הנוכחי בתוך הצמד → בלי leakage גם כשיש שני משחקים ביום.
+# • נקודת מבט הבית: אם הבית הוא hi – מחליפים wins↔losses והופכים סימן ל-gd.
+######################################################################
@@ -0,0 +1,257 @@
+######################################################################
+# 📌 28 – Injury As-Of Engine: מי חסר לכל משחק, לכל המשחקים בבת אחת (SQL sports Q9)
+#
+# מה יש פה:
+#  1) InjuryAsOf(injuries, out_statuses, lag) – בונה פעם אחת אינטרוולים של "לא זמין" לכל שחקן
+#  2) missing(matches, weights=None, squad=None, lists=True) – לכל משחק ולכל צד:
+#     כמה חסרים, מי חסר (רשימת player_id), סכום משקל (למשל xG share), וזמינים מתוך סגל
+#  3) xg_share(player_stats) – משקל לשחקן = חלקו ב-xG של הקבוצה (מ-PlayerStats)
+#  4) דמו: מול לולאה נאיבית "הדיווח האחרון לפני cutoff" לכל משחק
+#
+# הרעיון:
+#  • Q9 לוקח MAX(reported_at) על כל ההיסטוריה ורק אז בודק reported_at <= match_date − 3 ימים.
+#    כשהדיווח האחרון הוא אחרי המשחק – השחקן נספר "זמין" גם אם היה OUT באותו זמן (וגם זו דליפה).
+#    כאן: הדיווח האחרון שידוע ב-cutoff = match_date − lag.
+#  • כל דיווח OUT הופך לאינטרוול בזמן cutoff:
+#        start = reported_at
+#        end   = min(הדיווח הבא של אותו שחקן, expected_return − lag)
+#    (expected_return > match_date  ⟺  expected_return − lag > cutoff)
+#    → "חסר במשחק" = start <= cutoff < end  → interval stabbing נקי.
+#    (שני דיווחים באותו reported_at – האחרון בסדר הקלט קובע)
+#  • sweep: השאילתות (team, cutoff) ממוינות; לכל אינטרוול, המשחקים שהוא מכסה הם טווח רציף
+#        [searchsorted(team, start), searchsorted(team, end))
+#    ספירה = difference array + cumsum; רשימות/משקלים = הרחבת הטווחים לזוגות (משחק, שחקן).
+#
+# דרישות: pandas, numpy
+######################################################################
+
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+_INF = np.iinfo(np.int64).max
+
+
+def _ns(s):
+    """datetime → int64 ns; NaT → +inf (אינטרוול פתוח)."""
+    v = s.to_numpy().astype("datetime64[ns]").view(np.int64).copy()
+    v[v == np.iinfo(np.int64).min] = _INF
+    return v
+
+
+def xg_share(player_stats, team="team_id", player="player_id", xg="xg"):
+    """חלק השחקן ב-xG של הקבוצה. שימו לב: להעביר רק סטטיסטיקות מלפני תקופת המשחקים (leakage)."""
+    g = player_stats.groupby([team, player], as_index=False)[xg].sum()
+    g["weight"] = g[xg] / g.groupby(team)[xg].transform("sum").where(lambda s: s > 0)
+    return g[[team, player, "weight"]].fillna({"weight": 0.0})
+
+
+class InjuryAsOf:
+    """
+    eng = InjuryAsOf(injuries, out_statuses=("OUT",), lag="3D")
+    res = eng.missing(matches, weights=xg_share(stats_prev_season), squad=squad)
+    """
+
+    def __init__(self, injuries, out_statuses=("OUT",), lag="0D", team="team_id", player="player_id",
+                 status="status", reported_at="reported_at", expected_return="expected_return"):
+        self.lag = pd.Timedelta(lag).value
+        rep = _ns(injuries[reported_at])
+        order = np.lexsort((rep, injuries[player].to_numpy()))            # stable: (player, reported_at)
+        pid = injuries[player].to_numpy()[order]
+        rep = rep[order]
+        nxt = np.r_[rep[1:], _INF]
+        nxt[np.r_[pid[1:] != pid[:-1], True]] = _INF                    # אין דיווח הבא לשחקן
+        if expected_return in injuries.columns:
+            ret = _ns(injuries[expected_return])[order]
+            ret = np.where(ret == _INF, _INF, ret - self.lag)
+        else:
+            ret = np.full(len(rep), _INF)
+        end = np.minimum(nxt, ret)
+        is_out = injuries[status].isin(list(out_statuses)).to_numpy()[order]
+        keep = is_out & (end > rep)
+        self.intervals = pd.DataFrame({
+            "team_id": injuries[team].to_numpy()[order][keep], "player_id": pid[keep],
+            "start": rep[keep], "end": end[keep],
+        })
+
+    def missing(self, matches, weights=None, squad=None, lists=True, home="home_team_id",
+                away="away_team_id", date="match_date"):
+        iv = self.intervals
+        if squad is not None:
+            sq = pd.MultiIndex.from_frame(squad[["team_id", "player_id"]])
+            iv = iv[pd.MultiIndex.from_frame(iv[["team_id", "player_id"]]).isin(sq)]
+
+        n = len(matches)
+        cutoff = _ns(matches[date]) - self.lag
+        q_team = np.r_[matches[home].to_numpy(), matches[away].to_numpy()]
+        q_time = np.r_[cutoff, cutoff]
+
+        # קוד קבוצה משותף + דרגת זמן משותפת → מפתח int64 אחד שממוין לפי (team, time)
+        tcodes, tuniq = pd.factorize(np.r_[q_team, iv["team_id"].to_numpy()])
+        times = np.r_[q_time, iv["start"].to_numpy(), iv["end"].to_numpy()]
+        tu, trank = np.unique(times, return_inverse=True)
+        span = len(tu) + 1
+        qk = tcodes[:2 * n].astype(np.int64) * span + trank[:2 * n]
+        m = len(iv)
+        ik_start = tcodes[2 * n:].astype(np.int64) * span + trank[2 * n:2 * n + m]
+        ik_end = tcodes[2 * n:].astype(np.int64) * span + trank[2 * n + m:]
+
+        qo = np.argsort(qk, kind="stable")
+        qs = qk[qo]
+        lo = np.searchsorted(qs, ik_start, side="left")                  # cutoff >= start
+        hi = np.searchsorted(qs, ik_end, side="left")                    # cutoff < end
+
+        diff = np.zeros(2 * n + 1, dtype=np.int64)
+        np.add.at(diff, lo, 1)
+        np.add.at(diff, hi, -1)
+        cnt_sorted = np.cumsum(diff[:-1])
+        cnt = np.empty(2 * n, dtype=np.int64)
+        cnt[qo] = cnt_sorted
+
+        out = pd.DataFrame({"match_id": matches["match_id"].to_numpy(),
+                            "home_missing": cnt[:n], "away_missing": cnt[n:]}, index=matches.index)
+        if squad is not None:
+            size = squad.groupby("team_id").size()
+            out["home_available"] = matches[home].map(size).fillna(0).to_numpy(np.int64) - out["home_missing"]
+            out["away_available"] = matches[away].map(size).fillna(0).to_numpy(np.int64) - out["away_missing"]
+
+        if lists or weights is not None:
+            # הרחבה לזוגות (query, interval): סה"כ = גודל הפלט
+            L = hi - lo
+            rep_iv = np.repeat(np.arange(m), L)
+            pos = np.arange(L.sum()) - np.repeat(np.cumsum(L) - L, L) + np.repeat(lo, L)
+            q = qo[pos]
+            players = iv["player_id"].to_numpy()[rep_iv]
+            if weights is not None:
+                w = weights.set_index(["team_id", "player_id"])["weight"]
+                wv = w.reindex(pd.MultiIndex.from_arrays([iv["team_id"].to_numpy(), iv["player_id"].to_numpy()]))
+                wv = wv.fillna(0.0).to_numpy()[rep_iv]
+                ws = np.bincount(q, weights=wv, minlength=2 * n)
+                out["home_missing_weight"], out["away_missing_weight"] = ws[:n], ws[n:]
+            if lists:
+                o = np.lexsort((players, q))
+                q, players = q[o], players[o]
+                bounds = np.searchsorted(q, np.arange(2 * n + 1))
+                parts = np.split(players, bounds[1:-1])
+                out["home_missing_ids"] = parts[:n]
+                out["away_missing_ids"] = parts[n:]
+        return out
+
+
+# ==============================================================
+# reference – לולאה נאיבית (כמו Q9 אבל as-of)
+# ==============================================================
+
+def naive_missing(injuries, matches, out_statuses=("OUT",), lag="3D"):
+    lag = pd.Timedelta(lag)
+    rows = []
+    for r in matches.itertuples(index=False):
+        cut = r.match_date - lag
+        res = {"match_id": r.match_id}
+        for side, team in (("home", r.home_team_id), ("away", r.away_team_id)):
+            known = injuries[(injuries["team_id"] == team) & (injuries["reported_at"] <= cut)]
+            last = known.sort_values("reported_at", kind="stable").groupby("player_id").tail(1)
+            out = last[last["status"].isin(out_statuses) &
+                       (last["expected_return"].isna() | (last["expected_return"] > r.match_date))]
+            res[f"{side}_missing_ids"] = sorted(out["player_id"])
+        rows.append(res)
+    return pd.DataFrame(rows)
+
+
+# ==============================================================
+# דמו
+# ==============================================================
+
+def _demo_data(n_matches=300, n_teams=8, players_per_team=25, n_reports=2_000, seed=3):
+    rng = np.random.default_rng(seed)
+    t0 = pd.Timestamp("2025-01-01")
+    h = rng.integers(1, n_teams + 1, n_matches)
+    a = (h + rng.integers(1, n_teams, n_matches) - 1) % n_teams + 1
+    matches = pd.DataFrame({
+        "match_id": np.arange(1, n_matches + 1),
+        "match_date": t0 + pd.to_timedelta(rng.integers(0, 300, n_matches), unit="D"),
+        "home_team_id": h, "away_team_id": a,
+    })
+    team = rng.integers(1, n_teams + 1, n_reports)
+    player = team * 100 + rng.integers(1, players_per_team + 1, n_reports)
+    rep = t0 + pd.to_timedelta(rng.integers(-30 * 24, 300 * 24, n_reports), unit="h")
+    status = rng.choice(["OUT", "DOUBTFUL", "FIT"], n_reports, p=[0.5, 0.2, 0.3])
+    ret = rep + pd.to_timedelta(rng.integers(1, 40, n_reports), unit="D")
+    ret = ret.where(rng.random(n_reports) > 0.3)                     # לפעמים אין צפי חזרה
+    injuries = pd.DataFrame({"team_id": team, "player_id": player, "status": status,
+                             "reported_at": rep, "expected_return": ret})
+    squad = pd.DataFrame({"team_id": np.repeat(np.arange(1, n_teams + 1), players_per_team)})
+    squad["player_id"] = squad["team_id"] * 100 + np.tile(np.arange(1, players_per_team + 1), n_teams)
+    stats = pd.DataFrame({"team_id": squad["team_id"], "player_id": squad["player_id"],
+                          "xg": np.round(rng.gamma(1.2, 2.0, len(squad)), 2)})
+    return matches, injuries, squad, stats
+
+
+def demo():
+    print("\n=== injury as-of engine ===")
+    matches, injuries, squad, stats = _demo_data()
+    eng = InjuryAsOf(injuries, out_statuses=("OUT",), lag="3D")
+    res = eng.missing(matches, weights=xg_share(stats), squad=squad)
+
+    ref = naive_missing(injuries, matches, lag="3D")
+    for side in ("home", "away"):
+        got = res[f"{side}_missing_ids"].map(lambda a: a.tolist()).tolist()
+        assert got == ref[f"{side}_missing_ids"].tolist()
+        assert (res[f"{side}_missing"] == ref[f"{side}_missing_ids"].map(len)).all()
+    print(res.head(6)[["match_id", "home_missing", "away_missing", "home_available",
+                       "home_missing_weight", "home_missing_ids"]].round(3))
+    print(f"{len(eng.intervals):,} OUT intervals; == לולאה נאיבית (דיווח אחרון <= cutoff) ✔")
+
+
+# ==============================================================
+# Benchmark
+# ==============================================================
+
+def bench(n_matches=1_000_000, n_teams=2_000, n_reports=5_000_000, seed=0):
+    rng = np.random.default_rng(seed)
+    t0 = np.datetime64("2000-01-01", "ns")
+    h = rng.integers(0, n_teams, n_matches)
+    matches = pd.DataFrame({
+        "match_id": np.arange(n_matches),
+        "match_date": t0 + rng.integers(0, 20 * 365, n_matches) * np.timedelta64(1, "D"),
+        "home_team_id": h, "away_team_id": (h + rng.integers(1, n_teams, n_matches)) % n_teams,
+    })
+    team = rng.integers(0, n_teams, n_reports)
+    rep = t0 + rng.integers(0, 20 * 365 * 24, n_reports) * np.timedelta64(1, "h")
+    injuries = pd.DataFrame({
+        "team_id": team, "player_id": team * 1000 + rng.integers(0, 40, n_reports),
+        "status": rng.choice(np.array(["OUT", "FIT"]), n_reports),
+        "reported_at": rep, "expected_return": rep + rng.integers(1, 60, n_reports) * np.timedelta64(1, "D"),
+    })
+    print(f"\n=== bench: {n_matches:,} matches, {n_reports:,} injury reports ===")
+    t = time.perf_counter()
+    eng = InjuryAsOf(injuries, lag="3D")
+    t_build = time.perf_counter() - t
+    t = time.perf_counter()
+    res = eng.missing(matches, lists=False)
+    t_cnt = time.perf_counter() - t
+    t = time.perf_counter()
+    eng.missing(matches, lists=True)
+    t_lst = time.perf_counter() - t
+    print(f"build intervals : {t_build:6.2f} s  ({len(eng.intervals):,} intervals)")
+    print(f"counts          : {t_cnt:6.2f} s")
+    print(f"counts + lists  : {t_lst:6.2f} s  (avg missing/side {res['home_missing'].mean():.2f})")
+    sub = matches.iloc[:200]
+    t = time.perf_counter()
+    naive_missing(injuries, sub, lag="3D")
+    print(f"naive per match : {(time.perf_counter() - t) * n_matches / len(sub):8.0f} s  (הוערך מ-200 משחקים)")
+
+
+if __name__ == "__main__":
+    demo()
+    if "--bench" in sys.argv:
+        bench()
+
+######################################################################
+# 💡 TL;DR:
+# • "חסר במשחק" = אינטרוול [דיווח OUT, min(דיווח הבא, צפי חזרה − lag)) שמכיל את ה-cutoff.
+# • שאילתות ממוינות לפי (team, cutoff) → כל אינטרוול מכסה טווח רציף → diff array לספירה.
+# • Q9 לוקח את הדיווח האחרון בכלל ולא "האחרון לפני המשחק" – כאן זה as-of אמיתי.
+######################################################################
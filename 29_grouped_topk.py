@@ -0,0 +1,208 @@
+######################################################################
+# 📌 29 – Grouped Top-K: טופ-N לכל קבוצה בלי מיון גלובלי
+#
+# מה יש פה:
+#  1) topk_indices(codes, values, k, ties) – אינדקסים של הנבחרים + rank, לפי (group, rank)
+#  2) grouped_topk(df, by, col, k, ties) – עטיפה ל-DataFrame (כמו sort_values().groupby().head(k))
+#  3) ties: "first" = ROW_NUMBER, "min" = RANK, "dense" = DENSE_RANK  (כמו rank(method=...) ≤ k)
+#  4) דמו: 09 Q2, SQL sports Q10 (3 ה-xG הגבוהים לקבוצה), mega Q1/Q16 (טופ הזמנות ללקוח)
+#
+# הרעיון:
+#  • sort_values([group, value]).groupby().head(k) ממיין את כל n השורות ומעתיק את כל ה-frame –
+#    כדי להשאיר k·G שורות.
+#  • כאן: סף לכל קבוצה ב-k סבבים לכל היותר (k קטן):
+#        סבב j: level_j[g] = max{ v : v < level_{j−1}[g] }   (np.maximum.at)
+#               count_j[g] = #{ v == level_j[g] }            (bincount)
+#    "dense" עוצר אחרי k רמות שונות; "min"/"first" עוצרים כשהספירה המצטברת ≥ k.
+#  • מועמדים = v >= threshold[g]  → בערך k·G שורות (+ תיקו בגבול). רק אותם ממיינים
+#    (group, −value, position) כדי לתת rank; "first" חותך את התיקו בגבול לפי סדר הקלט.
+#  • עלות: O(k · n) מעברים רציפים + מיון של המועמדים בלבד; זיכרון O(n) של bool/float אחד בכל פעם.
+#
+# דרישות: pandas, numpy
+######################################################################
+
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+TIES = ("first", "min", "dense")
+
+
+def _ordered(values, largest):
+    """ערכים כך ש"גדול יותר" = עדיף; int נשאר int (~v הופך סדר בלי overflow)."""
+    v = np.asarray(values)
+    if v.dtype.kind == "b":
+        v = v.astype(np.int8)
+    if v.dtype.kind in "iu":
+        v = v.astype(np.int64)
+        return v if largest else ~v, np.iinfo(np.int64).min
+    v = v.astype(np.float64)
+    return v if largest else -v, -np.inf
+
+
+def _thresholds(codes, v, n_groups, k, ties, low):
+    """סף לכל קבוצה: שורות עם v >= thr[g] הן המועמדות."""
+    level = np.full(n_groups, np.inf if low == -np.inf else np.iinfo(np.int64).max, dtype=v.dtype)
+    thr = np.full(n_groups, low, dtype=v.dtype)
+    cum = np.zeros(n_groups, dtype=np.int64)
+    open_ = np.ones(n_groups, dtype=bool)                  # קבוצות שעוד לא הגיעו ל-k
+    for _ in range(k):
+        below = np.where(v < level[codes], v, low)
+        nxt = np.full(n_groups, low, dtype=v.dtype)
+        np.maximum.at(nxt, codes, below)
+        exists = open_ & (nxt > low)
+        if not exists.any():
+            break
+        if ties == "dense":
+            cum += exists
+        else:
+            hit = (v == nxt[codes]) & exists[codes]
+            cum += np.bincount(codes, weights=hit, minlength=n_groups).astype(np.int64)
+        thr = np.where(exists, nxt, thr)
+        level = np.where(exists, nxt, level)
+        open_ &= exists & (cum < k)
+        if not open_.any():
+            break
+    # קבוצה שלא הגיעה ל-k (מעט שורות) – כל השורות שלה מועמדות
+    thr = np.where(open_ & (cum < k), low, thr)
+    return thr
+
+
+def topk_indices(codes, values, k, ties="first", largest=True, n_groups=None):
+    """
+    codes: קוד קבוצה 0..G−1 לכל שורה (למשל מ-pd.factorize); values: מספרי.
+    מחזיר (rows, rank): מיקומי השורות הנבחרות, ממוינים לפי (group, rank); NaN לא נבחר.
+    """
+    if ties not in TIES:
+        raise ValueError(f"ties must be one of {TIES}")
+    codes = np.asarray(codes, dtype=np.int64)
+    v, low = _ordered(values, largest)
+    valid = (codes >= 0) & ~np.isnan(v) if v.dtype.kind == "f" else codes >= 0
+    pos = None
+    if not valid.all():
+        pos = np.flatnonzero(valid)
+        codes, v = codes[pos], v[pos]
+    G = int(codes.max()) + 1 if n_groups is None and len(codes) else (n_groups or 0)
+    if G == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    thr = _thresholds(codes, v, G, k, ties, low)
+    cand = np.flatnonzero(v >= thr[codes])
+    cc, cv = codes[cand], v[cand]
+    o = np.lexsort((cand, -cv if cv.dtype.kind == "f" else ~cv, cc))   # group, value desc, position
+    cand, cc, cv = cand[o], cc[o], cv[o]
+
+    n = len(cand)
+    start = np.r_[True, cc[1:] != cc[:-1]]
+    gstart = np.maximum.accumulate(np.where(start, np.arange(n), 0))
+    row_number = np.arange(n) - gstart + 1
+    new_val = start | np.r_[True, cv[1:] != cv[:-1]]
+    if ties == "first":
+        rank = row_number
+    elif ties == "min":
+        run_start = np.maximum.accumulate(np.where(new_val, np.arange(n), 0))
+        rank = run_start - gstart + 1
+    else:
+        dense = np.cumsum(new_val)
+        rank = dense - dense[gstart] + 1
+    keep = rank <= k
+    rows = cand[keep]
+    if pos is not None:
+        rows = pos[rows]
+    return rows, rank[keep]
+
+
+def grouped_topk(df, by, col, k, ties="first", largest=True, rank_col="rank"):
+    """df → שורות הטופ-k לכל קבוצה, ממוינות לפי (group, rank), עם עמודת rank."""
+    by = [by] if isinstance(by, str) else list(by)
+    if len(by) == 1:
+        codes, uniq = pd.factorize(df[by[0]], sort=True)
+    else:
+        codes, uniq = pd.MultiIndex.from_frame(df[by]).factorize(sort=True)
+    rows, rank = topk_indices(codes, df[col].to_numpy(), k, ties=ties, largest=largest, n_groups=len(uniq))
+    return df.iloc[rows].assign(**{rank_col: rank})
+
+
+# ==============================================================
+# דמו
+# ==============================================================
+
+def _pandas_ref(df, by, col, k, ties, largest=True):
+    r = df.groupby(by)[col].rank(method=ties, ascending=not largest)
+    out = df[r <= k].assign(rank=r[r <= k].astype(np.int64))
+    return out.sort_values(by + ["rank"], kind="stable") if ties == "first" else out
+
+
+def demo():
+    print("\n=== grouped top-k ===")
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({"g": rng.integers(0, 500, 50_000), "x": rng.integers(0, 30, 50_000).astype(float)})
+    df.loc[::50, "x"] = np.nan
+    for ties in TIES:
+        for largest in (True, False):
+            got = grouped_topk(df, "g", "x", 3, ties=ties, largest=largest)
+            ref = _pandas_ref(df, ["g"], "x", 3, ties, largest)
+            if ties == "first":
+                assert got.index.equals(ref.index) and (got["rank"] == ref["rank"]).all()
+            else:
+                a = got.sort_index()
+                b = ref.sort_index()
+                assert a.index.equals(b.index) and (a["rank"].to_numpy() == b["rank"].to_numpy()).all()
+    print("== rank(method=first/min/dense) <= k, largest/smallest, עם NaN ✔")
+
+    # 09 Q2: 2 הקבוצות עם הכי הרבה נקודות (קבוצה גלובלית אחת)
+    per_team = pd.DataFrame({"team_id": [1, 2, 3, 4, 5], "total_pts": [12, 18, 9, 18, 7]})
+    print(grouped_topk(per_team.assign(all=0), "all", "total_pts", 2, ties="min")[["team_id", "total_pts", "rank"]])
+
+    # SQL sports Q10: 3 התורמים המובילים ב-xG לכל קבוצה (ROW_NUMBER)
+    ps = pd.DataFrame({"team_id": rng.integers(1, 4, 300), "player_id": rng.integers(1, 30, 300),
+                       "xg": np.round(rng.gamma(1.5, 0.2, 300), 2)})
+    x = ps.groupby(["team_id", "player_id"], as_index=False)["xg"].sum().rename(columns={"xg": "total_xg"})
+    print(grouped_topk(x, "team_id", "total_xg", 3).round(2))
+
+    # mega Q1 / Q16: ההזמנה היקרה ביותר / 3 היקרות ללקוח
+    orders = pd.DataFrame({"CustomerID": rng.integers(1, 5, 20), "OrderID": np.arange(100, 120),
+                           "Amount": rng.integers(10, 60, 20)})
+    print(grouped_topk(orders, "CustomerID", "Amount", 1))
+
+
+# ==============================================================
+# Benchmark
+# ==============================================================
+
+def bench(n=100_000_000, n_groups=1_000_000, k=3, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({"g": rng.integers(0, n_groups, n), "x": rng.random(n)})
+    print(f"\n=== bench: {n:,} rows, {n_groups:,} groups, k={k} ===")
+
+    def run(name, f):
+        tracemalloc.start()
+        t = time.perf_counter()
+        out = f()
+        dt = time.perf_counter() - t
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"{name:<38}: {dt:7.2f} s   peak +{peak / 2**20:7.0f} MB")
+        return out
+
+    codes = df["g"].to_numpy()
+    rows, _ = run("topk_indices (thresholds)", lambda: topk_indices(codes, df["x"].to_numpy(), k, n_groups=n_groups))
+    ref = run("sort_values().groupby().head(k)",
+              lambda: df.sort_values(["g", "x"], ascending=[True, False]).groupby("g").head(k))
+    assert np.array_equal(np.sort(rows), np.sort(ref.index.to_numpy()))
+
+
+if __name__ == "__main__":
+    demo()
+    if "--bench" in sys.argv:
+        bench()
+
+######################################################################
+# 💡 TL;DR:
+# • טופ-k לקבוצה = סף לקבוצה; את הסף מוצאים ב-k סבבים של maximum.at – בלי למיין את n.
+# • ממיינים רק את המועמדים (~k·G שורות) כדי לתת ROW_NUMBER / RANK / DENSE_RANK.
+# • ~v ל-int ו-−v ל-float → "smallest" בלי overflow ובלי מסלול נפרד.
+######################################################################
@@ -0,0 +1,356 @@
+######################################################################
+# 📌 30 – Islands & Streaks: רצפים, פערים ו-streaks ב-NumPy (mega SQL Q15 / Q24)
+#
+# מה יש פה:
+#  1) islands(entity, date, gap) – רצפי ימים (או כל יחידה) לכל ישות: start / end / length
+#  2) gaps(islands_df, as_of) – תקופות "רדומות" בין רצפים + הפער הפתוח עד as_of (Q24)
+#  3) streaks(entity, flag, order) – רצפים של True ברצף אירועים (unbeaten, active...)
+#  4) longest(runs) / current(runs, as_of) – הרצף הארוך ביותר וה-island הנוכחי לכל ישות;
+#     current_streak(entity, flag, order, as_of) – ה-streak הנוכחי (לפי האירוע האחרון עד as_of)
+#  5) streak_before(entity, flag) – לכל שורה: אורך רצף ה-True שלפניה (פיצ'ר בלי leakage)
+#  6) דמו: Q15 (date − ROW_NUMBER), רצף בלי הפסד לקבוצות של 09, לקוחות רדומים (Q24)
+#
+# הרעיון:
+#  • Q15 ב-SQL: grp = DATEADD(DAY, −ROW_NUMBER(), d) → ימים רציפים מקבלים אותו grp.
+#    בפייתון זה אותו דבר כמו: "שבירה" כאשר ישות מתחלפת או d[i] − d[i−1] > gap,
+#    ו-island_id = cumsum(breaks). מעבר אחד על מערכים ממוינים – בלי לולאה לכל ישות.
+#  • קצוות ה-islands = המיקומים של השבירות (המערך ממוין → אין צורך ב-min/max לקבוצה):
+#        start = d[break_pos],  end = d[next_break_pos − 1],  length = add.reduceat של ימים חדשים
+#  • streak_before: B = maximum.accumulate(מיקום ה-False האחרון / תחילת הישות) →
+#        רצף כולל = i − B;  "לפני המשחק" = הערך של השורה הקודמת באותה ישות.
+#
+# דרישות: pandas, numpy
+######################################################################
+
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+
+def _sorted(entity, key, presorted):
+    """מיון לפי (entity, key). מפתח int משולב → argsort אחד במקום lexsort (כמו ב-27)."""
+    entity = np.asarray(entity)
+    key = np.asarray(key)
+    if presorted or len(key) == 0:
+        return entity, key, None
+    kv = key.view(np.int64) if key.dtype.kind == "M" else key
+    if entity.dtype.kind in "iub" and kv.dtype.kind in "iu":
+        e0, k0 = int(entity.min()), int(kv.min())
+        span = int(kv.max()) - k0 + 1
+        if (int(entity.max()) - e0 + 1) * span < 2**63:
+            order = np.argsort((entity.astype(np.int64) - e0) * span + (kv - k0), kind="stable")
+            return entity[order], key[order], order
+    order = np.lexsort((key, entity))
+    return entity[order], key[order], order
+
+
+def _run_frame(ent, start_pos, end_pos, start_val, end_val, length):
+    return pd.DataFrame({"entity": ent[start_pos], "start": start_val, "end": end_val,
+                         "length": length, "first_row": start_pos, "last_row": end_pos})
+
+
+# ==============================================================
+# 1) islands – רצפי תאריכים
+# ==============================================================
+
+def islands(entity, date, gap=1, unit="D", presorted=False):
+    """
+    ימים רציפים לכל ישות (gap=1: יום אחרי יום; gap=2: מותר יום חור אחד).
+    entity=None → ישות אחת (כמו Q15). כפילויות באותו יום נספרות פעם אחת (GROUP BY d).
+    """
+    d = pd.to_datetime(pd.Series(np.asarray(date))).to_numpy().astype(f"datetime64[{unit}]")
+    e = np.zeros(len(d), dtype=np.int8) if entity is None else np.asarray(entity)
+    e, d, _ = _sorted(e, d, presorted)
+    t = d.view(np.int64)
+    n = len(t)
+    if n == 0:
+        return _run_frame(e, np.zeros(0, int), np.zeros(0, int), d[:0], d[:0], np.zeros(0, int))
+    new_ent = np.r_[True, e[1:] != e[:-1]]
+    step = np.r_[0, np.diff(t)]
+    brk = new_ent | (step > gap)
+    dup = ~new_ent & (step == 0)                         # אותו יום שוב → לא יום נוסף
+    starts = np.flatnonzero(brk)
+    ends = np.r_[starts[1:], n] - 1
+    days = np.add.reduceat((~dup).astype(np.int64), starts)
+    return _run_frame(e, starts, ends, d[starts], d[ends], days)
+
+
+def gaps(runs, as_of=None, min_gap=1):
+    """
+    תקופות בין islands של אותה ישות (gap_start = end + 1, gap_end = next_start − 1),
+    ואם as_of נתון – גם הפער הפתוח מה-island האחרון עד as_of (לקוחות "רדומים").
+    """
+    r = runs.sort_values(["entity", "start"], kind="stable")
+    e = r["entity"].to_numpy()
+    s, en = r["start"].to_numpy(), r["end"].to_numpy()
+    one = np.timedelta64(1, "D") if s.dtype.kind == "M" else 1
+    same = np.r_[e[1:] == e[:-1], False]
+    out = pd.DataFrame({"entity": e[:-1][same[:-1]], "gap_start": (en[:-1] + one)[same[:-1]],
+                        "gap_end": (s[1:] - one)[same[:-1]], "open": False})
+    if as_of is not None:
+        last = np.r_[~same[:-1], True]
+        as_of = np.datetime64(pd.Timestamp(as_of), "D").astype(s.dtype) if s.dtype.kind == "M" else as_of
+        tail = pd.DataFrame({"entity": e[last], "gap_start": en[last] + one, "gap_end": as_of, "open": True})
+        out = pd.concat([out, tail[tail["gap_start"] <= tail["gap_end"]]], ignore_index=True)
+    out["length"] = ((out["gap_end"] - out["gap_start"]) / one).astype(np.int64) + 1
+    return out[out["length"] >= min_gap].sort_values(["entity", "gap_start"], ignore_index=True)
+
+
+# ==============================================================
+# 2) streaks – רצפים של True ברצף אירועים
+# ==============================================================
+
+def streaks(entity, flag, order=None, presorted=False):
+    """
+    רצפי True רציפים לכל ישות, לפי order (תאריך/מספר משחק). start/end = ערכי order.
+    """
+    flag = np.asarray(flag, dtype=bool)
+    key = np.arange(len(flag)) if order is None else np.asarray(order)
+    e = np.asarray(entity)
+    if not presorted:
+        o = np.lexsort((key, e))
+        e, key, flag = e[o], key[o], flag[o]
+    new_ent = np.r_[True, e[1:] != e[:-1]]
+    prev_true = np.r_[False, flag[:-1]] & ~new_ent
+    starts = np.flatnonzero(flag & ~prev_true)
+    next_true = np.r_[flag[1:], False] & ~np.r_[new_ent[1:], True]
+    ends = np.flatnonzero(flag & ~next_true)
+    out = _run_frame(e, starts, ends, key[starts], key[ends], ends - starts + 1)
+    out.attrs["kind"] = "streaks"                            # current() לא מתאים – ראו current_streak
+    return out
+
+
+def _streak_incl(es, fs):
+    """(ממוין לפי ישות) אורך רצף ה-True שמסתיים בכל שורה, כולל השורה; + מסכת ישות חדשה."""
+    idx = np.arange(len(fs))
+    new_ent = np.r_[True, es[1:] != es[:-1]]
+    B = np.maximum.accumulate(np.maximum(np.where(~fs, idx, -1), np.where(new_ent, idx - 1, -1)))
+    return idx - B, new_ent
+
+
+def streak_before(entity, flag, order=None):
+    """לכל שורה (בסדר המקורי): אורך רצף ה-True שמיד לפניה באותה ישות – בלי השורה עצמה."""
+    flag = np.asarray(flag, dtype=bool)
+    e = np.asarray(entity)
+    key = np.arange(len(flag)) if order is None else np.asarray(order)
+    o = np.lexsort((key, e))
+    incl, new_ent = _streak_incl(e[o], flag[o])              # רצף כולל השורה
+    before = np.where(new_ent, 0, np.r_[0, incl[:-1]])
+    out = np.empty(len(flag), dtype=np.int64)
+    out[o] = before
+    return out
+
+
+def current_streak(entity, flag, order=None, as_of=None):
+    """
+    ה-streak הנוכחי לכל ישות: אורך רצף ה-True שמסתיים באירוע האחרון שלה עד as_of (כולל).
+    אירוע אחרון False (למשל הפסד) → 0, גם אם היה רצף ארוך לפניו; ישות בלי אירועים עד as_of → 0.
+    (runs של streaks() לא מספיקים – הם מכילים רק אירועי True.)
+    """
+    flag = np.asarray(flag, dtype=bool)
+    e = np.asarray(entity)
+    key = np.arange(len(flag)) if order is None else np.asarray(order)
+    if key.dtype == object:
+        key = pd.to_datetime(pd.Series(key)).to_numpy()
+    o = np.lexsort((key, e))
+    es, ks, fs = e[o], key[o], flag[o]
+    incl, _ = _streak_incl(es, fs)
+    keep = np.ones(len(fs), dtype=bool) if as_of is None else \
+        ks <= (np.datetime64(pd.Timestamp(as_of)) if ks.dtype.kind == "M" else as_of)
+    ek, ik = es[keep], incl[keep]
+    last = np.r_[ek[1:] != ek[:-1], True] if len(ek) else np.zeros(0, dtype=bool)
+    out = pd.DataFrame({"entity": np.unique(e)})
+    cur = pd.Series(ik[last], index=ek[last])
+    out["current"] = out["entity"].map(cur).fillna(0).astype(np.int64)
+    return out
+
+
+# ==============================================================
+# 3) סיכומים לכל ישות
+# ==============================================================
+
+def longest(runs):
+    """הרצף הארוך ביותר לכל ישות (הראשון בזמן אם יש תיקו)."""
+    e, st = runs["entity"].to_numpy(), runs["start"].to_numpy()
+    if len(e) > 1 and not ((e[1:] > e[:-1]) | ((e[1:] == e[:-1]) & (st[1:] >= st[:-1]))).all():
+        runs = runs.sort_values(["entity", "start"], kind="stable")
+        e = runs["entity"].to_numpy()
+    if len(e) == 0:
+        return runs[["entity", "start", "end", "length"]].reset_index(drop=True)
+    length = runs["length"].to_numpy()
+    first = np.flatnonzero(np.r_[True, e[1:] != e[:-1]])
+    best = np.repeat(np.maximum.reduceat(length, first), np.diff(np.r_[first, len(e)]))
+    hit = np.flatnonzero(length == best)
+    hit = hit[np.r_[True, e[hit][1:] != e[hit][:-1]]]
+    return runs.iloc[hit][["entity", "start", "end", "length"]].reset_index(drop=True)
+
+
+def current(runs, as_of, gap=1):
+    """
+    ה-island "הפעיל" ב-as_of לכל ישות: island שהתחיל עד as_of ו-end >= as_of − gap.
+    ל-islands של תאריכים האורך נחתך ל-as_of; ישות בלי רצף פעיל → 0.
+    רק ל-islands(): ב-streaks() אירוע False (הפסד) לא מופיע ב-runs → current_streak.
+    """
+    if runs.attrs.get("kind") == "streaks":
+        raise ValueError("current() is for islands; use current_streak(entity, flag, order, as_of) for streaks")
+    r = runs[runs["start"] <= np.datetime64(pd.Timestamp(as_of), "D")] if runs["start"].dtype.kind == "M" \
+        else runs[runs["start"] <= as_of]
+    last = r.sort_values(["entity", "start"], kind="stable").drop_duplicates("entity", keep="last")
+    if runs["start"].dtype.kind == "M":
+        a = np.datetime64(pd.Timestamp(as_of), "D").astype(runs["start"].dtype)
+        one = np.timedelta64(1, "D")
+        active = last["end"].to_numpy() >= a - gap * one
+        span = ((np.minimum(last["end"].to_numpy(), a) - last["start"].to_numpy()) / one).astype(np.int64) + 1
+        length = np.minimum(last["length"].to_numpy(), span)
+    else:
+        active = last["end"].to_numpy() >= as_of - gap
+        length = last["length"].to_numpy()
+    out = pd.DataFrame({"entity": runs["entity"].unique()})
+    cur = pd.Series(np.where(active, length, 0), index=last["entity"].to_numpy())
+    out["current"] = out["entity"].map(cur).fillna(0).astype(np.int64)
+    return out.sort_values("entity", ignore_index=True)
+
+
+# ==============================================================
+# דמו
+# ==============================================================
+
+def _q15_pandas(dates):
+    """Q15 כמו ב-SQL: d − ROW_NUMBER() → grp → MIN/MAX/COUNT."""
+    d = pd.Series(pd.to_datetime(dates).dt.normalize().unique()).sort_values(ignore_index=True)
+    grp = d - pd.to_timedelta(np.arange(1, len(d) + 1), unit="D")
+    return (pd.DataFrame({"d": d, "grp": grp}).groupby("grp")
+            .agg(island_start=("d", "min"), island_end=("d", "max"), days=("d", "size"))
+            .sort_values("island_start").reset_index(drop=True))
+
+
+def _matches_09():
+    rng = np.random.default_rng(12)
+    matches = pd.DataFrame({
+        "match_id"     : np.arange(1001, 1031),
+        "match_date"   : pd.to_datetime("2025-06-01") + pd.to_timedelta(rng.integers(0, 45, 30), unit="D"),
+        "home_team_id" : rng.integers(1, 6, 30),
+        "away_team_id" : rng.integers(1, 6, 30),
+        "home_score"   : rng.integers(0, 5, 30),
+        "away_score"   : rng.integers(0, 5, 30),
+    })
+    return matches[matches["home_team_id"] != matches["away_team_id"]].reset_index(drop=True)
+
+
+def demo():
+    print("\n=== islands & streaks ===")
+    rng = np.random.default_rng(1)
+    cust = rng.integers(1, 40, 600)
+    active_until = rng.integers(20, 121, 40)                # חלק מהלקוחות "נעלמים" מוקדם
+    orders = pd.DataFrame({
+        "CustomerID": cust,
+        "OrderDate": pd.Timestamp("2025-01-01") + pd.to_timedelta(rng.integers(0, active_until[cust]), unit="D")
+                     + pd.to_timedelta(rng.integers(0, 24, 600), unit="h"),
+    })
+
+    # Q15: ימים עם הזמנות (ללא ישות)
+    got = islands(None, orders["OrderDate"])
+    ref = _q15_pandas(orders["OrderDate"])
+    assert (got["start"].to_numpy() == ref["island_start"].to_numpy().astype("datetime64[D]")).all()
+    assert (got["end"].to_numpy() == ref["island_end"].to_numpy().astype("datetime64[D]")).all()
+    assert (got["length"].to_numpy() == ref["days"].to_numpy()).all()
+    print(f"Q15: {len(got)} islands == date − ROW_NUMBER ✔")
+
+    # לכל לקוח: רצפים, הארוך ביותר, פערים ולקוחות רדומים (Q24)
+    runs = islands(orders["CustomerID"], orders["OrderDate"])
+    print(longest(runs).sort_values("length", ascending=False).head(3))
+    as_of = "2025-05-15"
+    g = gaps(runs, as_of=as_of)
+    dormant = g[g["open"] & (g["length"] >= 90)]["entity"]
+    last = orders.groupby("CustomerID")["OrderDate"].max().dt.normalize()
+    q24 = last[last < pd.Timestamp(as_of) - pd.Timedelta(days=89)].index         # 90 ימים בלי הזמנה
+    assert sorted(dormant) == sorted(q24)
+    print(f"Q24: {len(dormant)} dormant customers (>= 90 days without orders as of {as_of}) ✔")
+    cur = current(runs, "2025-03-01")
+    print("current streak as of 2025-03-01:", cur[cur["current"] > 0].to_dict("records")[:3])
+
+    # ספורט: רצף בלי הפסד לכל קבוצה (09)
+    m = _matches_09()
+    long = pd.concat([
+        m.rename(columns={"home_team_id": "team_id", "home_score": "gf", "away_score": "ga"}),
+        m.rename(columns={"away_team_id": "team_id", "away_score": "gf", "home_score": "ga"}),
+    ], ignore_index=True)[["match_id", "match_date", "team_id", "gf", "ga"]]
+    unbeaten = (long["gf"] >= long["ga"]).to_numpy()
+    st = streaks(long["team_id"], unbeaten, order=long["match_date"])
+    print(longest(st))
+    long["unbeaten_before"] = streak_before(long["team_id"], unbeaten, order=long["match_date"])
+    print(long.sort_values(["team_id", "match_date"]).head(8)[["team_id", "match_date", "gf", "ga", "unbeaten_before"]])
+
+    # בדיקה מול לולאה לכל קבוצה
+    for t, grp in long.sort_values(["team_id", "match_date"], kind="stable").groupby("team_id"):
+        run, exp = 0, []
+        for ok in (grp["gf"] >= grp["ga"]):
+            exp.append(run)
+            run = run + 1 if ok else 0
+        assert exp == grp["unbeaten_before"].tolist()
+    print("streak_before == לולאה לכל קבוצה ✔")
+
+    # current_streak: W,W,W ואז L → 0 (ה-runs לא רואים את ה-L); W אחרון לפני הפסקה ארוכה → עדיין 1
+    ev = pd.DataFrame({"team": [1, 1, 1, 1, 2, 2], "won": [True, True, True, False, False, True],
+                       "d": pd.to_datetime(["2025-01-01", "2025-01-02", "2025-01-03", "2025-01-04",
+                                            "2025-01-01", "2025-01-02"])})
+    cs = current_streak(ev["team"], ev["won"], ev["d"], as_of="2025-01-20")
+    assert cs["current"].tolist() == [0, 1]
+    assert current_streak(ev["team"], ev["won"], ev["d"], as_of="2025-01-03")["current"].tolist() == [3, 1]
+    lg = long.sort_values(["team_id", "match_date"]).groupby("team_id").tail(1).set_index("team_id")
+    ref = ((lg["unbeaten_before"] + 1) * (lg["gf"] >= lg["ga"])).sort_index()
+    got = current_streak(long["team_id"], unbeaten, long["match_date"]).set_index("entity")["current"]
+    assert (got.sort_index().to_numpy() == ref.to_numpy()).all()
+    print("current_streak: הפסד אחרון → 0, בלי תלות בפער הימים ✔")
+
+
+# ==============================================================
+# Benchmark
+# ==============================================================
+
+def bench(n=20_000_000, n_entities=1_000_000, seed=0):
+    rng = np.random.default_rng(seed)
+    e = rng.integers(0, n_entities, n)
+    d = np.datetime64("2020-01-01") + rng.integers(0, 3 * 365, n).astype("timedelta64[D]")
+    print(f"\n=== bench: {n:,} (entity, day) rows, {n_entities:,} entities ===")
+    t = time.perf_counter()
+    runs = islands(e, d)
+    lg = longest(runs)
+    t_isl = time.perf_counter() - t
+    print(f"islands + longest (numpy)   : {t_isl:6.2f} s  ({len(runs):,} islands)")
+
+    df = pd.DataFrame({"e": e, "d": d})
+    t = time.perf_counter()
+    s = df.drop_duplicates().sort_values(["e", "d"])
+    brk = (s["e"] != s["e"].shift()) | (s["d"].diff() != pd.Timedelta(days=1))
+    grp = brk.cumsum()
+    ref = s.groupby(grp).agg(e=("e", "first"), start=("d", "min"), end=("d", "max"), length=("d", "size"))
+    ref.sort_values(["e", "length", "start"], ascending=[True, False, True]).drop_duplicates("e")
+    t_pd = time.perf_counter() - t
+    print(f"pandas diff/cumsum/groupby  : {t_pd:6.2f} s")
+    assert len(ref) == len(runs) and (lg["length"].to_numpy().sum() > 0)
+
+    sub = df[df["e"] < n_entities // 100]
+    t = time.perf_counter()
+    for _, g in sub.groupby("e"):
+        days = np.unique(g["d"].to_numpy())
+        best = cur = 1
+        for a, b in zip(days[:-1], days[1:]):
+            cur = cur + 1 if (b - a) == np.timedelta64(1, "D") else 1
+            best = max(best, cur)
+    print(f"python loop per entity      : {(time.perf_counter() - t) * 100:6.2f} s  (הוערך מ-1%)")
+
+
+if __name__ == "__main__":
+    demo()
+    if "--bench" in sys.argv:
+        bench()
+
+######################################################################
+# 💡 TL;DR:
+# • island = "שבירה" כשישות מתחלפת או הקפיצה > gap; cumsum של השבירות = date − ROW_NUMBER.
+# • קצוות, אורכים, הארוך ביותר והנוכחי – ממיקומי השבירות, בלי groupby.apply.
+# • streak_before = אורך הרצף שנגמר בשורה הקודמת → פיצ'ר "רצף לפני המשחק" בלי leakage.
+######################################################################
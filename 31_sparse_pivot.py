@@ -0,0 +1,392 @@
+######################################################################
+# 📌 31 – Sparse Pivot: pivot רחב בלי DataFrame צפוף (Q6 / 04 §9)
+#
+# מה יש פה:
+#  1) PivotEngine – update(chunk) → צבירה לפי קודי קבוצה (row × col), רק תאים לא-ריקים
+#  2) AGGS / register_agg – aggfunc "נשלף": count / size / sum / mean / min / max + שלך
+#  3) SparsePivot – תוצאה ב-COO: totals(), add_pct(), to_sparse() (scipy), to_long(),
+#                    to_frame(sparse=...) עם שמות שטוחים ("count_A", "sum_B") מובנים
+#  4) sparse_pivot(df | chunks, index, columns, values, aggfunc) – עטיפה בשורה אחת
+#  5) דמו: Q6 של 09 (count/sum + total + אחוזים), 04 §9 (חודש × לקוח + fillna(0) + total)
+#
+# הרעיון:
+#  • pivot_table(columns=customer_id) עם מאות אלפי לקוחות → R × C תאים צפופים, רובם 0/NaN,
+#    ואז fillna(0) מעתיק את כולם שוב.
+#  • כאן: cell = row_code · C + col_code → argsort(cell) → ufunc.reduceat לכל חלק (add/min/max).
+#    נשמרים רק (r, c, value) של התאים שיש בהם שורות → זיכרון ~ nnz, לא R × C.
+#  • chunks: כל chunk מצטמצם לבד; מיזוג עם הצבור רק כשהממתינים גדולים ממנו (גיאומטרי) →
+#    כל תא ממוזג O(log chunks) פעמים ולא פעם לכל chunk.
+#  • aggfunc = חלקים שניתנים למיזוג (size/count/sum/min/max) + פונקציית סיום:
+#        mean = sum / count → אפשר לצבור chunk אחרי chunk ולמזג.
+#  • totals ו-pct = bincount על r (או c) של ה-COO + חלוקה לפי r → בלי לפרוש לצפוף.
+#
+# דרישות: pandas, numpy  (scipy – אופציונלי: to_sparse / to_frame(sparse=True) מהיר)
+######################################################################
+
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+try:
+    from scipy import sparse as _sp
+    HAS_SCIPY = True
+except ImportError:
+    HAS_SCIPY = False
+
+
+# ==============================================================
+# 1) חלקים שניתנים למיזוג + aggfuncs
+# ==============================================================
+
+# part → (הכנת ערכים מ-values, פעולת צבירה)
+_PARTS = {
+    "size":  (lambda v, n: np.ones(n),                            np.add),
+    "count": (lambda v, n: (~np.isnan(v)).astype(np.float64),     np.add),
+    "sum":   (lambda v, n: np.where(np.isnan(v), 0.0, v),         np.add),
+    "min":   (lambda v, n: np.where(np.isnan(v), np.inf, v),      np.minimum),
+    "max":   (lambda v, n: np.where(np.isnan(v), -np.inf, v),     np.maximum),
+}
+
+
+def _group(key, parts):
+    """צמצום לפי key: מיון יציב + reduceat → (מפתחות ייחודיים ממוינים, חלקים מצומצמים)."""
+    if not len(key):
+        return key, parts
+    o = np.argsort(key, kind="stable")
+    k = key[o]
+    first = np.flatnonzero(np.r_[True, k[1:] != k[:-1]])
+    return k[first], {p: _PARTS[p][1].reduceat(x[o], first) for p, x in parts.items()}
+
+
+def _ratio(a, b):
+    return np.divide(a, b, out=np.full(len(a), np.nan), where=b != 0)
+
+
+# aggfunc → (חלקים נדרשים, סיום: dict של חלקים → ערכים)
+AGGS = {
+    "size":  (("size",),         lambda p: p["size"].astype(np.int64)),
+    "count": (("count",),        lambda p: p["count"].astype(np.int64)),
+    "sum":   (("sum",),          lambda p: p["sum"]),
+    "mean":  (("sum", "count"),  lambda p: _ratio(p["sum"], p["count"])),
+    "min":   (("min",),          lambda p: np.where(np.isposinf(p["min"]), np.nan, p["min"])),
+    "max":   (("max",),          lambda p: np.where(np.isneginf(p["max"]), np.nan, p["max"])),
+}
+
+
+def register_agg(name, parts, final):
+    """aggfunc חדש מחלקים קיימים, למשל: register_agg("range", ("min", "max"), lambda p: p["max"] - p["min"])."""
+    unknown = set(parts) - set(_PARTS)
+    if unknown:
+        raise ValueError(f"unknown parts {sorted(unknown)}; available: {sorted(_PARTS)}")
+    AGGS[name] = (tuple(parts), final)
+
+
+# ==============================================================
+# 2) PivotEngine – צבירה ב-chunks
+# ==============================================================
+
+class PivotEngine:
+    """
+    eng = PivotEngine(index="q", columns="variant", values="amount", aggfunc=["count", "sum"])
+    for chunk in chunks:
+        eng.update(chunk)
+    pv = eng.finalize()            # SparsePivot
+    """
+
+    def __init__(self, index, columns, values=None, aggfunc="sum"):
+        self.index, self.columns, self.values = index, columns, values
+        self.aggfunc = [aggfunc] if isinstance(aggfunc, str) else list(aggfunc)
+        missing = [a for a in self.aggfunc if a not in AGGS]
+        if missing:
+            raise ValueError(f"unknown aggfunc {missing}; available: {sorted(AGGS)}")
+        self._parts = sorted({p for a in self.aggfunc for p in AGGS[a][0]})
+        if values is None and set(self._parts) != {"size"}:
+            raise ValueError("values is required unless aggfunc='size'")
+        self._labels = {"rows": None, "cols": None}
+        self._r = np.zeros(0, dtype=np.int64)
+        self._c = np.zeros(0, dtype=np.int64)
+        self._acc = {p: np.zeros(0) for p in self._parts}
+        self._pending = []                                # (r, c, parts) של chunks שטרם מוזגו
+        self.n_rows = 0
+
+    def _codes(self, which, s):
+        """קודים גלובליים לתוויות (תוויות חדשות נוספות בסוף)."""
+        labels = self._labels[which]
+        if labels is None:
+            labels = pd.Index(pd.unique(s), name=s.name)
+        codes = labels.get_indexer(s)
+        new = codes < 0
+        if new.any():
+            labels = labels.append(pd.Index(pd.unique(s[new]), name=s.name))
+            codes[new] = labels.get_indexer(s[new])
+        self._labels[which] = labels
+        return codes
+
+    def update(self, chunk):
+        self.n_rows += len(chunk)
+        ok = chunk[self.index].notna() & chunk[self.columns].notna()    # כמו dropna=True ב-pivot_table
+        if not ok.all():
+            chunk = chunk[ok]
+        r = self._codes("rows", chunk[self.index])
+        c = self._codes("cols", chunk[self.columns])
+        v = None if self.values is None else chunk[self.values].to_numpy(dtype=np.float64)
+        prepared = {p: _PARTS[p][0](v, len(chunk)) for p in self._parts}
+        self._absorb(r, c, prepared)
+        return self
+
+    def _absorb(self, r, c, parts):
+        """צמצום ה-chunk לבד; מיזוג עם הצבור רק כשהממתינים גדולים ממנו."""
+        C = max(len(self._labels["cols"]), 1)
+        key, red = _group(r.astype(np.int64) * C + c, parts)
+        self._pending.append((key // C, key % C, red))
+        if sum(len(p[0]) for p in self._pending) >= len(self._r):
+            self._compact()
+
+    def _compact(self):
+        if not self._pending:
+            return
+        C = max(len(self._labels["cols"]), 1)
+        blocks = [(self._r, self._c, self._acc)] + self._pending
+        key = np.concatenate([r * C + c for r, c, _ in blocks])
+        key, self._acc = _group(key, {p: np.concatenate([b[2][p] for b in blocks]) for p in self._parts})
+        self._r, self._c = key // C, key % C
+        self._pending = []
+
+    def finalize(self, sort=True):
+        rows, cols = self._labels["rows"], self._labels["cols"]
+        rows = pd.Index([], name=self.index) if rows is None else rows
+        cols = pd.Index([], name=self.columns) if cols is None else cols
+        self._compact()
+        r, c, acc = self._r, self._c, self._acc
+        if sort:
+            rank_r = np.empty(len(rows), dtype=np.int64); o = rows.argsort(); rank_r[o] = np.arange(len(rows))
+            rank_c = np.empty(len(cols), dtype=np.int64); oc = cols.argsort(); rank_c[oc] = np.arange(len(cols))
+            rows, cols, r, c = rows[o], cols[oc], rank_r[r], rank_c[c]
+            order = np.argsort(r * max(len(cols), 1) + c)          # סדר CSR: שורה ואז עמודה
+            r, c, acc = r[order], c[order], {p: x[order] for p, x in acc.items()}
+        data = {a: AGGS[a][1]({p: acc[p] for p in AGGS[a][0]}) for a in self.aggfunc}
+        return SparsePivot(rows, cols, r, c, data)
+
+
+# ==============================================================
+# 3) SparsePivot – התוצאה
+# ==============================================================
+
+class SparsePivot:
+    """תאים לא-ריקים בלבד: r, c (קודים לתוויות rows / cols) + שכבת ערכים לכל aggfunc."""
+
+    def __init__(self, rows, cols, r, c, data):
+        self.rows, self.cols, self.r, self.c = rows, cols, r, c
+        self.data = dict(data)
+
+    @property
+    def shape(self):
+        return len(self.rows), len(self.cols)
+
+    @property
+    def nnz(self):
+        return len(self.r)
+
+    @property
+    def nbytes(self):
+        return self.r.nbytes + self.c.nbytes + sum(v.nbytes for v in self.data.values())
+
+    def names(self, layers=None, sep="_"):
+        """שמות עמודות שטוחים כמו ב-Q6: f"{agg}{sep}{col}"."""
+        layers = list(self.data) if layers is None else layers
+        return [f"{a}{sep}{col}" for a in layers for col in self.cols]
+
+    def totals(self, layer, axis=1):
+        """axis=1: סכום לכל שורה (כמו sum(axis=1)); axis=0: סכום לכל עמודה."""
+        codes, labels = (self.r, self.rows) if axis == 1 else (self.c, self.cols)
+        tot = np.bincount(codes, weights=np.nan_to_num(self.data[layer]), minlength=len(labels))
+        return pd.Series(tot, index=labels, name=f"{layer}_total")
+
+    def add_pct(self, layer, axis=1, name=None, scale=100.0):
+        """שכבה חדשה: ערך / total של השורה (או העמודה) – על ה-COO בלבד."""
+        codes = self.r if axis == 1 else self.c
+        tot = self.totals(layer, axis).to_numpy()[codes]
+        self.data[name or f"pct_{layer}"] = scale * _ratio(self.data[layer].astype(np.float64), tot)
+        return self
+
+    def to_sparse(self, layer):
+        if not HAS_SCIPY:
+            raise ImportError("to_sparse requires scipy; use to_long() / to_frame() instead")
+        return _sp.csr_matrix((self.data[layer], (self.r, self.c)), shape=self.shape)
+
+    def to_long(self):
+        """COO כ-DataFrame ארוך: index, columns, ושכבה לכל aggfunc (כמו melt, בלי האפסים)."""
+        out = pd.DataFrame({self.rows.name or "index": self.rows.take(self.r),
+                            self.cols.name or "columns": self.cols.take(self.c)})
+        for a, v in self.data.items():
+            out[a] = v
+        return out
+
+    def to_frame(self, layers=None, sparse=False, fill_value=0, sep="_"):
+        """
+        DataFrame רחב עם שמות שטוחים. sparse=True → עמודות SparseDtype (צפוף לא נבנה).
+        """
+        layers = list(self.data) if layers is None else list(layers)
+        R, C = self.shape
+        if sparse:
+            if HAS_SCIPY:
+                mat = _sp.hstack([_sp.csr_matrix((self.data[a].astype(np.float64), (self.r, self.c)), shape=(R, C))
+                                  for a in layers])
+                return pd.DataFrame.sparse.from_spmatrix(mat.tocsc(), index=self.rows,
+                                                         columns=self.names(layers, sep))
+            # בלי scipy: SparseArray לכל עמודה (וקטור באורך R בכל פעם – לא R × C)
+            o = np.lexsort((self.r, self.c))
+            bounds = np.searchsorted(self.c[o], np.arange(C + 1))
+            cols = {}
+            for a in layers:
+                v = self.data[a][o].astype(np.float64)
+                for j, col in enumerate(self.cols):
+                    s, e = bounds[j], bounds[j + 1]
+                    dense = np.full(R, float(fill_value))
+                    dense[self.r[o][s:e]] = v[s:e]
+                    cols[f"{a}{sep}{col}"] = pd.arrays.SparseArray(dense, fill_value=fill_value)
+            return pd.DataFrame(cols, index=self.rows)
+        blocks = []
+        for a in layers:
+            v = self.data[a]
+            block = np.full((R, C), fill_value, dtype=np.result_type(v.dtype, np.min_scalar_type(fill_value)))
+            block[self.r, self.c] = v
+            blocks.append(pd.DataFrame(block, index=self.rows, columns=[f"{a}{sep}{col}" for col in self.cols]))
+        return pd.concat(blocks, axis=1) if blocks else pd.DataFrame(index=self.rows)
+
+
+def sparse_pivot(data, index, columns, values=None, aggfunc="sum", sort=True):
+    """data = DataFrame או iterable של chunks → SparsePivot."""
+    eng = PivotEngine(index, columns, values, aggfunc)
+    for chunk in ([data] if isinstance(data, pd.DataFrame) else data):
+        eng.update(chunk)
+    return eng.finalize(sort=sort)
+
+
+# ==============================================================
+# דמו
+# ==============================================================
+
+def _events_09():
+    """משחזר את events של 09 (אותו seed ואותו סדר קריאות rng)."""
+    rng = np.random.default_rng(12)
+    matches = pd.DataFrame({
+        "match_id"     : np.arange(1001, 1031),
+        "match_date"   : pd.to_datetime("2025-06-01") + pd.to_timedelta(rng.integers(0, 45, 30), unit="D"),
+        "home_team_id" : rng.integers(1, 6, 30),
+        "away_team_id" : rng.integers(1, 6, 30),
+        "home_score"   : rng.integers(0, 5, 30),
+        "away_score"   : rng.integers(0, 5, 30),
+    })
+    n = int((matches["home_team_id"] != matches["away_team_id"]).sum())
+    rng.integers(1, 72, n); rng.uniform(1.4, 3.2, n); rng.uniform(2.5, 4.5, n); rng.uniform(1.6, 3.8, n)
+    rng.integers(1, 36, round(n * 0.7))
+    return pd.DataFrame({
+        "user_id"  : rng.integers(1, 400, 1500),
+        "event"    : rng.choice(["visit","signup","purchase"], 1500, p=[0.6,0.25,0.15]),
+        "ts"       : pd.to_datetime("2025-06-01") + pd.to_timedelta(rng.integers(0, 45, 1500), unit="D"),
+        "amount"   : np.round(rng.gamma(2.2, 30, 1500), 2),
+        "variant"  : rng.choice(["A","B"], 1500),
+    })
+
+
+def demo():
+    print("\n=== sparse pivot ===")
+
+    # Q6: count/sum לכל רבעון × variant + sum_total + pct_count_*
+    events = _events_09()
+    sales = (events[events["event"]=="purchase"]
+             .assign(day=lambda d: d["ts"].dt.date, q=lambda d: d["ts"].dt.to_period("Q")))
+    ref = sales.pivot_table(index="q", columns="variant", values="amount", aggfunc=["count","sum"], fill_value=0)
+    ref.columns = ['_'.join(map(str, c)).strip() for c in ref.columns.to_flat_index()]
+    ref["sum_total"] = ref.filter(like="sum_").sum(axis=1)
+    count_total = ref.filter(like="count_").sum(axis=1)
+    for v in ["A","B"]:
+        ref[f"pct_count_{v}"] = 100 * ref.get(f"count_{v}", 0) / count_total
+
+    sp = sparse_pivot(sales, "q", "variant", "amount", ["count", "sum"])
+    pv = sp.to_frame()
+    pv["sum_total"] = sp.totals("sum")
+    pv = pv.join(sp.add_pct("count").to_frame(["pct_count"]))
+    pd.testing.assert_frame_equal(pv, ref, check_names=False)
+    print(pv)
+    print("== Q6 (pivot_table + flatten + total + pct) ✔")
+
+    # 04 §9: סכום חודשי לכל לקוח → pivot + fillna(0) + total, על chunks
+    rng = np.random.default_rng(4)
+    n = 20_000
+    orders = pd.DataFrame({
+        "customer_id": rng.integers(1, 20_000, n),
+        "order_date": pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 365, n), unit="D"),
+        "amount": np.round(rng.gamma(2.0, 40, n), 2),
+    })
+    orders["ym"] = orders["order_date"].dt.to_period("M")
+    monthly = (orders.groupby(["ym","customer_id"], as_index=False)["amount"].sum()
+                     .rename(columns={"amount":"sum_amount"}))
+    ref = monthly.pivot(index="ym", columns="customer_id", values="sum_amount").fillna(0)
+    ref["total"] = ref.sum(axis=1)
+
+    sp = sparse_pivot((orders.iloc[i:i + 4_000] for i in range(0, n, 4_000)), "ym", "customer_id", "amount")
+    pv = sp.to_frame(sparse=True, sep="_")
+    assert isinstance(pv.dtypes.iloc[0], pd.SparseDtype)
+    dense = sp.to_frame()
+    dense.columns = sp.cols
+    dense["total"] = sp.totals("sum")
+    pd.testing.assert_frame_equal(dense, ref, check_names=False, check_column_type=False, rtol=1e-9)
+    print(f"04 §9: {sp.shape[0]} months × {sp.shape[1]:,} customers, nnz={sp.nnz:,} "
+          f"({sp.nnz / (sp.shape[0] * sp.shape[1]):.0%}), COO {sp.nbytes / 2**10:,.0f} KB "
+          f"vs dense {ref.memory_usage().sum() / 2**10:,.0f} KB ✔")
+
+    # aggfunc נשלף + mean/min/max מול pivot_table
+    register_agg("range", ("min", "max"), lambda p: p["max"] - p["min"])
+    sp = sparse_pivot(orders, "ym", "customer_id", "amount", ["mean", "min", "max", "range"])
+    for a in ("mean", "min", "max"):
+        ref = orders.pivot_table(index="ym", columns="customer_id", values="amount", aggfunc=a)
+        got = sp.to_frame([a], fill_value=np.nan)
+        assert np.allclose(got.to_numpy(), ref.to_numpy(), equal_nan=True)
+    print(sp.to_long().head())
+    print("== mean / min / max + register_agg('range') ✔")
+
+
+# ==============================================================
+# Benchmark
+# ==============================================================
+
+def bench(n=20_000_000, n_days=365, n_customers=200_000, chunk=2_000_000, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({"day": rng.integers(0, n_days, n), "customer_id": rng.integers(0, n_customers, n),
+                       "amount": rng.gamma(2.0, 40, n)})
+    print(f"\n=== bench: {n:,} rows → {n_days} days × {n_customers:,} customers ===")
+
+    def run(name, f):
+        tracemalloc.start()
+        t = time.perf_counter()
+        out = f()
+        dt = time.perf_counter() - t
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"{name:<40}: {dt:7.2f} s   peak +{peak / 2**20:7.0f} MB")
+        return out
+
+    sp = run("sparse_pivot (chunks) + totals", lambda: (lambda p: (p, p.totals("sum")))(
+        sparse_pivot((df.iloc[i:i + chunk] for i in range(0, n, chunk)), "day", "customer_id", "amount"))[0])
+    ref = run("pivot_table + fillna(0) + total", lambda: (lambda p: p.assign(total=p.sum(axis=1)))(
+        df.pivot_table(index="day", columns="customer_id", values="amount", aggfunc="sum").fillna(0)))
+    assert np.allclose(sp.totals("sum").to_numpy(), ref["total"].to_numpy())
+    print(f"nnz={sp.nnz:,} of {sp.shape[0] * sp.shape[1]:,} cells")
+
+
+if __name__ == "__main__":
+    demo()
+    if "--bench" in sys.argv:
+        bench()
+
+######################################################################
+# 💡 TL;DR:
+# • pivot רחב = COO: (row_code, col_code, value) רק לתאים שיש בהם שורות.
+# • aggfunc = חלקים ניתנים-למיזוג + סיום → chunks, mean, ו-register_agg לכל צורך.
+# • totals / pct / שמות שטוחים – ישר על ה-COO; to_frame() צפוף רק כשבאמת קטן.
+######################################################################
@@ -0,0 +1,422 @@
+######################################################################
+# 📌 32 – Hot-Path Profiler: timed לפרודקשן – ספירות, היסטוגרמות, דגימה ו-spans
+#
+# מה יש פה:
+#  1) Profiler.timed – decorator: ספירת קריאות + היסטוגרמת latency לכל פונקציה (בלי print)
+#  2) Profiler.span("name") – אותו דבר כ-context manager לבלוק קוד
+#  3) sample_every=N – רק קריאה 1 מתוך N נמדדת (הספירה תמיד מדויקת)
+#  4) nested spans – self time (בלי הילדים) + זמן לכל קשת parent → child
+#  5) snapshot() / report() / to_json() / to_prometheus() – ייצוא (textfile collector)
+#  6) timed / span ברמת המודול – תחליף ישיר ל-timed של 03
+#  7) bench: overhead לקריאה על פונקציה ריקה
+#
+# הרעיון:
+#  • ה-timed של 03 עושה print בכל קריאה → בלתי שמיש בלולאה חמה, ואין סיכומים.
+#  • store לכל thread (threading.local) → אין lock בנתיב החם; lock רק ברישום thread חדש.
+#    snapshot() ממזג את כל ה-stores (קריאה בלבד).
+#  • היסטוגרמה = גבולות קבועים (log2, 1µs … ~8s) + bisect → O(log B), בלי רשימת דגימות.
+#    quantiles (p50/p95/p99) מוערכים מההיסטוגרמה; זה גם הפורמט של Prometheus histogram.
+#  • דגימה: ההחלטה נעשית ב-span החיצוני; בתוך span נמדד, כל הילדים נמדדים תמיד –
+#    אחרת self time של ההורה היה שגוי.
+#
+# דרישות: ספריה סטנדרטית (pandas – רק ל-report())
+######################################################################
+
+import json
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+
+_now = time.perf_counter_ns
+
+# גבולות עליונים (ns) לכל bucket: 1µs, 2µs, 4µs … ~8.4s, ואחרון = +Inf
+DEFAULT_BOUNDS_NS = tuple(1_000 * 2**i for i in range(24))
+_N_DEFAULT = len(DEFAULT_BOUNDS_NS)
+
+
+class _Stat:
+    """מונים לפונקציה אחת ב-thread אחד."""
+    __slots__ = ("calls", "sampled", "total_ns", "self_ns", "max_ns", "hist")
+
+    def __init__(self, n_buckets):
+        self.calls = 0
+        self.sampled = 0
+        self.total_ns = 0
+        self.self_ns = 0
+        self.max_ns = 0
+        self.hist = [0] * n_buckets
+
+
+class _ThreadState:
+    __slots__ = ("stats", "edges", "stack")
+
+    def __init__(self):
+        self.stats = {}
+        self.edges = {}        # (parent, child) → ns
+        self.stack = []        # [name, child_ns] של spans שנמדדים כרגע
+
+
+class Profiler:
+    """
+    prof = Profiler(sample_every=100)
+
+    @prof.timed
+    def score(x): ...
+
+    with prof.span("load"):
+        ...
+    prof.report(); prof.to_prometheus("/var/lib/node_exporter/app.prom")
+    """
+
+    def __init__(self, sample_every=1, bounds_ns=DEFAULT_BOUNDS_NS, enabled=True):
+        if sample_every < 1:
+            raise ValueError("sample_every must be >= 1")
+        self.sample_every = int(sample_every)
+        self.bounds_ns = bounds_ns if bounds_ns is DEFAULT_BOUNDS_NS else tuple(bounds_ns)
+        self.enabled = enabled
+        self._local = threading.local()
+        self._states = []
+        self._lock = threading.Lock()
+
+    # ----------------------------------------------------------
+    # נתיב חם
+    # ----------------------------------------------------------
+
+    def _state(self):
+        try:
+            return self._local.state
+        except AttributeError:
+            st = self._local.state = _ThreadState()
+            with self._lock:
+                self._states.append(st)
+            return st
+
+    def _stat(self, st, name):
+        rec = st.stats.get(name)
+        if rec is None:
+            rec = st.stats[name] = _Stat(len(self.bounds_ns) + 1)
+        return rec
+
+    def _enter(self, name):
+        """מחזיר (st, rec, frame, t0) אם הקריאה נמדדת, אחרת None (נתיב ה-span)."""
+        try:
+            st = self._local.state
+        except AttributeError:
+            st = self._state()
+        rec = st.stats.get(name) or self._stat(st, name)
+        rec.calls += 1
+        if not st.stack and rec.calls % self.sample_every:
+            return None
+        frame = [name, 0]
+        st.stack.append(frame)
+        return st, rec, frame, _now()
+
+    def timed(self, func=None, *, name=None):
+        """@prof.timed או @prof.timed(name="...")."""
+        if func is None:
+            return lambda f: self.timed(f, name=name)
+        key = name or func.__name__
+        prof, local, bounds = self, self._local, self.bounds_ns
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            # נתיב חם בלי קריאות מתודה: local → rec → מונה; רק קריאה נדגמת נמדדת
+            if not prof.enabled:
+                return func(*args, **kwargs)
+            try:
+                st = local.state
+            except AttributeError:
+                st = prof._state()
+            rec = st.stats.get(key) or prof._stat(st, key)
+            rec.calls += 1
+            stack = st.stack
+            if not stack and rec.calls % prof.sample_every:
+                return func(*args, **kwargs)
+            frame = [key, 0]
+            stack.append(frame)
+            t0 = _now()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                dt = _now() - t0
+                stack.pop()
+                if stack:
+                    parent = stack[-1]
+                    parent[1] += dt
+                    edge = (parent[0], key)
+                    st.edges[edge] = st.edges.get(edge, 0) + dt
+                rec.sampled += 1
+                rec.total_ns += dt
+                rec.self_ns += dt - frame[1]
+                if dt > rec.max_ns:
+                    rec.max_ns = dt
+                rec.hist[_bucket(bounds, dt)] += 1
+        return wrapper
+
+    def span(self, name):
+        return _Span(self, name)
+
+    # ----------------------------------------------------------
+    # סיכום וייצוא
+    # ----------------------------------------------------------
+
+    def reset(self):
+        with self._lock:
+            for st in self._states:
+                st.stats.clear()
+                st.edges.clear()
+
+    def _merged(self):
+        with self._lock:
+            states = list(self._states)
+        stats, edges = {}, {}
+        for st in states:
+            for name, r in list(st.stats.items()):
+                m = stats.get(name)
+                if m is None:
+                    m = stats[name] = _Stat(len(r.hist))
+                m.calls += r.calls
+                m.sampled += r.sampled
+                m.total_ns += r.total_ns
+                m.self_ns += r.self_ns
+                m.max_ns = max(m.max_ns, r.max_ns)
+                m.hist = [a + b for a, b in zip(m.hist, r.hist)]
+            for k, v in list(st.edges.items()):
+                edges[k] = edges.get(k, 0) + v
+        return stats, edges
+
+    def _quantile(self, hist, q):
+        """הערכה מההיסטוגרמה: אינטרפולציה לינארית בתוך ה-bucket (שניות)."""
+        n = sum(hist)
+        if n == 0:
+            return float("nan")
+        target, cum = q * n, 0
+        for i, c in enumerate(hist):
+            if c and cum + c >= target:
+                lo = self.bounds_ns[i - 1] if i > 0 else 0
+                hi = self.bounds_ns[i] if i < len(self.bounds_ns) else self.bounds_ns[-1] * 2
+                return (lo + (hi - lo) * (target - cum) / c) / 1e9
+            cum += c
+        return self.bounds_ns[-1] * 2 / 1e9
+
+    def snapshot(self):
+        """dict: name → מדדים (זמנים בשניות). est_total_s = ממוצע נמדד × כל הקריאות."""
+        stats, edges = self._merged()
+        out = {}
+        for name, r in stats.items():
+            mean = r.total_ns / r.sampled / 1e9 if r.sampled else float("nan")
+            out[name] = {
+                "calls": r.calls, "sampled": r.sampled,
+                "total_s": r.total_ns / 1e9, "self_s": r.self_ns / 1e9,
+                "est_total_s": mean * r.calls if r.sampled else 0.0,
+                "mean_s": mean, "max_s": r.max_ns / 1e9,
+                "p50_s": self._quantile(r.hist, 0.50),
+                "p95_s": self._quantile(r.hist, 0.95),
+                "p99_s": self._quantile(r.hist, 0.99),
+                "buckets": r.hist,
+                "children": {c: ns / 1e9 for (p, c), ns in edges.items() if p == name},
+            }
+        return out
+
+    def report(self):
+        import pandas as pd
+        snap = self.snapshot()
+        cols = ["calls", "sampled", "est_total_s", "total_s", "self_s", "mean_s", "p50_s", "p95_s", "p99_s", "max_s"]
+        df = pd.DataFrame.from_dict({k: {c: v[c] for c in cols} for k, v in snap.items()}, orient="index")
+        return df.sort_values("est_total_s", ascending=False) if len(df) else df
+
+    def to_json(self, path=None):
+        doc = {"bounds_s": [b / 1e9 for b in self.bounds_ns] + ["+Inf"],
+               "sample_every": self.sample_every, "functions": self.snapshot()}
+        text = json.dumps(doc, indent=2)
+        if path:
+            _atomic_write(path, text)
+        return text
+
+    def to_prometheus(self, path=None, prefix="app"):
+        """Prometheus text exposition (histogram + counters); path → קובץ ל-textfile collector."""
+        snap = self.snapshot()
+        h = f"{prefix}_function_duration_seconds"
+        lines = [f"# HELP {h} Sampled wall time per call.", f"# TYPE {h} histogram"]
+        for name, s in sorted(snap.items()):
+            lab = _label(name)
+            cum = 0
+            for b, c in zip(self.bounds_ns, s["buckets"]):
+                cum += c
+                lines.append(f'{h}_bucket{{function="{lab}",le="{b / 1e9:.9g}"}} {cum}')
+            lines.append(f'{h}_bucket{{function="{lab}",le="+Inf"}} {s["sampled"]}')
+            lines.append(f'{h}_sum{{function="{lab}"}} {s["total_s"]:.9g}')
+            lines.append(f'{h}_count{{function="{lab}"}} {s["sampled"]}')
+        for metric, field, help_ in (("calls_total", "calls", "All calls (sampled or not)."),
+                                     ("self_seconds_total", "self_s", "Sampled time excluding child spans.")):
+            m = f"{prefix}_function_{metric}"
+            lines += [f"# HELP {m} {help_}", f"# TYPE {m} counter"]
+            lines += [f'{m}{{function="{_label(n)}"}} {s[field]:.9g}' for n, s in sorted(snap.items())]
+        text = "\n".join(lines) + "\n"
+        if path:
+            _atomic_write(path, text)
+        return text
+
+
+class _Span:
+    __slots__ = ("prof", "name", "token")
+
+    def __init__(self, prof, name):
+        self.prof, self.name, self.token = prof, name, None
+
+    def __enter__(self):
+        if self.prof.enabled:
+            self.token = self.prof._enter(self.name)
+        return self
+
+    def __exit__(self, *exc):
+        if self.token is not None:
+            st, rec, frame, t0 = self.token
+            _record(st, rec, frame, _now() - t0, self.prof.bounds_ns)
+            self.token = None
+        return False
+
+
+def _record(st, rec, frame, dt, bounds):
+    """סגירת span נמדד: pop, זמן להורה ולקשת parent → child, מונים והיסטוגרמה."""
+    stack = st.stack
+    stack.pop()
+    if stack:
+        parent = stack[-1]
+        parent[1] += dt
+        key = (parent[0], frame[0])
+        st.edges[key] = st.edges.get(key, 0) + dt
+    rec.sampled += 1
+    rec.total_ns += dt
+    rec.self_ns += dt - frame[1]
+    if dt > rec.max_ns:
+        rec.max_ns = dt
+    rec.hist[_bucket(bounds, dt)] += 1
+
+
+def _bucket(bounds, dt):
+    """גבולות ברירת המחדל הם 1µs·2^i → bit_length במקום bisect."""
+    if bounds is DEFAULT_BOUNDS_NS:
+        return min(((dt - 1) // 1_000).bit_length(), _N_DEFAULT) if dt > 1_000 else 0
+    return bisect_left(bounds, dt)
+
+
+def _label(s):
+    return str(s).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _atomic_write(path, text):
+    """כתיבה ל-tmp ואז rename – ה-collector לא יקרא קובץ חצי כתוב."""
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+# profiler ברירת מחדל: from 32_hot_path_profiler import timed, span
+PROFILER = Profiler()
+timed = PROFILER.timed
+span = PROFILER.span
+
+
+# ==============================================================
+# דמו
+# ==============================================================
+
+def demo():
+    print("\n=== hot-path profiler ===")
+    prof = Profiler()
+
+    @prof.timed
+    def slow_sum(n: int) -> int:           # אותה פונקציה כמו ב-03
+        s = 0
+        for i in range(n): s += i
+        return s
+
+    @prof.timed(name="pipeline")
+    def pipeline():
+        with prof.span("load"):
+            xs = [slow_sum(2_000) for _ in range(20)]
+        with prof.span("score"):
+            return sum(x % 7 for x in xs)
+
+    for _ in range(10):
+        pipeline()
+    snap = prof.snapshot()
+    assert snap["slow_sum"]["calls"] == 200 and snap["pipeline"]["calls"] == 10
+    p = snap["pipeline"]
+    assert abs(p["total_s"] - (p["self_s"] + sum(p["children"].values()))) < 1e-9
+    assert abs(snap["load"]["children"]["slow_sum"] - snap["slow_sum"]["total_s"]) < 1e-9
+    print(prof.report()[["calls", "total_s", "self_s", "p50_s", "p99_s"]].map(lambda v: f"{v:.4g}"))
+    print("self + children == total ✔")
+
+    # דגימה: ספירה מדויקת, מדידה של 1 מ-N; threads בלי lock בנתיב החם
+    sampled = Profiler(sample_every=10)
+    f = sampled.timed(lambda: None, name="noop")
+    threads = [threading.Thread(target=lambda: [f() for _ in range(5_000)]) for _ in range(4)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    s = sampled.snapshot()["noop"]
+    assert s["calls"] == 20_000 and s["sampled"] == 2_000
+    print(f"sample_every=10, 4 threads: calls={s['calls']:,} sampled={s['sampled']:,} ✔")
+
+    print(prof.to_prometheus().splitlines()[0])
+    print("\n".join(l for l in prof.to_prometheus().splitlines() if "calls_total{" in l))
+    assert json.loads(prof.to_json())["functions"]["pipeline"]["calls"] == 10
+
+
+# ==============================================================
+# Benchmark – overhead לקריאה
+# ==============================================================
+
+def bench(n=1_000_000):
+    def noop():
+        return None
+
+    def timed_03(func):                    # 03 בלי ה-print
+        def wrapper(*args, **kwargs):
+            t0 = time.perf_counter()
+            out = func(*args, **kwargs)
+            _ = time.perf_counter() - t0
+            return out
+        return wrapper
+
+    cases = {
+        "plain call": noop,
+        "03 timed (no print)": timed_03(noop),
+        "Profiler.timed, every call": Profiler().timed(noop),
+        "Profiler.timed, 1 in 100": Profiler(sample_every=100).timed(noop),
+        "Profiler.timed, disabled": Profiler(enabled=False).timed(noop),
+    }
+    print(f"\n=== bench: overhead per no-op call ({n:,} calls) ===")
+    base = None
+    for name, f in cases.items():
+        t = time.perf_counter()
+        for _ in range(n):
+            f()
+        ns = (time.perf_counter() - t) / n * 1e9
+        base = ns if base is None else base
+        print(f"{name:<30}: {ns:7.1f} ns/call   (+{ns - base:6.1f})")
+    prof = Profiler()
+    t = time.perf_counter()
+    for _ in range(n):
+        with prof.span("block"):
+            pass
+    ns = (time.perf_counter() - t) / n * 1e9
+    print(f"{'with span(...)':<30}: {ns:7.1f} ns/call")
+
+
+if __name__ == "__main__":
+    demo()
+    if "--bench" in sys.argv:
+        bench()
+
+######################################################################
+# 💡 TL;DR:
+# • בלולאה חמה: לא print – מונים + היסטוגרמה לכל thread, ייצוא כשמבקשים.
+# • sample_every=N מוריד את ה-overhead; calls נשאר מדויק, הזמן הכולל מוערך.
+# • spans מקוננים → self time + קשתות parent→child; Prometheus/JSON לניטור ולהשוואה.
+######################################################################
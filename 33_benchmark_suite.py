@@ -0,0 +1,382 @@
+######################################################################
+# 📌 33 – Benchmark Suite: כל טענת "וקטוריזציה מול לולאה" במדריכים – נמדדת
+#
+# מה יש פה:
+#  1) @case(...) – רישום benchmark: setup(n) → {variant: callable}; הראשון = baseline
+#  2) run(...) – warmup, כיול number (כמו timeit.autorange), repeats, gc כבוי בזמן מדידה
+#  3) סיכום: min / median / mean / stdev / IQR לקריאה + speedup מול ה-baseline
+#     (baseline קבוע; בגודל שבו ה-baseline לא רץ בגלל limits → speedup = n/a, לא variant אחר)
+#  4) בדיקת נכונות: כל ה-variants חייבים להחזיר את אותה תוצאה (לפני שמודדים)
+#  5) to_json / load_json / compare – שמירת ריצה והשוואה מול ריצה קודמת (regressions)
+#  6) cases: 03 §6 (comprehension), 03 §6 / 07 §11 (in set/dict מול in list), 05 §8 (x**2),
+#            04 §4/§6/§13 (apply / iterrows / wavg),
+#            Q3 rolling (09 מול 13), Q12 hit@k (09 מול 16)
+#
+# שימוש:
+#  python 33_benchmark_suite.py                       → דמו מהיר (גודל קטן, בדיקת נכונות)
+#  python 33_benchmark_suite.py --bench --json run.json [--compare base.json] [--filter q3]
+#
+# הרעיון:
+#  • "%timeit" לא רץ בקובץ .py, ומדידה בודדת של time() רועשת. כאן כל מדידה:
+#      warmup → number לולאות עד min_time → repeats חזרות → median (עמיד לרעש) + פיזור.
+#  • ה-JSON שומר גם גרסאות python/numpy/pandas → השוואה בין ריצות/מכונות היא merge על
+#    (case, variant, n) ויחס median חדש / ישן.
+#
+# דרישות: pandas, numpy (+ 13_rolling_form_engine, 16_hitk_evaluator לאותם cases)
+######################################################################
+
+import gc
+import importlib
+import json
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+CASES = {}
+
+
+def case(name, sizes, claim="", limits=None):
+    """
+    רישום benchmark. הפונקציה המעוטרת מקבלת n ומחזירה {variant: callable בלי ארגומנטים}.
+    limits: {variant: max_n} – variant איטי מדי לא ירוץ מעל הגודל הזה.
+            כדאי ש-sizes יכלול את max_n של ה-baseline – שם נראה ה-speedup הגדול ביותר שנמדד.
+    """
+    def deco(setup):
+        CASES[name] = {"setup": setup, "sizes": tuple(sizes), "claim": claim, "limits": dict(limits or {})}
+        return setup
+    return deco
+
+
+# ==============================================================
+# 1) מדידה
+# ==============================================================
+
+def _same(a, b, rtol=1e-9):
+    """השוואת תוצאות בין variants (Series/DataFrame/ndarray/list/scalar)."""
+    if isinstance(a, (pd.Series, pd.DataFrame)):
+        a = a.to_numpy()
+    if isinstance(b, (pd.Series, pd.DataFrame)):
+        b = b.to_numpy()
+    a, b = np.asarray(a), np.asarray(b)
+    if a.shape != b.shape:
+        return False
+    if a.dtype.kind in "fc" or b.dtype.kind in "fc":
+        return bool(np.allclose(a.astype(float), b.astype(float), rtol=rtol, equal_nan=True))
+    return bool((a == b).all())
+
+
+def _autorange(fn, min_time):
+    """number = 1, 2, 5, 10, 20, 50 … עד שלולאה אחת לוקחת לפחות min_time (כמו timeit.autorange)."""
+    i = 1
+    while True:
+        for number in (i, 2 * i, 5 * i):
+            t = time.perf_counter()
+            for _ in range(number):
+                fn()
+            if time.perf_counter() - t >= min_time:
+                return number
+        i *= 10
+
+
+def measure(fn, repeats=5, warmup=1, min_time=0.1):
+    """זמנים לקריאה (שניות) – repeats ערכים, כל אחד ממוצע על number קריאות."""
+    for _ in range(warmup):
+        fn()
+    number = _autorange(fn, min_time)
+    gc_was = gc.isenabled()
+    gc.disable()
+    try:
+        times = []
+        for _ in range(repeats):
+            t = time.perf_counter()
+            for _ in range(number):
+                fn()
+            times.append((time.perf_counter() - t) / number)
+    finally:
+        if gc_was:
+            gc.enable()
+    return times, number
+
+
+def _summary(times):
+    q1, _, q3 = statistics.quantiles(times, n=4) if len(times) > 1 else (times[0],) * 3
+    return {"min_s": min(times), "median_s": statistics.median(times), "mean_s": statistics.fmean(times),
+            "stdev_s": statistics.stdev(times) if len(times) > 1 else 0.0, "iqr_s": q3 - q1}
+
+
+def run(names=None, sizes=None, repeats=5, warmup=1, min_time=0.1, check=True, verbose=True):
+    """
+    מריץ cases (הכל, או names / מחרוזת לסינון, case-insensitive). sizes=None → הגדלים של כל case;
+    sizes="first" → רק הקטן (לדמו). מחזיר רשימת records.
+    speedup = median(baseline) / median(variant) באותו n; None אם ה-baseline לא רץ ב-n הזה.
+    """
+    if isinstance(names, str):
+        pattern = names
+        names = [n for n in CASES if pattern.lower() in n.lower()]
+        if not names:
+            raise ValueError(f"no case matches {pattern!r}; cases: {list(CASES)}")
+    elif names is not None:
+        unknown = [n for n in names if n not in CASES]
+        if unknown:
+            raise ValueError(f"unknown cases {unknown}")
+    records = []
+    for name in (list(CASES) if names is None else names):
+        spec = CASES[name]
+        ns = spec["sizes"][:1] if sizes == "first" else (sizes or spec["sizes"])
+        for n in ns:
+            all_variants = spec["setup"](n)
+            base_v = next(iter(all_variants))                 # ה-baseline הוא תמיד ה-variant הראשון שהוגדר
+            variants = {v: f for v, f in all_variants.items() if n <= spec["limits"].get(v, n)}
+            if check:
+                results = {v: f() for v, f in variants.items()}
+                ref_v = next(iter(results))
+                for v, res in results.items():
+                    if not _same(results[ref_v], res):
+                        raise AssertionError(f"{name} n={n}: {v} != {ref_v}")
+                del results
+            base = None
+            for v, f in variants.items():
+                times, number = measure(f, repeats=repeats, warmup=warmup, min_time=min_time)
+                rec = {"case": name, "claim": spec["claim"], "variant": v, "baseline": base_v, "n": n,
+                       "number": number, "repeats": repeats, **_summary(times)}
+                if v == base_v:
+                    base = rec["median_s"]
+                rec["speedup"] = None if base is None else base / rec["median_s"]
+                records.append(rec)
+                if verbose:
+                    speedup = "n/a" if rec["speedup"] is None else f"{rec['speedup']:.1f}"
+                    print(f"{name:<22} n={n:<10,} {v:<26} median {rec['median_s'] * 1e3:10.3f} ms"
+                          f"  ±{rec['iqr_s'] * 1e3:8.3f}  ×{speedup:>8}")
+    return records
+
+
+# ==============================================================
+# 2) JSON + השוואה
+# ==============================================================
+
+def _meta():
+    return {"created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(), "numpy": np.__version__, "pandas": pd.__version__,
+            "platform": platform.platform(), "machine": platform.machine()}
+
+
+def to_json(records, path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"meta": _meta(), "results": records}, f, indent=2)
+    return path
+
+
+def load_json(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def compare(base, new, tol=0.10):
+    """
+    base/new: נתיב או dict מ-load_json. ratio = median חדש / ישן;
+    status = regression (ratio > 1+tol) / faster (ratio < 1/(1+tol)) / same.
+    """
+    base = load_json(base) if isinstance(base, str) else base
+    new = load_json(new) if isinstance(new, str) else new
+    key = ["case", "variant", "n"]
+    a = pd.DataFrame(base["results"])[key + ["median_s"]]
+    b = pd.DataFrame(new["results"])[key + ["median_s"]]
+    out = a.merge(b, on=key, how="outer", suffixes=("_base", "_new"))
+    out["ratio"] = out["median_s_new"] / out["median_s_base"]
+    out["status"] = np.select([out["ratio"] > 1 + tol, out["ratio"] < 1 / (1 + tol), out["ratio"].isna()],
+                              ["regression", "faster", "missing"], default="same")
+    return out.sort_values("ratio", ascending=False, ignore_index=True)
+
+
+# ==============================================================
+# 3) Cases – הטענות מהמדריכים
+# ==============================================================
+
+@case("03.6 comprehension", sizes=(1_000, 100_000), claim="list comprehension > for+append")
+def _c_comprehension(n):
+    def loop():
+        out = []
+        for x in range(n):
+            out.append(x * x)
+        return out
+    return {"for+append": loop,
+            "comprehension": lambda: [x * x for x in range(n)],
+            "map": lambda: list(map(lambda x: x * x, range(n))),
+            "numpy": lambda: np.arange(n) ** 2}
+
+
+@case("03.6/07.11 membership", sizes=(1_000, 100_000, 1_000_000), claim="x in set/dict ≫ x in list",
+      limits={"in list": 100_000})
+def _c_membership(n):
+    rng = np.random.default_rng(0)
+    hay = rng.permutation(2 * n)[:n].tolist()
+    queries = rng.integers(0, 2 * n, 1_000).tolist()           # ~חצי פגיעות
+    as_list, as_set, as_dict = hay, set(hay), dict.fromkeys(hay)
+    return {"in list": lambda: [q in as_list for q in queries],
+            "in set": lambda: [q in as_set for q in queries],
+            "in dict": lambda: [q in as_dict for q in queries]}
+
+
+@case("05.8 square", sizes=(10**3, 10**5, 10**6), claim="data**2 ≫ [x**2 for x in data]")
+def _c_square(n):
+    data = np.arange(n)
+    return {"list comp over ndarray": lambda: [x**2 for x in data],
+            "ndarray ** 2": lambda: data**2}
+
+
+def _orders(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({"customer_id": rng.integers(1, max(n // 20, 2), n),
+                         "amount": np.round(rng.gamma(2.2, 50, n), 2)})
+
+
+@case("04.4 size_bucket", sizes=(10_000, 1_000_000), claim="Series.apply(lambda) ≪ np.select")
+def _c_size_bucket(n):
+    df = _orders(n)
+    a = df["amount"]
+    return {"apply(lambda)": lambda: a.apply(lambda x: "High" if x>=120 else ("Mid" if x>=80 else "Low")).to_numpy(),
+            "np.select": lambda: np.select([a.to_numpy() >= 120, a.to_numpy() >= 80], ["High", "Mid"], "Low")}
+
+
+@case("04.13 row loop", sizes=(10_000, 100_000, 1_000_000), claim="iterrows/apply(axis=1) ≪ np.where",
+      limits={"iterrows": 100_000, "apply(axis=1)": 200_000})
+def _c_row_loop(n):
+    df = _orders(n)
+    return {"iterrows": lambda: np.array([1 if r["amount"] >= 150 else 0 for _, r in df.iterrows()]),
+            "apply(axis=1)": lambda: df.apply(lambda r: 1 if r["amount"] >= 150 else 0, axis=1).to_numpy(),
+            "np.where": lambda: np.where(df["amount"] >= 150, 1, 0)}
+
+
+@case("04.6 weighted avg", sizes=(10_000, 1_000_000), claim="groupby.apply(wavg) ≪ groupby.sum של x·w")
+def _c_wavg(n):
+    df = _orders(n)
+    df["w"] = 1 + 9 * (df["amount"] >= 120).astype(int)
+
+    def wavg(x, w):
+        x, w = np.asarray(x), np.asarray(w)
+        return (x * w).sum() / w.sum() if w.sum() else np.nan
+
+    def vectorized():
+        g = df.assign(xw=df["amount"] * df["w"]).groupby("customer_id")[["xw", "w"]].sum()
+        return g["xw"] / g["w"]
+    return {"groupby.apply": lambda: df.groupby("customer_id")[["amount", "w"]]
+                                       .apply(lambda sub: wavg(sub["amount"], sub["w"])),
+            "groupby.sum": vectorized}
+
+
+def _long(n, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({"team_id": rng.integers(0, max(n // 40, 2), n),
+                       "match_date": pd.Timestamp("2015-01-01") + pd.to_timedelta(rng.integers(0, 3650, n), unit="D"),
+                       "gf": rng.integers(0, 5, n), "ga": rng.integers(0, 5, n)})
+    df["pts"] = np.select([df["gf"] > df["ga"], df["gf"] == df["ga"]], [3, 1], default=0)
+    return df.sort_values(["team_id", "match_date"], kind="mergesort")
+
+
+@case("09.Q3 rolling prev5", sizes=(2_000, 20_000, 200_000, 1_000_000), claim="rolling_prev (13) ≫ groupby.rolling.apply(lambda)",
+      limits={"Q3 rolling.apply": 20_000, "Q3 fast (apply)": 200_000})
+def _c_q3(n):
+    rolling_prev = importlib.import_module("13_rolling_form_engine").rolling_prev
+    s = _long(n)
+    # rolling(6) + shift(1) בתוך החלון = ממוצע 5 הקודמים (ה-rolling(5) של Q3 נותן בפועל 4 – ראו 13)
+    return {"Q3 rolling.apply": lambda: s.groupby("team_id")["pts"].rolling(6, min_periods=1)
+                                         .apply(lambda w: w.shift(1).mean(), raw=False)
+                                         .reset_index(level=0, drop=True).loc[s.index],
+            "Q3 fast (apply)": lambda: s.groupby("team_id")["pts"]
+                                        .apply(lambda x: x.rolling(5, min_periods=1).mean().shift(1))
+                                        .reset_index(level=0, drop=True).loc[s.index],
+            "rolling_prev (13)": lambda: rolling_prev(s, "team_id", "match_date", ["pts"], windows=(5,),
+                                                      stats=("mean",), presorted=True)["pts_prev5_mean"]}
+
+
+@case("09.Q12 hit@k", sizes=(2_000, 20_000, 1_000_000), claim="evaluate (16) ≫ apply(axis=1) + iloc loop",
+      limits={"Q12 apply+loop": 20_000})
+def _c_q12(n):
+    hk = importlib.import_module("16_hitk_evaluator")
+    pred = hk._random_pred(n)
+
+    def vectorized():
+        P = pred[["p_home", "p_draw", "p_away"]].to_numpy()
+        res = hk.evaluate(P, hk.labels_to_codes(pred["label"]), k=2)
+        return [res.loc[0, "hit@1"], res.loc[0, "hit@2"]]
+    return {"Q12 apply+loop": lambda: list(hk._q12_hits(pred)),
+            "evaluate (16)": vectorized}
+
+
+# ==============================================================
+# דמו / Benchmark
+# ==============================================================
+
+def _arg(flag, default=None):
+    return sys.argv[sys.argv.index(flag) + 1] if flag in sys.argv[:-1] else default
+
+
+def demo():
+    print("\n=== benchmark suite (quick: smallest size, correctness checked) ===")
+    recs = run(sizes="first", repeats=3, warmup=1, min_time=0.02)
+    df = pd.DataFrame(recs)
+    df["speedup"] = pd.to_numeric(df["speedup"])
+    best = df.loc[df.groupby("case")["speedup"].idxmax(), ["case", "baseline", "variant", "speedup", "claim"]]
+    print(best.round(1).to_string(index=False))
+
+    # --filter: case-insensitive, ובלי התאמה → שגיאה (לא "הכל")
+    assert [r["case"] for r in run("q3", sizes="first", repeats=1, warmup=0, min_time=0.0, verbose=False)][:1] \
+        == ["09.Q3 rolling prev5"]
+    try:
+        run("no-such-case")
+        raise AssertionError("expected ValueError")
+    except ValueError:
+        pass
+
+    # limits: ה-baseline לא רץ → speedup = n/a (לא variant אחר שהופך ל-baseline)
+    CASES["_limits"] = {"setup": lambda n: {"slow": lambda: n, "fast": lambda: n}, "sizes": (1, 2),
+                        "claim": "", "limits": {"slow": 1}}
+    try:
+        recs_l = run(["_limits"], repeats=1, warmup=0, min_time=0.0, verbose=False)
+    finally:
+        del CASES["_limits"]
+    assert [(r["n"], r["variant"], r["speedup"] is None) for r in recs_l] == \
+        [(1, "slow", False), (1, "fast", False), (2, "fast", True)]
+
+    # JSON → השוואה מול עצמה (מסלול ה-regression check)
+    import os, tempfile
+    with tempfile.TemporaryDirectory(prefix="bench_") as tmp:
+        path = os.path.join(tmp, "run.json")
+        to_json(recs, path)
+        cmp = compare(path, path)
+        assert (cmp["status"] == "same").all()
+        slower = dict(load_json(path)); slower["results"] = [dict(r, median_s=r["median_s"] * 1.5) for r in recs]
+        assert (compare(path, slower)["status"] == "regression").all()
+    print("JSON round-trip + compare ✔")
+
+
+def bench():
+    recs = run(_arg("--filter"), repeats=int(_arg("--repeats", 7)), warmup=1, min_time=0.2)
+    out = _arg("--json")
+    if out:
+        to_json(recs, out)
+        print(f"saved → {out}")
+    base = _arg("--compare")
+    if base:
+        cmp = compare(base, {"meta": _meta(), "results": recs})
+        print(cmp.to_string(index=False))
+        if (cmp["status"] == "regression").any():
+            print("⚠️ regressions found")
+
+
+if __name__ == "__main__":
+    demo()
+    if "--bench" in sys.argv:
+        bench()
+
+######################################################################
+# 💡 TL;DR:
+# • טענת ביצועים = case עם baseline + variants, אותה תוצאה, median על repeats אחרי warmup.
+# • limits → ה-variant האיטי רץ רק על גדלים סבירים; השאר ממשיכים ל-1M (שם speedup = n/a).
+# • --json שומר ריצה, --compare מסמן regressions (ratio של median מעל הסף).
+######################################################################
@@ -0,0 +1,538 @@
+######################################################################
+# 📌 34 – Parquet Dataset: מחיצות hive, pruning, סטטיסטיקות row group ו-projection
+#
+# מה יש פה:
+#  1) ParquetDataset.write – כתיבת dataset מחולק (season=2025/month=2025-06/part-….parquet)
+#     עם מיון בתוך כל קובץ וגודל row group לפי יעד בבתים
+#  2) ParquetDataset.read(columns, filters) – קורא רק את מה שצריך:
+#       partition pruning  → תיקיות שלא יכולות להתאים (גם לפי טווח זמן על time_col)
+#       row-group stats    → min/max מה-footer; row group שלא יכול להתאים לא נקרא
+#       column projection  → רק העמודות המבוקשות (+ עמודות הפילטר)
+#  3) last_scan / explain() – דוח: קבצים/row groups שדולגו, bytes שנקראו מול bytes שדולגו
+#     (קובץ שנפסל לפי מחיצה לא נפתח: ה-bytes שלו = גודל הקובץ בדיסק, ה-row groups שלו לא נספרים)
+#  4) SCHEMAS – הגדרות מוכנות ל-matches / odds / events של 09
+#  5) דמו: אותם פילטרים מול "לקרוא הכל ולסנן ב-pandas" (03 §3 / 04 §2) – אותה תוצאה
+#
+# הרעיון:
+#  • read_parquet על קובץ אחד = כל העמודות × כל השורות, ואז df[mask] ב-pandas.
+#  • hive: ערך המחיצה נמצא בנתיב → פילטר על season/month מדלג על קבצים בלי לפתוח אותם.
+#    המחיצות נגזרות מ-time_col, לכן גם פילטר על match_date עצמו מתרגם לטווח מחיצות.
+#  • בתוך קובץ: מיון לפי sort_by → min/max של כל row group צרים → פילטר על match_id
+#    או collected_at מדלג על רוב ה-row groups (רק ה-footer נקרא).
+#  • Parquet הוא עמודתי → projection חוסך bytes בפועל; הדוח סופר total_compressed_size.
+#
+# דרישות: pandas, numpy, pyarrow
+######################################################################
+
+import json
+import shutil
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    HAS_ARROW = True
+except ImportError:
+    HAS_ARROW = False
+
+MANIFEST = "_dataset.json"
+OPS = ("==", "!=", "<", "<=", ">", ">=", "in", "not in")
+
+# הגדרות ל-schemas של 09: עמודת זמן, מחיצות, מיון בתוך קובץ
+SCHEMAS = {
+    "matches": {"time_col": "match_date", "partition_by": ("season", "month"),
+                "sort_by": ("match_date", "match_id")},
+    "odds":    {"time_col": "collected_at", "partition_by": ("season", "date"),
+                "sort_by": ("match_id", "collected_at")},
+    "events":  {"time_col": "ts", "partition_by": ("month",),
+                "sort_by": ("ts", "user_id")},
+}
+
+
+# ==============================================================
+# 1) מחיצות נגזרות מזמן
+# ==============================================================
+
+DERIVED = ("season", "month", "date")
+
+
+def _derive(ts, part, season_start_month):
+    """קוד int64 לכל שורה (עונה / חודש / יום) – בלי strftime על כל השורות."""
+    t = pd.to_datetime(ts).to_numpy()
+    if part == "season":
+        m = t.astype("datetime64[M]").astype(np.int64)            # חודשים מאז 1970-01
+        return (m - (season_start_month - 1)) // 12 + 1970
+    return t.astype("datetime64[M]" if part == "month" else "datetime64[D]").astype(np.int64)
+
+
+def _label(part, code):
+    """הערך בנתיב: 2025 / 2025-06 / 2025-06-01."""
+    if part == "month":
+        return str(np.datetime64(int(code), "M"))
+    if part == "date":
+        return str(np.datetime64(int(code), "D"))
+    return code
+
+
+def _part_interval(part, value, season_start_month):
+    """[lo, hi) של הזמן שמחיצה נגזרת מכסה."""
+    if part == "season":
+        lo = pd.Timestamp(year=int(value), month=season_start_month, day=1)
+        return lo, lo + pd.DateOffset(years=1)
+    lo = pd.Timestamp(value)
+    return lo, lo + (pd.DateOffset(months=1) if part == "month" else pd.Timedelta(days=1))
+
+
+def _parse_value(v):
+    try:
+        return int(v)
+    except ValueError:
+        return v
+
+
+# ==============================================================
+# 2) הערכת פילטרים: ערך מחיצה / טווח min-max / שורות
+# ==============================================================
+
+def _coerce(val, arrow_type):
+    """ערך הפילטר לטיפוס של העמודה (מחרוזת תאריך מול timestamp וכו')."""
+    if isinstance(val, (list, tuple, set, np.ndarray, pd.Index)):
+        return [_coerce(v, arrow_type) for v in val]
+    if arrow_type is not None and (pa.types.is_timestamp(arrow_type) or pa.types.is_date(arrow_type)):
+        return pd.Timestamp(val)
+    return val
+
+
+def _range_may_match(op, val, lo, hi):
+    """האם קיים x ב-[lo, hi] שמקיים x op val? (שמרני: ספק → True)."""
+    if lo is None or hi is None:
+        return True
+    try:
+        if op == "==":
+            return lo <= val <= hi
+        if op == "!=":
+            return not (lo == hi == val)
+        if op == "<":
+            return lo < val
+        if op == "<=":
+            return lo <= val
+        if op == ">":
+            return hi > val
+        if op == ">=":
+            return hi >= val
+        if op == "in":
+            return any(lo <= v <= hi for v in val)
+        if op == "not in":
+            return not (lo == hi and lo in val)
+    except TypeError:
+        return True
+    return True
+
+
+def _row_mask(s, op, val):
+    if op == "in":
+        return s.isin(val).to_numpy()
+    if op == "not in":
+        return ~s.isin(val).to_numpy()
+    return {"==": s.eq, "!=": s.ne, "<": s.lt, "<=": s.le, ">": s.gt, ">=": s.ge}[op](val).fillna(False).to_numpy(bool)
+
+
+def _stat_value(v):
+    return pd.Timestamp(v) if isinstance(v, (pd.Timestamp, np.datetime64)) or hasattr(v, "isoformat") else v
+
+
+# ==============================================================
+# 3) ParquetDataset
+# ==============================================================
+
+class ParquetDataset:
+    """
+    ds = ParquetDataset(root, **SCHEMAS["odds"])
+    ds.write(odds)                                        # hive: season=…/date=…/part-….parquet
+    df = ds.read(columns=["match_id", "home_win"],
+                 filters=[("collected_at", ">=", "2025-06-10"), ("match_id", "in", [1003, 1007])])
+    ds.last_scan                                          # bytes read / skipped
+    """
+
+    def __init__(self, root, time_col=None, partition_by=(), sort_by=(), season_start_month=7,
+                 target_row_group_bytes=64 * 2**20, min_row_group_rows=10_000, max_row_group_rows=1_000_000):
+        if not HAS_ARROW:
+            raise ImportError("ParquetDataset requires pyarrow (pip install pyarrow)")
+        self.root = Path(root)
+        manifest = self.root / MANIFEST
+        if manifest.exists() and not partition_by and time_col is None:
+            cfg = json.loads(manifest.read_text())
+            time_col, partition_by = cfg["time_col"], cfg["partition_by"]
+            sort_by, season_start_month = cfg["sort_by"], cfg["season_start_month"]
+        self.time_col = time_col
+        self.partition_by = tuple(partition_by)
+        self.sort_by = tuple(sort_by)
+        self.season_start_month = season_start_month
+        self.target_row_group_bytes = target_row_group_bytes
+        self.min_row_group_rows = min_row_group_rows
+        self.max_row_group_rows = max_row_group_rows
+        self.last_scan = None
+        # אילו מחיצות נגזרו מ-time_col ב-write (רק עליהן מותר pruning לפי טווח זמן)
+        self.derived = tuple(json.loads(manifest.read_text()).get("derived", ())) if manifest.exists() else ()
+        if any(p in DERIVED for p in self.partition_by) and time_col is None:
+            raise ValueError(f"partition_by {self.partition_by} needs time_col")
+
+    @classmethod
+    def for_schema(cls, name, root, **kw):
+        return cls(root, **{**SCHEMAS[name], **kw})
+
+    # ----------------------------------------------------------
+    # כתיבה
+    # ----------------------------------------------------------
+
+    def row_group_rows(self, df):
+        """שורות ל-row group: target_row_group_bytes / bytes לשורה (memory_usage על מדגם), בגבולות."""
+        sample = df.head(10_000)
+        per_row = sample.memory_usage(index=False, deep=True).sum() / max(len(sample), 1)
+        rows = int(self.target_row_group_bytes / max(per_row, 1))
+        return int(np.clip(rows, self.min_row_group_rows, self.max_row_group_rows))
+
+    def write(self, df, mode="append", row_group_rows=None):
+        """mode: "append" – קבצים חדשים ליד הקיימים | "overwrite" – מוחק את root קודם."""
+        if mode not in ("append", "overwrite"):
+            raise ValueError("mode must be 'append' or 'overwrite'")
+        derived = tuple(p for p in self.partition_by if p in DERIVED and p not in df.columns)
+        if mode == "overwrite" and self.root.exists():
+            if not (self.root / MANIFEST).exists():
+                raise ValueError(f"{self.root} is not a dataset (no {MANIFEST}); refusing to delete")
+            shutil.rmtree(self.root)
+        elif mode == "append" and self.files() and derived != self.derived:
+            raise ValueError(f"derived partitions {derived} differ from the dataset's {self.derived}")
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.derived = derived
+        (self.root / MANIFEST).write_text(json.dumps({
+            "time_col": self.time_col, "partition_by": list(self.partition_by),
+            "sort_by": list(self.sort_by), "season_start_month": self.season_start_month,
+            "derived": list(derived)}))
+
+        parts = {}
+        for p in self.partition_by:
+            parts[p] = df[p] if p in df.columns else _derive(df[self.time_col], p, self.season_start_month)
+        data = df.drop(columns=[p for p in self.partition_by if p in df.columns])
+        rg = row_group_rows or self.row_group_rows(data)
+        groups = pd.DataFrame(parts).groupby(list(self.partition_by), sort=True).indices \
+            if self.partition_by else {(): np.arange(len(df))}
+        written = []
+        for key, idx in groups.items():
+            key = key if isinstance(key, tuple) else (key,)
+            key = [_label(p, v) if p in derived else v
+                   for p, v in zip(self.partition_by, key)]
+            part = data.iloc[idx]
+            if self.sort_by:
+                part = part.sort_values(list(self.sort_by), kind="stable")
+            d = self.root.joinpath(*[f"{p}={v}" for p, v in zip(self.partition_by, key)])
+            d.mkdir(parents=True, exist_ok=True)
+            path = d / f"part-{uuid.uuid4().hex[:12]}.parquet"
+            pq.write_table(pa.Table.from_pandas(part, preserve_index=False), path, row_group_size=rg)
+            written.append(path)
+        return written
+
+    # ----------------------------------------------------------
+    # קריאה
+    # ----------------------------------------------------------
+
+    def files(self):
+        """[(path, {partition: value})] לכל קובץ ב-dataset."""
+        out = []
+        for path in sorted(self.root.rglob("*.parquet")):
+            vals = {}
+            for seg in path.relative_to(self.root).parts[:-1]:
+                k, _, v = seg.partition("=")
+                vals[k] = _parse_value(v)
+            out.append((path, vals))
+        return out
+
+    def _partition_may_match(self, vals, filters):
+        for col, op, val in filters:
+            if col in vals:
+                v = vals[col]
+                if not _row_mask(pd.Series([v]), op, val)[0]:
+                    return False
+            elif col == self.time_col:
+                for p, v in vals.items():
+                    if p in self.derived:                   # מחיצה שהמשתמש כתב בעצמו לא אומרת כלום על הזמן
+                        lo, hi = _part_interval(p, v, self.season_start_month)
+                        t = _coerce(val, pa.timestamp("ns"))
+                        # hi פתוח: מספיק לבדוק מול hi − 1ns
+                        if not _range_may_match(op, t, lo, hi - pd.Timedelta(1, "ns")):
+                            return False
+        return True
+
+    def _plan(self, columns, filters):
+        filters = [tuple(f) for f in (filters or [])]
+        for f in filters:
+            if f[1] not in OPS:
+                raise ValueError(f"unsupported op {f[1]!r}; use one of {OPS}")
+        scan = {"files_total": 0, "files_pruned": 0, "files_opened": 0, "row_groups_total": 0, "row_groups_skipped": 0,
+                "bytes_total": 0, "bytes_read": 0, "bytes_skipped_partition": 0,
+                "bytes_skipped_stats": 0, "bytes_skipped_projection": 0}
+        plan = []
+        for path, vals in self.files():
+            scan["files_total"] += 1
+            if not self._partition_may_match(vals, filters):   # לפי הנתיב בלבד – בלי לפתוח footer
+                size = path.stat().st_size
+                scan["files_pruned"] += 1
+                scan["bytes_total"] += size
+                scan["bytes_skipped_partition"] += size
+                continue
+            pf = pq.ParquetFile(path)
+            scan["files_opened"] += 1
+            meta, schema = pf.metadata, pf.schema_arrow
+            size = sum(meta.row_group(i).column(j).total_compressed_size
+                       for i in range(meta.num_row_groups) for j in range(meta.num_columns))
+            scan["row_groups_total"] += meta.num_row_groups
+            scan["bytes_total"] += size
+            names = schema.names
+            need = names if columns is None else [c for c in names if c in columns or
+                                                   any(c == f[0] for f in filters)]
+            col_filters = [(names.index(c), op, _coerce(v, schema.field(c).type)) for c, op, v in filters
+                           if c in names]
+            keep = []
+            for i in range(meta.num_row_groups):
+                rg = meta.row_group(i)
+                rg_bytes = sum(rg.column(j).total_compressed_size for j in range(meta.num_columns))
+                ok = True
+                for j, op, v in col_filters:
+                    st = rg.column(j).statistics
+                    if st is not None and st.has_min_max and not _range_may_match(
+                            op, v, _stat_value(st.min), _stat_value(st.max)):
+                        ok = False
+                        break
+                if not ok:
+                    scan["row_groups_skipped"] += 1
+                    scan["bytes_skipped_stats"] += rg_bytes
+                    continue
+                read = sum(rg.column(j).total_compressed_size for j in range(meta.num_columns)
+                           if names[j] in need)
+                scan["bytes_read"] += read
+                scan["bytes_skipped_projection"] += rg_bytes - read
+                keep.append(i)
+            plan.append((pf, vals, keep, need))
+        return plan, filters, scan
+
+    def explain(self, columns=None, filters=None):
+        """הדוח בלבד – קורא footers, לא נתונים."""
+        return self._plan(columns, filters)[2]
+
+    def read(self, columns=None, filters=None):
+        """
+        columns : None = הכל (כולל עמודות המחיצה); אחרת רשימה (עמודות מחיצה מותרות)
+        filters : [(col, op, value)] ב-AND; op אחד מ-OPS. עובד על עמודות, מחיצות ו-time_col.
+        """
+        t0 = time.perf_counter()
+        plan, filters, scan = self._plan(columns, filters)
+        frames, rows_read = [], 0
+        for pf, vals, keep, need in plan:
+            if not keep:
+                continue
+            df = pf.read_row_groups(keep, columns=need).to_pandas()
+            rows_read += len(df)
+            for p, v in vals.items():
+                if columns is None or p in columns or any(p == f[0] for f in filters):
+                    df[p] = v
+            mask = np.ones(len(df), dtype=bool)
+            for c, op, v in filters:
+                if c in df.columns:
+                    mask &= _row_mask(df[c], op, _coerce(v, pa.timestamp("ns")) if df[c].dtype.kind == "M" else v)
+            frames.append(df[mask] if not mask.all() else df)
+        out = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=columns or [])
+        if columns is not None:
+            out = out[[c for c in columns if c in out.columns]]
+        scan.update(rows_read=rows_read, rows_returned=len(out), seconds=round(time.perf_counter() - t0, 3))
+        scan["bytes_skipped"] = scan["bytes_total"] - scan["bytes_read"]
+        self.last_scan = scan
+        return out
+
+
+def _fmt_bytes(b):
+    return f"{b / 2**20:,.1f} MB" if b >= 2**20 else f"{b / 2**10:,.1f} KB"
+
+
+def format_scan(scan):
+    mb = _fmt_bytes
+    return (f"files {scan['files_total'] - scan['files_pruned']}/{scan['files_total']}, "
+            f"row groups {scan['row_groups_total'] - scan['row_groups_skipped']}/{scan['row_groups_total']} (opened files) | "
+            f"read {mb(scan['bytes_read'])} of {mb(scan['bytes_total'])} "
+            f"(skipped: partition {mb(scan['bytes_skipped_partition'])}, stats {mb(scan['bytes_skipped_stats'])}, "
+            f"projection {mb(scan['bytes_skipped_projection'])})")
+
+
+# ==============================================================
+# דמו
+# ==============================================================
+
+def _frames_09():
+    """matches / odds / events של 09 (אותו seed ואותו סדר קריאות rng)."""
+    rng = np.random.default_rng(12)
+    matches = pd.DataFrame({
+        "match_id"     : np.arange(1001, 1031),
+        "match_date"   : pd.to_datetime("2025-06-01") + pd.to_timedelta(rng.integers(0, 45, 30), unit="D"),
+        "home_team_id" : rng.integers(1, 6, 30),
+        "away_team_id" : rng.integers(1, 6, 30),
+        "home_score"   : rng.integers(0, 5, 30),
+        "away_score"   : rng.integers(0, 5, 30),
+    })
+    matches = matches[matches["home_team_id"] != matches["away_team_id"]].reset_index(drop=True)
+    odds = (
+        matches[["match_id","match_date"]]
+        .merge(pd.DataFrame({"bookmaker":["BK"]}), how="cross")
+        .assign(
+            collected_at=lambda d: d["match_date"] - pd.to_timedelta(rng.integers(1, 72, len(d)), unit="h"),
+            home_win   = lambda d: np.round(rng.uniform(1.4, 3.2, len(d)), 2),
+            draw       = lambda d: np.round(rng.uniform(2.5, 4.5, len(d)), 2),
+            away_win   = lambda d: np.round(rng.uniform(1.6, 3.8, len(d)), 2),
+        )
+    )
+    extra = odds.sample(frac=0.7, random_state=7).assign(collected_at=lambda d: d["collected_at"] + pd.to_timedelta(rng.integers(1, 36, len(d)), unit="h"))
+    odds = pd.concat([odds, extra], ignore_index=True).sort_values(["match_id","collected_at"]).reset_index(drop=True)
+    events = pd.DataFrame({
+        "user_id"  : rng.integers(1, 400, 1500),
+        "event"    : rng.choice(["visit","signup","purchase"], 1500, p=[0.6,0.25,0.15]),
+        "ts"       : pd.to_datetime("2025-06-01") + pd.to_timedelta(rng.integers(0, 45, 1500), unit="D"),
+        "amount"   : np.round(rng.gamma(2.2, 30, 1500), 2),
+        "variant"  : rng.choice(["A","B"], 1500),
+    })
+    return {"matches": matches, "odds": odds, "events": events}
+
+
+def _odds_history(n, seed=0):
+    """היסטוריית אודס סינתטית על פני 3 עונות (לדוח bytes ול-bench)."""
+    rng = np.random.default_rng(seed)
+    n_matches = max(n // 40, 1)
+    match_date = pd.Timestamp("2022-07-01") + pd.to_timedelta(rng.integers(0, 3 * 365, n_matches), unit="D")
+    mid = rng.integers(0, n_matches, n)
+    return pd.DataFrame({
+        "match_id": mid + 100_000,
+        "match_date": match_date[mid],
+        "bookmaker": rng.choice(["BK", "PX", "WH", "B365"], n),
+        "collected_at": match_date[mid] - pd.to_timedelta(rng.integers(1, 72 * 60, n), unit="min"),
+        "home_win": np.round(rng.uniform(1.4, 3.2, n), 2),
+        "draw": np.round(rng.uniform(2.5, 4.5, n), 2),
+        "away_win": np.round(rng.uniform(1.6, 3.8, n), 2),
+    })
+
+
+def _pandas_filter(df, filters):
+    m = np.ones(len(df), dtype=bool)
+    for c, op, v in filters:
+        m &= _row_mask(df[c], op, pd.Timestamp(v) if df[c].dtype.kind == "M" else v)
+    return df[m]
+
+
+def _same_rows(a, b, by):
+    a = a.sort_values(by, ignore_index=True)
+    b = b[a.columns].sort_values(by, ignore_index=True)
+    pd.testing.assert_frame_equal(a, b, check_dtype=False)
+
+
+def demo():
+    print("\n=== parquet dataset ===")
+    with tempfile.TemporaryDirectory(prefix="pqds_") as d:
+        tmp = Path(d)
+        frames = _frames_09()
+        queries = {
+            "matches": (["match_id", "match_date", "home_score"], [("match_date", ">=", "2025-07-01")]),
+            "odds":    (["match_id", "collected_at", "home_win"], [("match_id", "in", [1003, 1017]),
+                                                                   ("collected_at", "<", "2025-06-20")]),
+            "events":  (["user_id", "ts", "amount"], [("event", "==", "purchase"), ("month", "==", "2025-07")]),
+        }
+        for name, df in frames.items():
+            ds = ParquetDataset.for_schema(name, tmp / name, min_row_group_rows=100)
+            ds.write(df, mode="overwrite", row_group_rows=100)
+            cols, flt = queries[name]
+            got = ds.read(cols, flt)
+            ref_flt = [f for f in flt if f[0] in df.columns]
+            ref = _pandas_filter(df, ref_flt)
+            if name == "events":
+                ref = ref[ref["ts"].dt.strftime("%Y-%m") == "2025-07"]
+            _same_rows(got, ref[cols], cols)
+            print(f"{name:<8} {len(got):>4} rows == pandas filter ✔  {format_scan(ds.last_scan)}")
+        print("layout:", sorted(str(p.relative_to(tmp / "odds").parent) for p, _ in
+                               ParquetDataset(tmp / "odds").files())[:3], "…")
+
+        # היסטוריה גדולה יותר: שבוע אחד, bookmaker אחד, 3 עמודות
+        odds = _odds_history(400_000)
+        ds = ParquetDataset.for_schema("odds", tmp / "odds_hist", partition_by=("season", "month"),
+                                       min_row_group_rows=5_000)
+        ds.write(odds, mode="overwrite", row_group_rows=5_000)
+        flt = [("collected_at", ">=", "2024-03-01"), ("collected_at", "<", "2024-03-08"), ("bookmaker", "==", "PX")]
+        cols = ["match_id", "collected_at", "home_win"]
+        got = ds.read(cols, flt)
+        _same_rows(got, _pandas_filter(odds, flt)[cols], ["match_id", "collected_at", "home_win"])
+        print(f"odds 400k, one week × PX : {len(got):,} rows ✔  {format_scan(ds.last_scan)}")
+        assert ds.last_scan["files_pruned"] > 0
+        assert ds.last_scan["files_opened"] == ds.last_scan["files_total"] - ds.last_scan["files_pruned"]
+        # כל ההיסטוריה של שני משחקים: אין pruning לפי מחיצה, אבל הקבצים ממוינים לפי match_id
+        flt = [("match_id", "in", [100_010, 105_000])]
+        got = ds.read(cols, flt)
+        _same_rows(got, _pandas_filter(odds, flt)[cols], ["match_id", "collected_at", "home_win"])
+        print(f"odds 400k, two matches   : {len(got):,} rows ✔  {format_scan(ds.last_scan)}")
+
+        # season שהמשתמש כתב בעצמו (שנה קלנדרית) – לא נגזר מ-time_col → בלי pruning לפי טווח זמן
+        own = pd.DataFrame({"match_date": pd.to_datetime(["2023-11-01", "2024-02-01", "2024-08-01"]),
+                            "match_id": [1, 2, 3]})
+        own["season"] = own["match_date"].dt.year
+        ds = ParquetDataset(tmp / "own_season", time_col="match_date", partition_by=("season",))
+        ds.write(own, mode="overwrite")
+        got = ParquetDataset(tmp / "own_season").read(filters=[("match_date", "<", "2024-03-01")])
+        assert sorted(got["match_id"]) == [1, 2], got
+        print("caller-supplied season: no time pruning on it ✔")
+
+
+# ==============================================================
+# Benchmark
+# ==============================================================
+
+def bench(n=20_000_000, seed=0):
+    with tempfile.TemporaryDirectory(prefix="pqds_bench_") as d:
+        tmp = Path(d)
+        odds = _odds_history(n, seed)
+        print(f"\n=== bench: odds history {n:,} rows ===")
+        t = time.perf_counter()
+        odds.to_parquet(tmp / "odds.parquet", index=False)
+        t_single = time.perf_counter() - t
+        ds = ParquetDataset.for_schema("odds", tmp / "ds", partition_by=("season", "month"))
+        t = time.perf_counter()
+        ds.write(odds, mode="overwrite")
+        t_ds = time.perf_counter() - t
+        del odds
+        print(f"write: single file {t_single:6.2f} s | dataset {t_ds:6.2f} s")
+
+        flt = [("collected_at", ">=", "2024-03-01"), ("collected_at", "<", "2024-03-08"), ("match_id", "<", 110_000)]
+        cols = ["match_id", "collected_at", "home_win"]
+        t = time.perf_counter()
+        full = pd.read_parquet(tmp / "odds.parquet")
+        ref = _pandas_filter(full, flt)[cols]
+        t_full = time.perf_counter() - t
+        del full
+        t = time.perf_counter()
+        got = ds.read(cols, flt)
+        t_read = time.perf_counter() - t
+        assert len(got) == len(ref)
+        print(f"read_parquet + pandas filter : {t_full:6.2f} s")
+        print(f"dataset.read (pruned)        : {t_read:6.2f} s  {format_scan(ds.last_scan)}")
+
+
+if __name__ == "__main__":
+    demo()
+    if "--bench" in sys.argv:
+        bench()
+
+######################################################################
+# 💡 TL;DR:
+# • מחיצה = פילטר חינם על הנתיב; מחיצות נגזרות מ-time_col → גם פילטר זמן גוזם תיקיות.
+# • מיון בתוך הקובץ + row groups בגודל סביר → min/max צרים → דילוג על רוב הקובץ.
+# • projection + pruning נמדדים ב-bytes (total_compressed_size) – לא מנחשים, רואים בדוח.
+######################################################################
@@ -0,0 +1,362 @@
+######################################################################
+# 📌 35 – Memory-Mapped Array Store: עמודות .npy + manifest, append ו-slicing בלי העתקה
+#
+# מה יש פה:
+#  1) ArrayStore.create(root, dtypes) / ArrayStore(root) – store עמודתי: קובץ .npy לכל עמודה
+#  2) manifest.json קטן: dtype, צורה, מספר שורות – פתיחה = קריאת JSON + np.memmap (מילישניות)
+#  3) append(data) – מוסיף שורות לסוף כל קובץ ומעדכן את ה-header במקום (בלי לשכתב)
+#  4) store[col] / slice(start, stop) – views של memmap: zero-copy, רק הדפים שנוגעים בהם נקראים
+#  5) matrix() / to_frame() – כשבאמת צריך מערך דו-ממדי או DataFrame (כאן יש העתקה)
+#  6) דמו: 05 §10 (np.save / savetxt / genfromtxt) מול ה-store; הקבצים נטענים גם ב-np.load
+#
+# הרעיון:
+#  • savetxt/genfromtxt = המרה לטקסט ופירסור בפייתון → איטי מאוד ולא מדויק (float → טקסט).
+#  • np.save על מטריצה אחת = כל append כותב הכל מחדש, וכל טעינה קוראת הכל.
+#  • כאן: כל עמודה היא .npy רגיל עם header בגודל קבוע (128 bytes, שמור מראש) →
+#      append = כתיבה לסוף הקובץ + עדכון shape ב-header (אותו אורך בדיוק)
+#      פתיחה  = np.memmap(offset=128) → מערכת ההפעלה טוענת דפים לפי דרישה
+#  • הסדר: קודם הנתונים, אחר כך header, ו-manifest אחרון (os.replace) → קריסה באמצע append
+#    משאירה את ה-store במצב הקודם (bytes עודפים בסוף קובץ נחתכים ב-append הבא).
+#
+# דרישות: numpy (pandas – רק ל-to_frame / append מ-DataFrame)
+######################################################################
+
+import json
+import os
+import struct
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+MANIFEST = "manifest.json"
+HEADER_BYTES = 128                    # .npy v1.0 header (magic + len + dict), מרופד לגודל קבוע
+
+
+def _npy_header(dtype, shape):
+    """header של .npy v1.0 באורך HEADER_BYTES בדיוק – כדי שאפשר יהיה לעדכן shape במקום."""
+    d = {"descr": np.lib.format.dtype_to_descr(dtype), "fortran_order": False, "shape": tuple(shape)}
+    body = repr(d).encode("latin1")
+    room = HEADER_BYTES - 10 - 1
+    if len(body) > room:
+        raise ValueError(f"dtype/shape too long for a {HEADER_BYTES}-byte header: {d}")
+    return np.lib.format.MAGIC_PREFIX + b"\x01\x00" + struct.pack("<H", HEADER_BYTES - 10) \
+        + body + b" " * (room - len(body)) + b"\n"
+
+
+def _atomic_json(path, obj):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(obj, f, indent=2)
+    os.replace(tmp, path)
+
+
+def _cast(name, a, dtype, casting):
+    """astype עם בדיקת טווח: int שלא נכנס / float שהופך ל-inf → OverflowError."""
+    if not np.can_cast(a.dtype, dtype, casting):
+        raise TypeError(f"{name}: cannot cast {a.dtype} → {dtype} with casting={casting!r}")
+    if a.size and not np.can_cast(a.dtype, dtype, "safe"):
+        if dtype.kind in "iu" and a.dtype.kind in "iu":
+            info = np.iinfo(dtype)
+            lo, hi = a.min(), a.max()
+            if lo < info.min or hi > info.max:
+                raise OverflowError(f"{name}: values [{lo}, {hi}] out of range for {dtype}")
+        elif dtype.kind == "f":
+            out = a.astype(dtype, casting=casting)
+            if np.isinf(out).sum() != np.isinf(a).sum():
+                raise OverflowError(f"{name}: values out of range for {dtype}")
+            return out
+    return a.astype(dtype, casting=casting)
+
+
+class ArrayStore:
+    """
+    store = ArrayStore.create(root, {"pts": "int8", "xg": "float32"})
+    store.append({"pts": ..., "xg": ...})        # או DataFrame
+    store = ArrayStore(root)                      # פתיחה: JSON + memmap, בלי לקרוא נתונים
+    store["xg"][1_000:2_000]                      # view – zero-copy
+    store.slice(10**6, 2 * 10**6, ["xg"])         # dict של views
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+        path = self.root / MANIFEST
+        if not path.exists():
+            raise FileNotFoundError(f"{path} not found – use ArrayStore.create()")
+        self._manifest = json.loads(path.read_text(encoding="utf-8"))
+        self._maps = {}
+
+    @classmethod
+    def create(cls, root, dtypes, exist_ok=False):
+        """dtypes: {name: dtype} או {name: (dtype, tail_shape)} לעמודה רב-ממדית (למשל embedding)."""
+        root = Path(root)
+        if (root / MANIFEST).exists():
+            if exist_ok:
+                return cls(root)
+            raise FileExistsError(f"{root} already has a store")
+        root.mkdir(parents=True, exist_ok=True)
+        cols = {}
+        for name, spec in dtypes.items():
+            dt, tail = (spec if isinstance(spec, tuple) else (spec, ()))
+            dt = np.dtype(dt)
+            if dt.hasobject:
+                raise TypeError(f"{name}: object dtype cannot be memory-mapped")
+            cols[name] = {"file": f"{name}.npy", "dtype": dt.str, "tail": list(tail)}
+            with open(root / cols[name]["file"], "wb") as f:
+                f.write(_npy_header(dt, (0, *tail)))
+        _atomic_json(root / MANIFEST, {"version": 1, "n_rows": 0, "columns": cols})
+        return cls(root)
+
+    # ----------------------------------------------------------
+    # מאפיינים
+    # ----------------------------------------------------------
+
+    @property
+    def n_rows(self):
+        return self._manifest["n_rows"]
+
+    def __len__(self):
+        return self.n_rows
+
+    @property
+    def columns(self):
+        return list(self._manifest["columns"])
+
+    @property
+    def dtypes(self):
+        return {c: np.dtype(m["dtype"]) for c, m in self._manifest["columns"].items()}
+
+    def _meta(self, col):
+        try:
+            return self._manifest["columns"][col]
+        except KeyError:
+            raise KeyError(f"unknown column {col!r}; have {self.columns}") from None
+
+    @property
+    def nbytes(self):
+        return sum(self[c].nbytes for c in self.columns)
+
+    # ----------------------------------------------------------
+    # קריאה – zero-copy
+    # ----------------------------------------------------------
+
+    def __getitem__(self, col):
+        """כל העמודה כ-memmap לקריאה בלבד (n_rows לפי ה-manifest)."""
+        m = self._maps.get(col)
+        if m is None:
+            meta = self._meta(col)
+            shape = (self.n_rows, *meta["tail"])
+            if self.n_rows == 0:
+                m = np.zeros(shape, dtype=meta["dtype"])
+            else:
+                m = np.memmap(self.root / meta["file"], dtype=meta["dtype"], mode="r",
+                              offset=HEADER_BYTES, shape=shape)
+            self._maps[col] = m
+        return m
+
+    def slice(self, start=0, stop=None, columns=None):
+        """{col: view} לטווח שורות [start, stop) – בלי העתקה."""
+        stop = self.n_rows if stop is None else min(stop, self.n_rows)
+        return {c: self[c][start:stop] for c in (columns or self.columns)}
+
+    def matrix(self, columns=None, start=0, stop=None, dtype=np.float32):
+        """מטריצה (rows × cols) – מעתיק רק את הטווח המבוקש, עמודה אחרי עמודה."""
+        cols = columns or self.columns
+        part = self.slice(start, stop, cols)
+        n = len(next(iter(part.values()))) if part else 0
+        out = np.empty((n, len(cols)), dtype=dtype)
+        for j, c in enumerate(cols):
+            out[:, j] = part[c]
+        return out
+
+    def to_frame(self, start=0, stop=None, columns=None):
+        return pd.DataFrame({c: np.asarray(v) for c, v in self.slice(start, stop, columns).items()})
+
+    # ----------------------------------------------------------
+    # כתיבה – append בלי לשכתב
+    # ----------------------------------------------------------
+
+    def append(self, data, casting="same_kind"):
+        """
+        data: dict / DataFrame עם כל העמודות, באותו אורך.
+        casting: "safe" – רק המרות בלי אובדן; "same_kind" (ברירת מחדל) – גם int64 → int32 / float64 → float32,
+                 אבל רק אם הערכים נכנסים לטווח (אחרת OverflowError – לא wraparound שקט).
+        """
+        if isinstance(data, pd.DataFrame):
+            data = {c: data[c].to_numpy() for c in data.columns}
+        missing, extra = set(self.columns) - set(data), set(data) - set(self.columns)
+        if missing or extra:
+            raise ValueError(f"append needs exactly the store columns; missing={sorted(missing)}, "
+                             f"extra={sorted(extra)}")
+        arrays, lengths = {}, set()
+        for c in self.columns:
+            meta = self._meta(c)
+            a = np.asarray(data[c])
+            if a.dtype.hasobject:
+                raise TypeError(f"{c}: object values cannot be appended (convert first)")
+            if a.dtype != np.dtype(meta["dtype"]):
+                a = _cast(c, a, np.dtype(meta["dtype"]), casting)
+            if a.shape[1:] != tuple(meta["tail"]):
+                raise ValueError(f"{c}: shape {a.shape[1:]} != {tuple(meta['tail'])}")
+            arrays[c] = np.ascontiguousarray(a)
+            lengths.add(len(a))
+        if len(lengths) != 1:
+            raise ValueError(f"all columns must have the same length, got {sorted(lengths)}")
+        n_new = lengths.pop()
+        if n_new == 0:
+            return self
+        n_old = self.n_rows
+        self._maps.clear()                        # ה-memmaps הישנים לא רואים את השורות החדשות
+        for c, a in arrays.items():
+            meta = self._meta(c)
+            row_bytes = a.itemsize * int(np.prod(meta["tail"], dtype=np.int64))
+            with open(self.root / meta["file"], "r+b") as f:
+                f.seek(HEADER_BYTES + n_old * row_bytes)
+                f.truncate()                      # שאריות מ-append שנקטע
+                a.tofile(f)
+                f.seek(0)
+                f.write(_npy_header(a.dtype, (n_old + n_new, *meta["tail"])))
+        self._manifest["n_rows"] = n_old + n_new
+        _atomic_json(self.root / MANIFEST, self._manifest)
+        return self
+
+    def add_column(self, name, values):
+        """עמודה חדשה לכל n_rows הקיימות."""
+        if name in self._manifest["columns"]:
+            raise ValueError(f"column {name!r} exists")
+        a = np.ascontiguousarray(values)
+        if len(a) != self.n_rows:
+            raise ValueError(f"{name}: {len(a)} rows, store has {self.n_rows}")
+        meta = {"file": f"{name}.npy", "dtype": a.dtype.str, "tail": list(a.shape[1:])}
+        with open(self.root / meta["file"], "wb") as f:
+            f.write(_npy_header(a.dtype, a.shape))
+            a.tofile(f)
+        self._manifest["columns"][name] = meta
+        _atomic_json(self.root / MANIFEST, self._manifest)
+        return self
+
+
+# ==============================================================
+# דמו
+# ==============================================================
+
+def demo():
+    print("\n=== mmap array store ===")
+    with tempfile.TemporaryDirectory(prefix="arrstore_") as d:
+        tmp = Path(d)
+
+        # 05 §10: arr = np.arange(10) → שמירה וטעינה
+        arr = np.arange(10)
+        store = ArrayStore.create(tmp / "s05", {"arr": arr.dtype})
+        store.append({"arr": arr})
+        back = ArrayStore(tmp / "s05")["arr"]
+        assert np.array_equal(back, arr) and isinstance(back, np.memmap)
+        assert np.array_equal(np.load(tmp / "s05" / "arr.npy", mmap_mode="r"), arr)   # .npy תקני
+        print("[05 §10] arr:", np.asarray(back), "(np.load רואה אותו קובץ ✔)")
+
+        # store של פיצ'רים: append ב-chunks, slicing בלי העתקה
+        rng = np.random.default_rng(0)
+        dtypes = {"team_id": "int32", "pts": "int8", "xg": "float32", "emb": ("float32", (4,))}
+        store = ArrayStore.create(tmp / "feats", dtypes)
+        chunks = []
+        for _ in range(3):
+            n = int(rng.integers(50_000, 100_000))
+            c = {"team_id": rng.integers(0, 500, n), "pts": rng.choice([0, 1, 3], n),
+                 "xg": rng.gamma(1.5, 0.8, n), "emb": rng.standard_normal((n, 4))}
+            store.append(c)
+            chunks.append(c)
+        store = ArrayStore(tmp / "feats")
+        full = {k: np.concatenate([c[k] for c in chunks]) for k in dtypes}
+        for k in dtypes:
+            assert np.array_equal(store[k], full[k].astype(store.dtypes[k]))
+        v = store.slice(1_000, 5_000)
+        assert np.shares_memory(v["xg"], store["xg"]) and v["emb"].shape == (4_000, 4)
+        print(f"{len(store):,} rows × {store.columns}, slice shares memory with the map ✔")
+
+        # append שנקטע: נתונים נכתבו אבל manifest לא עודכן → ה-store רואה את המצב הקודם
+        with open(tmp / "feats" / "xg.npy", "ab") as f:
+            f.write(b"\x00" * 1_000)
+        assert len(ArrayStore(tmp / "feats")["xg"]) == len(store)
+        store.append({k: full[k][:10] for k in dtypes})
+        assert np.array_equal(ArrayStore(tmp / "feats")["xg"][-10:], full["xg"][:10].astype(np.float32))
+        print("partial write ignored, next append truncates it ✔")
+
+        # מול np.savetxt / np.genfromtxt על 200k ערכים
+        x = rng.standard_normal(200_000)
+        t = time.perf_counter(); np.savetxt(tmp / "x.csv", x, delimiter=","); t_save = time.perf_counter() - t
+        t = time.perf_counter(); y = np.genfromtxt(tmp / "x.csv", delimiter=","); t_gen = time.perf_counter() - t
+        s = ArrayStore.create(tmp / "x", {"x": x.dtype})
+        t = time.perf_counter(); s.append({"x": x}); t_app = time.perf_counter() - t
+        t = time.perf_counter(); z = ArrayStore(tmp / "x")["x"]; t_open = time.perf_counter() - t
+        assert np.array_equal(z, x) and np.allclose(y, x)
+        print(f"savetxt {t_save:.3f}s + genfromtxt {t_gen:.3f}s  vs  append {t_app:.4f}s + open {t_open * 1e3:.2f} ms")
+
+        # int64 → int8 מחוץ לטווח: שגיאה, לא wraparound
+        try:
+            store.append({k: full[k][:1] for k in dtypes} | {"pts": np.array([300])})
+            raise AssertionError("expected OverflowError")
+        except OverflowError as e:
+            print("⚠️", e)
+        assert len(ArrayStore(tmp / "feats")) == len(store)
+
+
+# ==============================================================
+# Benchmark – 50 עמודות × 100M שורות
+# ==============================================================
+
+def bench(n_rows=100_000_000, n_cols=50, chunk=5_000_000, dtype="float32", seed=0):
+    root = Path(tempfile.mkdtemp(prefix="arrstore_bench_"))
+    rng = np.random.default_rng(seed)
+    cols = [f"f{j:02d}" for j in range(n_cols)]
+    gb = n_rows * n_cols * np.dtype(dtype).itemsize / 2**30
+    print(f"\n=== bench: {n_cols} cols × {n_rows:,} rows {dtype} ({gb:.1f} GB) ===")
+    store = ArrayStore.create(root, {c: dtype for c in cols})
+    block = rng.standard_normal(chunk, dtype=np.float32).astype(dtype)
+    t = time.perf_counter()
+    for start in range(0, n_rows, chunk):
+        n = min(chunk, n_rows - start)
+        store.append({c: block[:n] for c in cols})
+    t_write = time.perf_counter() - t
+    print(f"append in {chunk:,}-row chunks : {t_write:8.2f} s  ({gb / t_write:.2f} GB/s)")
+
+    t = time.perf_counter()
+    s = ArrayStore(root)
+    maps = [s[c] for c in cols]
+    t_open = time.perf_counter() - t
+    print(f"open + map all columns       : {t_open * 1e3:8.2f} ms")
+
+    mid = n_rows // 2
+    t = time.perf_counter()
+    part = s.slice(mid, mid + 1_000_000)
+    t_slice = time.perf_counter() - t
+    t = time.perf_counter()
+    total = sum(float(v.sum(dtype=np.float64)) for v in part.values())
+    t_touch = time.perf_counter() - t
+    print(f"slice 1M rows (views)        : {t_slice * 1e3:8.2f} ms;  sum over them {t_touch:.3f} s")
+    assert np.isfinite(total) and len(maps) == n_cols
+
+    n_txt = 200_000
+    np.savetxt(root / "sample.csv", np.tile(block[:n_txt, None], (1, n_cols)), delimiter=",")
+    t = time.perf_counter()
+    np.genfromtxt(root / "sample.csv", delimiter=",")
+    t_gen = time.perf_counter() - t
+    print(f"genfromtxt {n_txt:,} rows × {n_cols}  : {t_gen:8.2f} s  (→ ~{t_gen * n_rows / n_txt / 3600:.1f} h ל-{n_rows:,})")
+    for f in root.iterdir():
+        f.unlink()
+    root.rmdir()
+
+
+if __name__ == "__main__":
+    demo()
+    if "--bench" in sys.argv:
+        bench()
+
+######################################################################
+# 💡 TL;DR:
+# • עמודה = .npy עם header קבוע → append לסוף הקובץ + עדכון shape, בלי לשכתב.
+# • פתיחה = manifest + np.memmap → מילישניות, גם ל-100M שורות; slicing = view.
+# • genfromtxt/savetxt רק לקבצים קטנים שבני אדם קוראים; לנתונים – בינארי.
+######################################################################
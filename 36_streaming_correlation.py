@@ -0,0 +1,336 @@
+######################################################################
+# 📌 36 – Streaming Correlation: מטריצת קורלציה רחבה במעבר אחד על chunks (05 §9 / 06 §7d)
+#
+# מה יש פה:
+#  1) StreamingCorr.update(chunk) – צובר n, סכומים ו-cross-products לכל chunk של שורות
+#  2) בלוקים של עמודות – X_I^T X_J רק למשולש העליון; זיכרון זמני = chunk × block
+#  3) קטגוריות בלי get_dummies: ספירות (bincount), סכומים לכל קבוצה (reduceat),
+#     וטבלת שכיחויות בין שתי קטגוריות – זה כל מה שה-dummies תורמים ל-X^T X
+#  4) dtype="float32" + compensated=True – צבירה ב-float32 עם תיקון Kahan בין chunks
+#  5) corr() / cov() – DataFrame עם שמות כמו get_dummies ("channel_Store"), drop_first
+#  6) דמו: np.corrcoef של 05 §9, ה-heatmap של 06 §7d, ודיוק float32 מול float64
+#
+# הרעיון:
+#  • corr צריך רק n, S = Σx, C = Σ x xᵀ  →  cov = (C − S Sᵀ / n) / (n − 1).
+#    כדי לא לאבד ספרות (C ו-S Sᵀ/n כמעט שווים כשהממוצע גדול) מזיזים כל עמודה
+#    בממוצע של ה-chunk הראשון: x' = x − K (cov לא משתנה, הביטול קטן בהרבה).
+#  • dummy D_k = 1[g == k]:  Σ D_k = count_k,  Σ D_k D_l = 0 (k ≠ l),  Σ D_k x' = סכום x' בקבוצה k
+#    → אין צורך לבנות מטריצה של n × levels בכלל.
+#  • ספירות נצברות ב-int64 (float32 מדויק רק עד 16.7M).
+#
+# דרישות: pandas, numpy
+######################################################################
+
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+
+class _Acc:
+    """מצבר במערך (float32/float64), אופציונלית עם compensated (Kahan) sum בין chunks."""
+
+    def __init__(self, shape, dtype, compensated):
+        self.v = np.zeros(shape, dtype=dtype)
+        self.c = np.zeros(shape, dtype=dtype) if compensated else None
+
+    def add(self, idx, part):
+        if self.c is None:
+            self.v[idx] += part
+            return
+        y = part - self.c[idx]
+        t = self.v[idx] + y
+        self.c[idx] = (t - self.v[idx]) - y
+        self.v[idx] = t
+
+    def grow(self, shape):
+        """הרחבה (רמות קטגוריה חדשות) – אפסים בשוליים."""
+        pad = [(0, s - o) for s, o in zip(shape, self.v.shape)]
+        self.v = np.pad(self.v, pad)
+        if self.c is not None:
+            self.c = np.pad(self.c, pad)
+
+    def value(self):
+        return self.v.astype(np.float64) - (0 if self.c is None else self.c.astype(np.float64))
+
+
+class StreamingCorr:
+    """
+    eng = StreamingCorr(numeric=["amount", ...], categorical=["channel", "city"], dtype="float32")
+    for chunk in chunks:                 # DataFrame (או ndarray כשיש רק עמודות מספריות)
+        eng.update(chunk)
+    eng.corr(drop_first=True)            # DataFrame; כמו X.join(get_dummies(...)).corr()
+    """
+
+    def __init__(self, numeric=None, categorical=(), dtype="float64", compensated=False, block=1024):
+        self.numeric = None if numeric is None else list(numeric)
+        self.categorical = list(categorical)
+        self.dtype = np.dtype(dtype)
+        self.compensated = compensated
+        self.block = int(block)
+        self.n = 0
+        self.rows_dropped = 0
+        self._shift = None
+        self._levels = {c: None for c in self.categorical}
+        self._count = {c: np.zeros(0, dtype=np.int64) for c in self.categorical}
+        self._pair = {}                                     # (c, d) → טבלת שכיחויות int64
+        self._G = {}                                        # c → _Acc (levels × p)
+
+    # ----------------------------------------------------------
+    # צבירה
+    # ----------------------------------------------------------
+
+    def _numeric_block(self, chunk):
+        if isinstance(chunk, pd.DataFrame):
+            if self.numeric is None:
+                self.numeric = [c for c in chunk.columns if c not in self.categorical]
+            X = chunk[self.numeric].to_numpy(dtype=self.dtype)
+        else:
+            X = np.asarray(chunk, dtype=self.dtype)
+            if X.ndim == 1:
+                X = X[:, None]
+            if self.numeric is None:
+                self.numeric = [f"x{j}" for j in range(X.shape[1])]
+        return X
+
+    def _codes(self, c, s):
+        labels = self._levels[c]
+        valid = s.notna()
+        if labels is None:
+            labels = pd.Index(pd.unique(s[valid]))
+        codes = labels.get_indexer(s)
+        new = valid.to_numpy() & (codes < 0)
+        if new.any():
+            labels = labels.append(pd.Index(pd.unique(s[new])))
+            codes[new] = labels.get_indexer(s[new])
+        self._levels[c] = labels
+        return codes
+
+    def update(self, chunk):
+        X = self._numeric_block(chunk)
+        ok = ~np.isnan(X).any(axis=1)
+        if not ok.all():                                    # listwise: שורה עם NaN מספרי לא נספרת
+            self.rows_dropped += int((~ok).sum())
+            X = X[ok]
+            chunk = chunk[ok] if isinstance(chunk, pd.DataFrame) else chunk
+        n, p = X.shape
+        if n == 0:
+            return self
+        if self._shift is None:
+            self._shift = X.astype(np.float64).mean(axis=0).astype(self.dtype)
+            self._S = _Acc(p, self.dtype, self.compensated)
+            self._C = _Acc((p, p), self.dtype, self.compensated)
+        X = X - self._shift                                 # עותק: asarray/to_numpy עלולים להחזיר את הבאפר של הקורא
+        self.n += n
+        self._S.add(slice(None), X.sum(axis=0, dtype=self.dtype))
+        b = self.block
+        for i in range(0, p, b):                            # משולש עליון בבלוקים
+            Xi = X[:, i:i + b]
+            for j in range(i, p, b):
+                self._C.add((slice(i, i + b), slice(j, j + b)), Xi.T @ X[:, j:j + b])
+
+        codes = {c: self._codes(c, chunk[c]) for c in self.categorical}
+        for c, g in codes.items():
+            K = len(self._levels[c])
+            cnt = self._count[c]
+            self._count[c] = np.pad(cnt, (0, K - len(cnt))) + np.bincount(g[g >= 0], minlength=K)
+            acc = self._G.get(c)
+            if acc is None:
+                acc = self._G[c] = _Acc((K, p), self.dtype, self.compensated)
+            elif acc.v.shape[0] < K:
+                acc.grow((K, p))
+            # סכומים לכל רמה: מיון לפי קוד + reduceat (בלי מטריצת dummies)
+            o = np.argsort(g, kind="stable")
+            o = o[g[o] >= 0]
+            if len(o):
+                gs = g[o]
+                starts = np.flatnonzero(np.r_[True, gs[1:] != gs[:-1]])
+                acc.add((gs[starts], slice(None)), np.add.reduceat(X[o], starts, axis=0))
+        for a_i, c in enumerate(self.categorical):
+            for d in self.categorical[a_i + 1:]:
+                Kc, Kd = len(self._levels[c]), len(self._levels[d])
+                t = self._pair.get((c, d), np.zeros((0, 0), dtype=np.int64))
+                t = np.pad(t, ((0, Kc - t.shape[0]), (0, Kd - t.shape[1])))
+                gc, gd = codes[c], codes[d]
+                m = (gc >= 0) & (gd >= 0)
+                t += np.bincount(gc[m] * Kd + gd[m], minlength=Kc * Kd).reshape(Kc, Kd)
+                self._pair[(c, d)] = t
+        return self
+
+    # ----------------------------------------------------------
+    # סיום: co-moments → cov / corr
+    # ----------------------------------------------------------
+
+    def _layout(self, drop_first):
+        """שמות + לכל קטגוריה: סדר רמות ממוין (כמו get_dummies) ו-slice ברמות."""
+        names = list(self.numeric or [])
+        cats = []
+        for c in self.categorical:
+            levels = self._levels[c]
+            if levels is None:
+                continue
+            order = np.argsort(levels.to_numpy(), kind="stable")
+            if drop_first:
+                order = order[1:]
+            cats.append((c, order, len(names)))
+            names += [f"{c}_{levels[k]}" for k in order]
+        return names, cats
+
+    def comoments(self, drop_first=False):
+        """M = Σ (x − x̄)(x − x̄)ᵀ לכל זוג משתנים (float64), ושמות."""
+        if self.n < 2:
+            raise ValueError("need at least 2 rows")
+        names, cats = self._layout(drop_first)
+        P, p, n = len(names), len(self.numeric), self.n
+        M = np.empty((P, P))
+        S = self._S.value()
+        C = np.triu(self._C.value())
+        C = C + np.triu(C, 1).T
+        M[:p, :p] = C - np.outer(S, S) / n
+        for c, order, off in cats:
+            cnt = self._count[c][order].astype(np.float64)
+            k = len(order)
+            G = self._G[c].value()[order]
+            M[off:off + k, :p] = G - np.outer(cnt, S) / n
+            M[:p, off:off + k] = M[off:off + k, :p].T
+            M[off:off + k, off:off + k] = np.diag(cnt) - np.outer(cnt, cnt) / n
+        for i, (c, oc, offc) in enumerate(cats):
+            for d, od, offd in cats[i + 1:]:
+                N = self._pair[(c, d)][np.ix_(oc, od)].astype(np.float64)
+                cc = self._count[c][oc].astype(np.float64)
+                cd = self._count[d][od].astype(np.float64)
+                M[offc:offc + len(oc), offd:offd + len(od)] = N - np.outer(cc, cd) / n
+                M[offd:offd + len(od), offc:offc + len(oc)] = M[offc:offc + len(oc), offd:offd + len(od)].T
+        return M, names
+
+    def cov(self, drop_first=False):
+        M, names = self.comoments(drop_first)
+        return pd.DataFrame(M / (self.n - 1), index=names, columns=names)
+
+    def corr(self, drop_first=False, out=None):
+        """
+        corr בבלוקים של עמודות. out (למשל np.memmap) → נכתב לתוכו ומוחזר מערך; אחרת DataFrame.
+        משתנה עם שונות 0 → NaN (כמו pandas).
+        """
+        M, names = self.comoments(drop_first)
+        d = np.diag(M).copy()
+        with np.errstate(invalid="ignore", divide="ignore"):
+            inv = np.where(d > 0, 1 / np.sqrt(d), np.nan)
+        R = M if out is None else out
+        for j in range(0, len(names), self.block):
+            blk = M[:, j:j + self.block] * inv[:, None] * inv[None, j:j + self.block]
+            R[:, j:j + self.block] = np.clip(blk, -1, 1)
+        idx = np.flatnonzero(d > 0)
+        R[idx, idx] = 1.0
+        return R if out is not None else pd.DataFrame(R, index=names, columns=names)
+
+
+def streaming_corr(chunks, numeric=None, categorical=(), drop_first=False, **kw):
+    eng = StreamingCorr(numeric, categorical, **kw)
+    for chunk in chunks:
+        eng.update(chunk)
+    return eng.corr(drop_first=drop_first)
+
+
+# ==============================================================
+# דמו
+# ==============================================================
+
+def _cust_06():
+    """cust של 06 (אותו seed ואותו סדר קריאות rng)."""
+    rng = np.random.default_rng(42)
+    dates = pd.date_range("2025-07-01", periods=14, freq="D")
+    rng.normal(100, 20, len(dates))
+    return pd.DataFrame({
+        "customer_id": np.repeat([1,2,3,4], 20),
+        "amount": rng.normal(120, 40, 80).clip(5),
+        "channel": rng.choice(["Web","Store","Partner"], 80, p=[0.5,0.35,0.15]),
+        "city": rng.choice(["TA","Haifa","JLM"], 80)
+    })
+
+
+def demo():
+    print("\n=== streaming correlation ===")
+    rng = np.random.default_rng(0)
+
+    # 05 §9: np.corrcoef(mat, rowvar=False) – כאן ב-chunks של 7 שורות
+    mat = rng.standard_normal((50, 4))
+    got = streaming_corr((mat[i:i + 7] for i in range(0, 50, 7)), block=3).to_numpy()
+    assert np.allclose(got, np.corrcoef(mat, rowvar=False))
+    print("05 §9  np.corrcoef == streaming (chunks of 7, blocks of 3) ✔")
+
+    # 06 §7d: amount + get_dummies(channel, city, drop_first=True) → corr
+    cust = _cust_06()
+    ref = cust[["amount"]].join(pd.get_dummies(cust[["channel","city"]], drop_first=True)).corr()
+    got = streaming_corr((cust.iloc[i:i + 16] for i in range(0, 80, 16)), ["amount"], ["channel", "city"],
+                         drop_first=True)
+    pd.testing.assert_frame_equal(got, ref, check_exact=False, atol=1e-12)
+    print("06 §7d get_dummies(...).corr() == group sums, בלי dummies ✔")
+    print(got.round(2))
+
+    # float32: ממוצע גדול, הרבה chunks → compensated מציל את הדיוק
+    n, p = 400_000, 6
+    base = rng.standard_normal((n, 2))
+    X = 1e4 + np.c_[base, base @ rng.standard_normal((2, p - 2)) + 0.5 * rng.standard_normal((n, p - 2))]
+    exact = np.corrcoef(X, rowvar=False)
+    print(f"{'dtype':<24} max |err| vs float64 corrcoef")
+    for label, kw in [("float64", {}), ("float32", {"dtype": "float32"}),
+                      ("float32 + compensated", {"dtype": "float32", "compensated": True})]:
+        r = streaming_corr((X[i:i + 1_000] for i in range(0, n, 1_000)), **kw).to_numpy()
+        print(f"{label:<24} {np.abs(r - exact).max():.2e}")
+
+
+# ==============================================================
+# Benchmark
+# ==============================================================
+
+def bench(n_rows=2_000_000, n_num=1_000, n_levels=(100, 50), chunk=50_000, seed=0):
+    """ברירת המחדל קטנה מהיעד (5000 עמודות × 100M): הזמן לינארי ב-n_rows וריבועי בעמודות."""
+    rng = np.random.default_rng(seed)
+    cats = [f"c{i}" for i in range(len(n_levels))]
+
+    def chunks():
+        for start in range(0, n_rows, chunk):
+            m = min(chunk, n_rows - start)
+            df = pd.DataFrame(rng.standard_normal((m, n_num), dtype=np.float32),
+                              columns=[f"x{j}" for j in range(n_num)])
+            for c, k in zip(cats, n_levels):
+                df[c] = rng.integers(0, k, m).astype(str)
+            yield df
+
+    print(f"\n=== bench: {n_rows:,} rows × {n_num} numeric + {list(n_levels)} levels, chunks of {chunk:,} ===")
+    for label, kw in [("float64", {}), ("float32 + compensated", {"dtype": "float32", "compensated": True})]:
+        rng = np.random.default_rng(seed)
+        tracemalloc.start()
+        t = time.perf_counter()
+        r = streaming_corr(chunks(), categorical=cats, **kw)
+        dt = time.perf_counter() - t
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"streaming {label:<22}: {dt:7.2f} s  peak +{peak / 2**20:7.0f} MB  → {r.shape}")
+
+    rng = np.random.default_rng(seed)
+    df = next(chunks())                                     # ה-baseline רק על chunk אחד (pairwise corr של pandas איטי)
+    n_ref = len(df)
+    tracemalloc.start()
+    t = time.perf_counter()
+    pd.get_dummies(df, columns=cats).astype(np.float64).corr()
+    dt = time.perf_counter() - t
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"get_dummies().corr() on {n_ref:,} rows : {dt:7.2f} s  peak +{peak / 2**20:7.0f} MB")
+
+
+if __name__ == "__main__":
+    demo()
+    if "--bench" in sys.argv:
+        bench()
+
+######################################################################
+# 💡 TL;DR:
+# • corr = n, Σx, Σxxᵀ – נצברים chunk אחרי chunk; הזזה בממוצע הראשון שומרת על הדיוק.
+# • dummies הם רק ספירות וסכומים לקבוצה → get_dummies מיותר, גם ל-1000 רמות.
+# • float32 חוסך חצי זיכרון ומהיר יותר ב-BLAS; compensated=True מחזיר את רוב הדיוק.
+######################################################################